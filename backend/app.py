@@ -88,8 +88,16 @@ def create_app(config_name='development'):
     atexit.register(lambda: video_processing_pool.shutdown(wait=True))
     atexit.register(lambda: knowledge_graph_processing_pool.shutdown(wait=True))
     
+    # 关闭常驻的模型进程池
+    from utils.model_registry import model_registry
+    atexit.register(model_registry.shutdown)
+    
     # 设置app的全局线程信息字典
     app.PROCESSING_THREADS = {}
+
+    # 打开持久化任务队列，重新执行上次运行中断的任务
+    video_processing_pool.init_app(app)
+    knowledge_graph_processing_pool.init_app(app)
     # 启动前查找所有软删除的视频并清理相关数据
     # 注意：这里不能直接执行数据库查询，因为还在应用初始化阶段
     # 数据库查询需要在应用上下文中执行
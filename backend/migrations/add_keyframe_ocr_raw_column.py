@@ -0,0 +1,24 @@
+"""
+为关键帧表添加OCR原始结果列的迁移脚本
+"""
+
+from models.models import db
+from models.models import VideoKeyframe
+from sqlalchemy import inspect, text
+def add_column():
+    """为 video_keyframes 表添加 ocr_result_raw 列"""
+    inspector = inspect(db.engine)
+    columns = [column['name'] for column in inspector.get_columns(VideoKeyframe.__tablename__)]
+    
+    if 'ocr_result_raw' not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {VideoKeyframe.__tablename__} ADD COLUMN ocr_result_raw TEXT"))
+        print(f"成功为表 {VideoKeyframe.__tablename__} 添加 ocr_result_raw 列")
+    else:
+        print(f"表 {VideoKeyframe.__tablename__} 已存在 ocr_result_raw 列")
+
+if __name__ == "__main__":
+    from app import app
+    
+    with app.app_context():
+        add_column()
@@ -0,0 +1,25 @@
+"""
+为关键帧表添加感知哈希列的迁移脚本
+"""
+
+from models.models import db
+from models.models import VideoKeyframe
+from sqlalchemy import inspect, text
+def add_column():
+    """为 video_keyframes 表添加 phash 列及索引"""
+    inspector = inspect(db.engine)
+    columns = [column['name'] for column in inspector.get_columns(VideoKeyframe.__tablename__)]
+    
+    if 'phash' not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {VideoKeyframe.__tablename__} ADD COLUMN phash VARCHAR(16)"))
+            connection.execute(text(f"CREATE INDEX ix_video_keyframes_phash ON {VideoKeyframe.__tablename__} (phash)"))
+        print(f"成功为表 {VideoKeyframe.__tablename__} 添加 phash 列")
+    else:
+        print(f"表 {VideoKeyframe.__tablename__} 已存在 phash 列")
+
+if __name__ == "__main__":
+    from app import app
+    
+    with app.app_context():
+        add_column()
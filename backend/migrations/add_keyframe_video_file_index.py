@@ -0,0 +1,26 @@
+"""
+为关键帧表添加 (video_id, file_name) 联合索引的迁移脚本
+"""
+
+from models.models import db
+from models.models import VideoKeyframe
+from sqlalchemy import inspect, text
+INDEX_NAME = 'ix_keyframe_video_file'
+
+def add_index():
+    """为 video_keyframes 表添加 (video_id, file_name) 索引，用于按文件名批量更新OCR/ASR列"""
+    inspector = inspect(db.engine)
+    indexes = [index['name'] for index in inspector.get_indexes(VideoKeyframe.__tablename__)]
+    
+    if INDEX_NAME not in indexes:
+        with db.engine.begin() as connection:
+            connection.execute(text(f"CREATE INDEX {INDEX_NAME} ON {VideoKeyframe.__tablename__} (video_id, file_name)"))
+        print(f"成功为表 {VideoKeyframe.__tablename__} 添加索引 {INDEX_NAME}")
+    else:
+        print(f"表 {VideoKeyframe.__tablename__} 已存在索引 {INDEX_NAME}")
+
+if __name__ == "__main__":
+    from app import app
+    
+    with app.app_context():
+        add_index()
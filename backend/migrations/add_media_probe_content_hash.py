@@ -0,0 +1,24 @@
+"""
+为媒体探测信息表添加内容哈希列的迁移脚本
+"""
+
+from models.models import db
+from models.models import MediaProbe
+from sqlalchemy import inspect, text
+def add_column():
+    """为 media_probes 表添加 content_hash 列"""
+    inspector = inspect(db.engine)
+    columns = [column['name'] for column in inspector.get_columns(MediaProbe.__tablename__)]
+    
+    if 'content_hash' not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {MediaProbe.__tablename__} ADD COLUMN content_hash VARCHAR(64)"))
+        print(f"成功为表 {MediaProbe.__tablename__} 添加 content_hash 列")
+    else:
+        print(f"表 {MediaProbe.__tablename__} 已存在 content_hash 列")
+
+if __name__ == "__main__":
+    from app import app
+    
+    with app.app_context():
+        add_column()
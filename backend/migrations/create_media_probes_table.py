@@ -0,0 +1,25 @@
+"""
+创建媒体探测信息表的迁移脚本
+"""
+
+from models.models import db
+from models.models import MediaProbe
+from sqlalchemy import inspect
+def create_table():
+    """创建媒体探测信息表"""
+    # 检查表是否存在
+    inspector = inspect(db.engine)
+    table_exists = inspector.has_table(MediaProbe.__tablename__)
+    
+    if not table_exists:
+        # 创建表
+        MediaProbe.__table__.create(db.engine)
+        print(f"成功创建表 {MediaProbe.__tablename__}")
+    else:
+        print(f"表 {MediaProbe.__tablename__} 已存在")
+
+if __name__ == "__main__":
+    from app import app
+    
+    with app.app_context():
+        create_table()
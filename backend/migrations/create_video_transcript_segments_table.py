@@ -0,0 +1,25 @@
+"""
+创建视频语音识别片段表的迁移脚本
+"""
+
+from models.models import db
+from models.models import VideoTranscriptSegment
+from sqlalchemy import inspect
+def create_table():
+    """创建视频语音识别片段表（含 (video_id, start) 联合索引）"""
+    # 检查表是否存在
+    inspector = inspect(db.engine)
+    table_exists = inspector.has_table(VideoTranscriptSegment.__tablename__)
+    
+    if not table_exists:
+        # 创建表，同时创建 __table_args__ 中定义的索引
+        VideoTranscriptSegment.__table__.create(db.engine)
+        print(f"成功创建表 {VideoTranscriptSegment.__tablename__}")
+    else:
+        print(f"表 {VideoTranscriptSegment.__tablename__} 已存在")
+
+if __name__ == "__main__":
+    from app import app
+    
+    with app.app_context():
+        create_table()
@@ -250,10 +250,17 @@ class VideoKeyframe(db.Model):
     time_point = db.Column(db.Float, nullable=False)  # 秒
     time_formatted = db.Column(db.String(20))
     file_name = db.Column(db.String(255))
+    phash = db.Column(db.String(16), index=True)  # 关键帧感知哈希（16位十六进制）
     ocr_result = db.Column(db.Text)  # 存储OCR识别到的文本
+    ocr_result_raw = db.Column(db.Text)  # 存储OCR原始结果（文本框位置、置信度，JSON格式）
     asr_texts = db.Column(db.Text)  # 存储ASR识别到的文本
     create_time = db.Column(db.DateTime, default=datetime.now)
     
+    __table_args__ = (
+        # OCR/ASR步骤按 (video_id, file_name) 批量更新关键帧
+        db.Index('ix_keyframe_video_file', 'video_id', 'file_name'),
+    )
+    
     # 关系
     video = db.relationship('Video', backref=db.backref('keyframes', lazy='dynamic'))
     
@@ -262,6 +269,9 @@ class VideoKeyframe(db.Model):
         
     def get_ocr_result(self):
         return json.loads(self.ocr_result) if self.ocr_result else []
+        
+    def get_ocr_result_raw(self):
+        return json.loads(self.ocr_result_raw) if self.ocr_result_raw else []
 
 class VideoVectorIndex(db.Model):
     """存储视频向量索引的信息"""
@@ -276,6 +286,74 @@ class VideoVectorIndex(db.Model):
     update_time = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     video = db.relationship('Video', backref=db.backref('vector_indices', lazy='dynamic'))
 
+class VideoTranscriptSegment(db.Model):
+    """存储视频的原始语音识别片段（保留逐段时间戳）"""
+    __tablename__ = 'video_transcript_segments'
+
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(UUIDType, db.ForeignKey('videos.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False, comment='片段序号，从0开始')
+    start = db.Column(db.Float, nullable=False, comment='开始时间(秒)')
+    end = db.Column(db.Float, nullable=False, comment='结束时间(秒)')
+    text = db.Column(db.Text, comment='识别文本')
+    create_time = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_transcript_video_start', 'video_id', 'start'),
+    )
+
+    video = db.relationship('Video', backref=db.backref('transcript_segments', lazy='dynamic'))
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'start': self.start,
+            'end': self.end,
+            'text': self.text
+        }
+
+class MediaProbe(db.Model):
+    """视频文件的媒体探测信息（ffprobe结果缓存）"""
+    __tablename__ = 'media_probes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(UUIDType, db.ForeignKey('videos.id'), nullable=False, unique=True, index=True)
+    file_size = db.Column(db.BigInteger, nullable=False, comment='探测时的文件大小(字节)')
+    file_mtime_ns = db.Column(db.BigInteger, nullable=False, comment='探测时的文件修改时间(纳秒)')
+    content_hash = db.Column(db.String(64), nullable=True, comment='文件内容SHA-256，按需计算')
+    format_name = db.Column(db.String(100), comment='容器格式')
+    duration = db.Column(db.Float, default=0.0, comment='时长(秒)')
+    bit_rate = db.Column(db.BigInteger, nullable=True, comment='总码率')
+    fps = db.Column(db.Float, default=0.0, comment='帧率')
+    frame_count = db.Column(db.Integer, default=0, comment='总帧数')
+    video_codec = db.Column(db.String(50), comment='视频编码')
+    width = db.Column(db.Integer, default=0, comment='显示宽度（已考虑旋转）')
+    height = db.Column(db.Integer, default=0, comment='显示高度（已考虑旋转）')
+    has_audio = db.Column(db.Boolean, default=False, comment='是否包含音频流')
+    audio_codec = db.Column(db.String(50), nullable=True, comment='音频编码')
+    audio_sample_rate = db.Column(db.Integer, nullable=True, comment='音频采样率')
+    audio_channels = db.Column(db.Integer, nullable=True, comment='音频声道数')
+    create_time = db.Column(db.DateTime, default=datetime.now)
+    update_time = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    video = db.relationship('Video', backref=db.backref('media_probe', uselist=False))
+
+    def to_dict(self):
+        return {
+            'format_name': self.format_name,
+            'duration': self.duration,
+            'bit_rate': self.bit_rate,
+            'fps': self.fps,
+            'frame_count': self.frame_count,
+            'video_codec': self.video_codec,
+            'width': self.width,
+            'height': self.height,
+            'has_audio': self.has_audio,
+            'audio_codec': self.audio_codec,
+            'audio_sample_rate': self.audio_sample_rate,
+            'audio_channels': self.audio_channels
+        }
+
 class TaskLog(db.Model):
     __tablename__ = 'task_logs'
     
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+清理步骤产物缓存脚本
+按最近使用时间删除产物缓存（artifact_cache）中的旧产物，直到总大小不超过上限
+"""
+
+import os
+import sys
+from datetime import datetime
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tasks.worker import create_worker_app
+from tasks.video_processor.artifact_cache import ArtifactCache
+
+app = create_worker_app()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='清理步骤产物缓存')
+    parser.add_argument('--execute', action='store_true', help='执行清理操作（默认为预览模式）')
+    parser.add_argument('--max-gb', type=float, default=None, help='缓存总大小上限（GB），默认使用配置 ARTIFACT_CACHE_MAX_GB')
+    parser.add_argument('--max-age-days', type=float, default=None, help='删除超过该天数未使用的产物')
+
+    args = parser.parse_args()
+
+    dry_run = not args.execute
+
+    print("=" * 60)
+    print("步骤产物缓存清理工具")
+    print(f"运行模式: {'执行清理' if not dry_run else '预览模式'}")
+    print(f"清理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+
+    if dry_run:
+        print("⚠️  当前为预览模式，不会实际删除任何数据")
+        print("⚠️  要执行实际清理，请使用 --execute 参数")
+        print("")
+
+    with app.app_context():
+        max_bytes = int(args.max_gb * 1024 ** 3) if args.max_gb is not None else None
+        cache = ArtifactCache(max_bytes=max_bytes)
+        artifacts = cache.list_artifacts()
+        total = sum(size for _, size, _ in artifacts)
+        print(f"缓存目录: {cache.cache_dir}")
+        print(f"产物数量: {len(artifacts)}，总大小: {total / 1024 ** 3:.2f} GB")
+
+        removed, freed = cache.prune(max_age_days=args.max_age_days, dry_run=dry_run)
+        action = "将删除" if dry_run else "已删除"
+        print(f"{action} {removed} 个产物，释放 {freed / 1024 ** 3:.2f} GB")
@@ -485,7 +485,7 @@ def get_pool_status():
         
         # 获取正在处理的任务信息
         active_tasks = []
-        for task_id, task_info in knowledge_graph_processing_pool.current_tasks.items():
+        for task_id, task_info in knowledge_graph_processing_pool.get_active_tasks().items():
             # 查找任务记录
             task = KnowledgeGraphProcessingTask.query.filter_by(course_id=task_info['course_id']).order_by(
                 KnowledgeGraphProcessingTask.create_time.desc()
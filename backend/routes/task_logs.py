@@ -11,6 +11,8 @@ from datetime import datetime
 
 # 导入视频处理线程池
 from utils.video_processing_pool import video_processing_pool
+from utils.model_registry import model_registry
+from tasks.video_processor.step_scheduler import resource_lanes
 
 task_logs_bp = Blueprint('task_logs', __name__)
 
@@ -239,6 +241,10 @@ def delete_task(task_id):
                 )
                 db.session.add(log)
         else:
+            # 等待中的任务从队列中移除
+            if task.status == 'pending':
+                video_processing_pool.stop_task(task_id)
+
             # 如果任务不是处理中状态，直接标记为取消状态
             task.status = 'cancelled'
             task.error_message = '任务被手动删除'
@@ -272,12 +278,13 @@ def get_pool_status():
             'active_tasks': video_processing_pool.get_active_tasks_count(),
             'pending_tasks': video_processing_pool.get_pending_tasks_count(),
             'max_workers': video_processing_pool.max_workers,
+            'express_workers': video_processing_pool.express_workers,
             'is_full': video_processing_pool.get_active_tasks_count() >= video_processing_pool.max_workers
         }
         
         # 获取正在处理的任务信息
         active_tasks = []
-        for task_id, task_info in video_processing_pool.current_tasks.items():
+        for task_id, task_info in video_processing_pool.get_active_tasks().items():
             # 查找任务记录
             task = VideoProcessingTask.query.filter_by(task_id=task_id).first()
             if task:
@@ -293,6 +300,24 @@ def get_pool_status():
                 })
         
         status['active_task_details'] = active_tasks
+
+        # 等待中任务的排队位置（按优先级与公平分组轮转的预计执行顺序）与预计开始时间
+        limit = request.args.get('queueLimit', 50, type=int)
+        queued_tasks = video_processing_pool.get_queue_positions(limit=min(max(limit, 1), 500))
+        videos = {video.id: video for video in Video.query.filter(
+            Video.id.in_({task_info['video_id'] for task_info in queued_tasks})
+        ).all()} if queued_tasks else {}
+        for task_info in queued_tasks:
+            video = videos.get(task_info['video_id'])
+            task_info['video_title'] = video.title if video else "未知视频"
+            task_info['video_id'] = str(task_info['video_id'])
+        status['queued_task_details'] = queued_tasks
+        
+        # 已加载模型的加载耗时与内存占用
+        status['models'] = model_registry.status()
+
+        # 各资源通道（CPU密集 / 网络请求）的并发占用
+        status['lanes'] = resource_lanes.status()
         
         return jsonify(Result.success(status))
     except Exception as e:
@@ -20,10 +20,13 @@ PROCESSING_THREADS = {}
 
 # 导入视频处理任务
 from tasks.video_processor.main_processor import process_video_task
+from tasks.video_processor.keyframe_engine import KEYFRAME_ENGINES
 from models.models import VideoProcessingTask
 from utils.auth import get_current_user_id as jwt_get_user_id
 from utils.auth import token_required
 from utils.video_processing_pool import video_processing_pool
+from utils.media_probe import probe_media_file, save_media_probe
+from utils.subtitle_parser import SUBTITLE_FORMATS, convert_subtitle_to_json
 
 upload_bp = Blueprint('uploads', __name__)
 
@@ -268,6 +271,9 @@ def upload_course_video():
         # 获取处理步骤选择参数
         processing_steps_str = request.form.get('processingSteps')
         preview_mode = request.form.get('previewMode', 'false').lower() == 'true'
+        keyframe_engine = request.form.get('keyframeEngine')
+        if keyframe_engine and keyframe_engine not in KEYFRAME_ENGINES:
+            return jsonify(Result.error(400, f"无效的关键帧提取引擎: {keyframe_engine}"))
         
         # 解析处理步骤
         processing_steps = None
@@ -285,14 +291,17 @@ def upload_course_video():
             except json.JSONDecodeError:
                 return jsonify(Result.error(400, "processingSteps格式错误"))
         
-        json_sub = None
-        
         if not all([course_id, title]):
             return jsonify(Result.error(400, "缺少必要参数"))
         
         file = request.files['file']
-        if 'json_sub' in request.files:
-            json_sub = request.files['json_sub']
+        # 字幕文件：支持 SRT、WebVTT、ASS/SSA 及 JSON 格式（json_sub 为旧字段名）
+        subtitle_file = request.files.get('subtitle') or request.files.get('json_sub')
+        subtitle_format = None
+        if subtitle_file and subtitle_file.filename:
+            subtitle_format = os.path.splitext(subtitle_file.filename)[1].lstrip('.').lower() or 'json'
+            if subtitle_format not in SUBTITLE_FORMATS:
+                return jsonify(Result.error(400, f"不支持的字幕格式: {subtitle_format}"))
         # 如果用户没有选择文件，浏览器可能会发送一个没有文件名的空文件部分
         if file.filename == '':
             return jsonify(Result.error(400, "未选择文件"))
@@ -304,8 +313,8 @@ def upload_course_video():
         # 保存文件并获取保存路径
         file_path = save_file(file, file_type='video')
         
-        # 如果有字幕文件，保存同名json文件
-        if json_sub:
+        # 如果有字幕文件，解析后保存为同名json文件，处理时直接读取字幕，跳过语音识别
+        if subtitle_format:
             # 获取视频文件名（不含扩展名）
             video_filename = os.path.splitext(os.path.basename(file_path))[0]
             # 构造json文件路径
@@ -314,27 +323,28 @@ def upload_course_video():
             
             # 保存json文件
             actual_json_path = os.path.join(os.getcwd(), json_path.lstrip('/'))
-            print(actual_json_path)
-            json_sub.save(actual_json_path)
+            try:
+                subtitle_count = convert_subtitle_to_json(subtitle_file.stream, subtitle_format, actual_json_path)
+                current_app.logger.info(f"已导入 {subtitle_count} 条字幕: {actual_json_path}")
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # 字幕无效时不保留已上传的视频文件
+                for path in (actual_json_path, os.path.join(os.getcwd(), file_path.lstrip('/'))):
+                    if os.path.exists(path):
+                        os.remove(path)
+                current_app.logger.error(f"解析字幕文件失败: {str(e)}")
+                return jsonify(Result.error(400, f"字幕文件解析失败: {str(e)}"))
         
         # 实际路径计算
         actual_file_path = os.path.join(os.getcwd(), file_path.lstrip('/'))
         
-        # 使用ffmpeg获取视频时长
+        # 使用ffprobe探测视频信息，结果在视频记录创建后缓存，处理任务不再重复探测
         try:
-            cmd = [
-                'ffprobe', 
-                '-v', 'error', 
-                '-show_entries', 'format=duration', 
-                '-of', 'json', 
-                actual_file_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            data = json.loads(result.stdout)
-            duration = int(float(data['format']['duration']))
-        except (subprocess.SubprocessError, json.JSONDecodeError, KeyError) as e:
+            media_info = probe_media_file(actual_file_path)
+            duration = int(media_info['duration'])
+        except RuntimeError as e:
             current_app.logger.error(f"获取视频时长失败: {str(e)}")
-            # 如果ffmpeg命令失败，使用默认时长
+            media_info = None
+            # 如果ffprobe命令失败，使用默认时长
             duration = 1800  # 默认30分钟
         
         # 生成视频封面图
@@ -379,9 +389,20 @@ def upload_course_video():
         )
         
         db.session.add(video)
-        db.session.commit()          # 创建视频处理任务
+        db.session.commit()
+        
+        # 缓存媒体探测结果
+        if media_info:
+            try:
+                save_media_probe(video.id, actual_file_path, media_info)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"保存媒体信息失败: {str(e)}")
+        
+        # 创建视频处理任务
         try:
-            task_id = f"task-{uuid.uuid4().hex[:8]}"
+            # 任务记录与队列中的任务使用同一个ID
+            task_id = video_processing_pool.new_task_id()
             
             # 根据preview_mode设置处理类型
             processing_type = "preview" if preview_mode else "all"
@@ -401,27 +422,25 @@ def upload_course_video():
             
             # 提交任务到线程池处理，不阻塞HTTP响应
             # 使用新的submit_task_with_params方法支持处理步骤和预览模式
-            if processing_steps is not None or preview_mode:
+            if processing_steps is not None or preview_mode or keyframe_engine:
                 task_id, stop_flag = video_processing_pool.submit_task_with_params(
                     current_app._get_current_object(), 
                     video.id, 
                     process_video_task,
                     processing_steps=processing_steps,
-                    preview_mode=preview_mode
+                    preview_mode=preview_mode,
+                    task_options={'keyframe_engine': keyframe_engine} if keyframe_engine else None,
+                    task_id=task_id
                 )
             else:
                 # 向后兼容：如果没有指定新参数，使用默认处理
                 task_id, stop_flag = video_processing_pool.submit_task(
                     current_app._get_current_object(), 
                     video.id, 
-                    process_video_task
+                    process_video_task,
+                    task_id=task_id
                 )
             
-            # 更新任务ID（如果线程池生成了新的ID）
-            if task.task_id != task_id:
-                task.task_id = task_id
-                db.session.commit()
-            
         except Exception as e:
             # 如果创建任务失败，记录日志但不中断上传
             current_app.logger.error(f"创建视频处理任务失败: {str(e)}")
@@ -774,6 +774,7 @@ def process_video(video_id):
     支持参数：
     - processing_steps: 要执行的步骤列表 (可选，默认全部)
     - preview_mode: 预览模式 (可选，默认false)
+    - priority: 优先级 (可选，express/high/normal/low；默认预览与单步骤任务为express，其余为normal；高于normal仅管理员可用)
     """
     try:
         # 检查权限
@@ -800,6 +801,16 @@ def process_video(video_id):
         data = request.get_json() or {}
         processing_steps = data.get('processing_steps')  # 可选参数，默认为None（全部步骤）
         preview_mode = data.get('preview_mode', False)  # 默认为False
+        keyframe_engine = data.get('keyframe_engine')  # 可选参数，默认使用配置中的关键帧提取引擎
+        priority = data.get('priority')  # 可选参数，默认按任务类型决定
+        
+        # 验证priority参数
+        from utils.durable_queue import PRIORITY_CLASSES, PRIORITY_NORMAL
+        if priority is not None:
+            if priority not in PRIORITY_CLASSES:
+                return jsonify(Result.error(400, f"无效的优先级: {priority}，可选: {list(PRIORITY_CLASSES.keys())}"))
+            if PRIORITY_CLASSES[priority] > PRIORITY_NORMAL and not Users.query.get(user_id).role == 'admin':
+                return jsonify(Result.error(403, "只有管理员可以提高任务优先级"))
         
         # 验证processing_steps参数
         valid_steps = ["keyframes", "ocr", "asr", "vector", "summary"]
@@ -810,6 +821,11 @@ def process_video(video_id):
                 if step not in valid_steps:
                     return jsonify(Result.error(400, f"无效的处理步骤: {step}，有效步骤: {valid_steps}"))
         
+        # 验证keyframe_engine参数
+        from tasks.video_processor.keyframe_engine import KEYFRAME_ENGINES
+        if keyframe_engine is not None and keyframe_engine not in KEYFRAME_ENGINES:
+            return jsonify(Result.error(400, f"无效的关键帧提取引擎: {keyframe_engine}，可选: {list(KEYFRAME_ENGINES.keys())}"))
+        
         # 检查是否存在正在进行的处理任务（非预览模式才检查）
         if not preview_mode:
             existing_task = VideoProcessingTask.query.filter_by(
@@ -826,8 +842,8 @@ def process_video(video_id):
         from models.models import TaskLog
         from utils.video_processing_pool import video_processing_pool
         
-        # 创建视频处理任务（非预览模式）
-        task_id = f"task-{uuid.uuid4().hex[:8]}"
+        # 创建视频处理任务（非预览模式），任务记录与队列中的任务使用同一个ID
+        task_id = video_processing_pool.new_task_id()
         if not preview_mode:
             processing_type = "custom" if processing_steps else "all"
             task = VideoProcessingTask(
@@ -848,14 +864,12 @@ def process_video(video_id):
             video.id, 
             process_video_task,
             processing_steps=processing_steps,
-            preview_mode=preview_mode
+            preview_mode=preview_mode,
+            task_options={'keyframe_engine': keyframe_engine} if keyframe_engine else None,
+            priority=priority,
+            task_id=task_id
         )
         
-        # 更新任务ID（如果线程池生成了新的ID且非预览模式）
-        if not preview_mode and task.task_id != task_id:
-            task.task_id = task_id
-            db.session.commit()
-        
         result_data = {
             "taskId": task_id,
             "pendingTasks": video_processing_pool.get_pending_tasks_count(),
@@ -865,6 +879,8 @@ def process_video(video_id):
         
         if processing_steps:
             result_data["processingSteps"] = processing_steps
+        if keyframe_engine:
+            result_data["keyframeEngine"] = keyframe_engine
         
         message = "视频预览处理任务已启动" if preview_mode else "视频处理任务已启动"
         return jsonify(Result.success(result_data, message))
@@ -909,3 +925,37 @@ def get_video_processing_status(video_id):
     except Exception as e:
         current_app.logger.error(f"获取视频处理状态失败: {str(e)}")
         return jsonify(Result.error(500, f"获取视频处理状态失败: {str(e)}"))
+
+@video_bp.route('/<video_id>/transcript', methods=['GET'])
+@token_required
+def get_video_transcript(video_id):
+    """
+    分页获取视频语音识别片段接口，可按时间窗口（start、end，单位秒）筛选
+    """
+    try:
+        video = Video.query.get(video_id)
+        if not video or video.is_deleted:
+            return jsonify(Result.error(404, "视频不存在"))
+        
+        # 获取查询参数
+        start_time = request.args.get('start', type=float)
+        end_time = request.args.get('end', type=float)
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_size = min(max(request.args.get('pageSize', 100, type=int), 1), 500)
+        
+        if start_time is not None and end_time is not None and end_time <= start_time:
+            return jsonify(Result.error(400, "结束时间必须大于开始时间"))
+        
+        from tasks.video_processor.db_handler import query_transcript_segments
+        total, segments = query_transcript_segments(video.id, start_time, end_time, page, page_size)
+        
+        return jsonify(Result.success({
+            "total": total,
+            "page": page,
+            "pageSize": page_size,
+            "list": segments
+        }, "获取语音识别片段成功"))
+        
+    except Exception as e:
+        current_app.logger.error(f"获取视频语音识别片段失败: {str(e)}")
+        return jsonify(Result.error(500, f"获取视频语音识别片段失败: {str(e)}"))
@@ -4,31 +4,49 @@
 """
 
 from .keyframe_extractor import extract_keyframes, is_significant_change
+from .keyframe_engine import KeyframeEngine, KEYFRAME_ENGINES, get_keyframe_engine
 from .ocr_processor import OCRProcessor
 from .asr_processor import ASRProcessor
+from .time_alignment import KeyframeTimeline
 from .vector_indexer import build_vector_index, check_vector_index_exists
 from .summary_generator import generate_video_summary, generate_section_summary, group_keyframes_into_sections
+from .artifact_cache import ArtifactCache, build_step_keys
 from .cache_manager import get_section_cache_key, check_section_cache, save_section_cache
-from .db_handler import save_keyframes_to_db, load_keyframes_from_db, check_video_summary_exists, check_video_processing_steps_status
+from .db_handler import save_keyframes_to_db, update_keyframe_columns, save_transcript_segments, query_transcript_segments, load_keyframes_from_db, check_video_summary_exists, check_video_processing_steps_status
 from .task_logger import add_task_log
+from .step_scheduler import StepScheduler, StepCancelled, ResourceLanes, resource_lanes
 from .main_processor import process_video_task
 
 __all__ = [
     'extract_keyframes', 
     'is_significant_change', 
+    'KeyframeEngine',
+    'KEYFRAME_ENGINES',
+    'get_keyframe_engine',
     'OCRProcessor',
     'ASRProcessor',
+    'KeyframeTimeline',
     'build_vector_index',
     'check_vector_index_exists',
     'generate_video_summary',
     'generate_section_summary',
     'group_keyframes_into_sections',
+    'ArtifactCache',
+    'build_step_keys',
     'get_section_cache_key',
     'check_section_cache',
-    'save_section_cache',    'save_keyframes_to_db',
+    'save_section_cache',
+    'save_keyframes_to_db',
+    'update_keyframe_columns',
+    'save_transcript_segments',
+    'query_transcript_segments',
     'load_keyframes_from_db',
     'check_video_summary_exists',
     'check_video_processing_steps_status',
     'add_task_log',
+    'StepScheduler',
+    'StepCancelled',
+    'ResourceLanes',
+    'resource_lanes',
     'process_video_task'
 ]
\ No newline at end of file
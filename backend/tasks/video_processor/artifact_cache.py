@@ -0,0 +1,353 @@
+"""
+处理步骤产物缓存模块
+按 (视频内容哈希, 步骤名称, 引擎与参数版本, 上游步骤的键) 计算每个步骤的缓存键，
+将关键帧列表（含图片）、OCR结果、ASR片段和向量索引保存在磁盘上。
+重新处理时键命中的步骤直接读取产物；某一步骤的参数变化只会改变该步骤及其下游步骤的键。
+缓存总大小受配置 ARTIFACT_CACHE_MAX_GB 限制，超出时按最近使用时间淘汰（也可运行 prune_artifact_cache.py 手动清理）。
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+import time
+import uuid
+from flask import current_app
+
+from utils.ocr_engine import CNOCR_REC_MODEL
+
+# 默认缓存目录
+ARTIFACT_CACHE_DIR = "artifact_cache"
+
+# 各步骤产物格式的版本号，步骤实现的输出发生变化时递增，使旧产物失效
+STEP_VERSIONS = {
+    "keyframes": 1,
+    "ocr": 1,
+    "asr": 1,
+    "align": 1,
+    "vector": 1
+}
+
+# 只影响速度、不影响产物内容的引擎参数，不计入缓存键
+PERFORMANCE_PARAMS = {"workers"}
+
+ARTIFACT_FILE = "artifact.json"
+FILES_DIR = "files"
+
+# 缓存总大小上限（GB）的默认值，0 表示不限制
+DEFAULT_MAX_GB = 20
+# 保存产物后自动淘汰的最短间隔（秒），淘汰需要遍历整个缓存目录
+AUTO_PRUNE_INTERVAL = 600
+
+
+def _json_default(value):
+    """序列化 numpy 数值等非标准类型"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def make_step_key(content_hash, step, params, upstream=()):
+    """
+    计算步骤的缓存键
+
+    参数:
+        content_hash: 视频内容哈希
+        step: 步骤名称
+        params: 影响产物内容的参数（可JSON序列化的字典）
+        upstream: 上游步骤的键（或上游数据的哈希）
+
+    返回:
+        str: 十六进制 SHA-256
+    """
+    payload = json.dumps({
+        "content": content_hash,
+        "step": step,
+        "version": STEP_VERSIONS.get(step, 1),
+        "params": params,
+        "upstream": list(upstream)
+    }, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def hash_keyframes_data(keyframes_data):
+    """计算关键帧数据的哈希，关键帧从数据库加载（本次未提取）时作为下游步骤的上游键"""
+    payload = json.dumps(keyframes_data, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_step_params(step, keyframe_engine=None):
+    """
+    返回影响步骤产物内容的引擎与参数
+
+    参数:
+        step: 步骤名称
+        keyframe_engine: 本次任务指定的关键帧提取引擎名称
+    """
+    config = current_app.config
+    if step == "keyframes":
+        from .keyframe_engine import get_keyframe_engine
+        engine = get_keyframe_engine(keyframe_engine)
+        params = {
+            key: value for key, value in vars(engine).items()
+            if key not in PERFORMANCE_PARAMS and isinstance(value, (str, int, float, bool, type(None)))
+        }
+        return {"engine": engine.name, **params}
+    if step == "ocr":
+        engine = config.get('OCR_ENGINE', 'cnocr').lower()
+        if engine == 'tencent':
+            return {"engine": engine}
+        return {"engine": engine, "model": CNOCR_REC_MODEL, "incremental": bool(config.get('OCR_INCREMENTAL', False))}
+    if step == "asr":
+        engine = config.get('ASR_ENGINE', 'whisper').lower()
+        params = {"engine": engine, "model": config.get('ASR_MODEL', 'base')}
+        if engine == 'faster-whisper':
+            params["compute_type"] = config.get('ASR_COMPUTE_TYPE', 'int8')
+        return params
+    if step == "align":
+        return {"mode": config.get('ASR_ALIGN_MODE', 'start')}
+    if step == "vector":
+        return {"model": "Pro/BAAI/bge-m3"}
+    return {}
+
+
+def build_step_keys(content_hash, processing_steps, keyframe_engine=None, keyframes_data=None, subtitle_path=None):
+    """
+    计算本次任务各步骤的缓存键
+
+    关键帧数据依次经过 keyframes → ocr → align 三个步骤，每个步骤以前一步的键为上游；
+    asr 只依赖视频内容（存在字幕文件时依赖字幕内容），向量索引以最终的关键帧数据为上游。
+
+    参数:
+        content_hash: 视频内容哈希
+        processing_steps: 本次执行的步骤列表
+        keyframe_engine: 关键帧提取引擎名称
+        keyframes_data: 不执行 keyframes 步骤时从数据库加载的关键帧数据
+        subtitle_path: 上传字幕转换得到的 JSON 文件路径，存在时 ASR 直接读取字幕
+
+    返回:
+        dict: 步骤名称 -> 缓存键
+    """
+    keys = {}
+    if "keyframes" in processing_steps:
+        state = keys["keyframes"] = make_step_key(content_hash, "keyframes", get_step_params("keyframes", keyframe_engine))
+    else:
+        state = hash_keyframes_data(keyframes_data or [])
+
+    if "ocr" in processing_steps:
+        state = keys["ocr"] = make_step_key(content_hash, "ocr", get_step_params("ocr"), [state])
+
+    if "asr" in processing_steps:
+        if subtitle_path and os.path.exists(subtitle_path):
+            from utils.media_probe import compute_file_hash
+            asr_params = {"engine": "json", "subtitle": compute_file_hash(subtitle_path)}
+        else:
+            asr_params = get_step_params("asr")
+        keys["asr"] = make_step_key(content_hash, "asr", asr_params)
+        state = keys["align"] = make_step_key(content_hash, "align", get_step_params("align"), [state, keys["asr"]])
+
+    if "vector" in processing_steps:
+        keys["vector"] = make_step_key(content_hash, "vector", get_step_params("vector"), [state])
+
+    return keys
+
+
+class ArtifactCache:
+    """
+    磁盘上的步骤产物缓存，每个产物保存在 <缓存目录>/<步骤>/<键前两位>/<键>/ 下
+
+    命中时更新产物 artifact.json 的修改时间作为最近使用时间，淘汰时先删除最久未使用的产物。
+    """
+
+    # 进程内上一次自动淘汰的时间
+    _last_prune = None
+    _prune_lock = threading.Lock()
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        """
+        参数:
+            cache_dir: 缓存目录，默认读取配置 ARTIFACT_CACHE_DIR
+            max_bytes: 缓存总大小上限（字节），默认读取配置 ARTIFACT_CACHE_MAX_GB（默认20GB），0 表示不限制
+        """
+        self.cache_dir = cache_dir or current_app.config.get('ARTIFACT_CACHE_DIR', ARTIFACT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(current_app.config.get('ARTIFACT_CACHE_MAX_GB', DEFAULT_MAX_GB) * 1024 ** 3)
+        self.max_bytes = max_bytes
+
+    def _path(self, step, key):
+        return os.path.join(self.cache_dir, step, key[:2], key)
+
+    def load(self, step, key, restore_to=None):
+        """
+        读取步骤产物
+
+        参数:
+            step: 步骤名称
+            key: 缓存键
+            restore_to: 将产物附带的文件复制到该目录，目录中不属于产物的旧文件（如上次提取多出的关键帧图片）会被删除
+
+        返回:
+            产物数据，未命中时返回None
+        """
+        path = self._path(step, key)
+        artifact_file = os.path.join(path, ARTIFACT_FILE)
+        if not os.path.exists(artifact_file):
+            return None
+        try:
+            with open(artifact_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            files_dir = os.path.join(path, FILES_DIR)
+            if restore_to and os.path.isdir(files_dir):
+                self._clear_stale_files(restore_to, set(os.listdir(files_dir)))
+                shutil.copytree(files_dir, restore_to, dirs_exist_ok=True)
+            # 记录最近使用时间
+            os.utime(artifact_file)
+            return data
+        except (OSError, ValueError) as e:
+            current_app.logger.warning(f"读取步骤产物缓存失败 ({step}/{key[:12]}): {str(e)}")
+            return None
+
+    def save(self, step, key, data, files_from=None, file_names=None):
+        """
+        保存步骤产物
+
+        先写入临时目录再整体重命名，并发任务写入同一个键时只保留先完成的一份。
+
+        参数:
+            step: 步骤名称
+            key: 缓存键
+            data: 可JSON序列化的产物数据
+            files_from: 产物附带文件所在目录
+            file_names: 需要保存的文件名列表，为None时保存整个目录
+
+        返回:
+            bool: 是否保存成功
+        """
+        path = self._path(step, key)
+        if os.path.exists(os.path.join(path, ARTIFACT_FILE)):
+            return True
+
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+        try:
+            os.makedirs(tmp_path)
+            if files_from:
+                files_dir = os.path.join(tmp_path, FILES_DIR)
+                if file_names is None:
+                    shutil.copytree(files_from, files_dir)
+                else:
+                    os.makedirs(files_dir)
+                    for file_name in file_names:
+                        shutil.copy2(os.path.join(files_from, file_name), os.path.join(files_dir, file_name))
+
+            with open(os.path.join(tmp_path, ARTIFACT_FILE), 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, default=_json_default)
+
+            os.rename(tmp_path, path)
+        except OSError as e:
+            if os.path.exists(os.path.join(path, ARTIFACT_FILE)):
+                return True
+            current_app.logger.warning(f"保存步骤产物缓存失败 ({step}/{key[:12]}): {str(e)}")
+            return False
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        self._auto_prune()
+        return True
+
+    @staticmethod
+    def _clear_stale_files(directory, keep):
+        """删除目录中不在 keep 内的文件，子目录保留"""
+        if not os.path.isdir(directory):
+            return
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name not in keep:
+                os.remove(entry.path)
+
+    def _auto_prune(self):
+        """保存产物后按大小上限淘汰，同一进程内至少间隔 AUTO_PRUNE_INTERVAL 秒"""
+        if not self.max_bytes:
+            return
+        with ArtifactCache._prune_lock:
+            if ArtifactCache._last_prune is not None and time.monotonic() - ArtifactCache._last_prune < AUTO_PRUNE_INTERVAL:
+                return
+            ArtifactCache._last_prune = time.monotonic()
+        try:
+            removed, freed = self.prune()
+        except OSError as e:
+            current_app.logger.warning(f"淘汰步骤产物缓存失败: {str(e)}")
+            return
+        if removed:
+            current_app.logger.info(f"淘汰 {removed} 个步骤产物缓存，释放 {freed / 1024 ** 2:.1f} MB")
+
+    def list_artifacts(self):
+        """
+        列出缓存中的所有产物
+
+        返回:
+            [(最近使用时间, 大小（字节）, 产物目录), ...]，按最近使用时间从早到晚排序
+        """
+        artifacts = []
+        if not os.path.isdir(self.cache_dir):
+            return artifacts
+        for step_entry in os.scandir(self.cache_dir):
+            if not step_entry.is_dir():
+                continue
+            for prefix_entry in os.scandir(step_entry.path):
+                if not prefix_entry.is_dir():
+                    continue
+                for entry in os.scandir(prefix_entry.path):
+                    # 跳过正在写入的临时目录
+                    if not entry.is_dir() or '.tmp-' in entry.name:
+                        continue
+                    try:
+                        last_used = os.path.getmtime(os.path.join(entry.path, ARTIFACT_FILE))
+                    except OSError:
+                        continue
+                    size = 0
+                    for root, _, files in os.walk(entry.path):
+                        for file_name in files:
+                            try:
+                                size += os.path.getsize(os.path.join(root, file_name))
+                            except OSError:
+                                pass
+                    artifacts.append((last_used, size, entry.path))
+        artifacts.sort()
+        return artifacts
+
+    def prune(self, max_bytes=None, max_age_days=None, dry_run=False):
+        """
+        淘汰产物：先删除超过 max_age_days 天未使用的产物，再按最近使用时间从早到晚删除，直到总大小不超过 max_bytes
+
+        产物目录先重命名再删除，正在读取的任务只会得到未命中，不会读到不完整的产物。
+
+        参数:
+            max_bytes: 缓存总大小上限（字节），默认使用构造时的上限，0 表示不限制
+            max_age_days: 最长保留天数，为None时不按时间淘汰
+            dry_run: 只统计将被删除的产物，不实际删除
+
+        返回:
+            (删除的产物数, 释放的字节数)
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        artifacts = self.list_artifacts()
+        total = sum(size for _, size, _ in artifacts)
+        expire_before = time.time() - max_age_days * 24 * 3600 if max_age_days is not None else None
+
+        removed = freed = 0
+        for last_used, size, path in artifacts:
+            expired = expire_before is not None and last_used < expire_before
+            if not expired and (not max_bytes or total <= max_bytes):
+                break
+            if not dry_run:
+                trash_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+                try:
+                    os.rename(path, trash_path)
+                except OSError:
+                    continue
+                shutil.rmtree(trash_path, ignore_errors=True)
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
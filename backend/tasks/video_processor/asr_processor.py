@@ -7,7 +7,8 @@ import os
 import subprocess
 import shutil
 from flask import current_app
-from utils.asr_engine import WhisperASREngine,JsonASREngine
+from utils.asr_engine import JsonASREngine, get_asr_engine
+from .time_alignment import KeyframeTimeline, ALIGN_BY_START
 
 class ASRProcessor:
     """ASR处理器类"""
@@ -17,32 +18,49 @@ class ASRProcessor:
         初始化ASR处理器
         
         参数:
-            asr_engine: ASR引擎实例，默认为None，将使用Whisper引擎
+            asr_engine: ASR引擎实例，默认为None，将根据配置 ASR_ENGINE 选择引擎（首次识别时才加载）
         """
-        self.asr_engine = asr_engine or WhisperASREngine()
-        
-    def perform_asr(self, video_path):
+        self._asr_engine = asr_engine
+
+    @property
+    def asr_engine(self):
+        if self._asr_engine is None:
+            self._asr_engine = get_asr_engine()
+        return self._asr_engine
+
+    @asr_engine.setter
+    def asr_engine(self, engine):
+        self._asr_engine = engine
+
+    def perform_asr(self, video_path, media_info=None, stop_flag=None):
         """
         对视频进行语音识别
         
         参数:
             video_path: 视频文件路径
+            media_info: 缓存的媒体信息，已知视频没有音频流时跳过语音识别
+            stop_flag: 停止标志(threading.Event)，置位后引擎尽快结束识别
             
         返回:
-            ASR结果列表
+            ASR结果列表，没有语音时为空列表；识别失败、中途停止或视频没有音频时为None
         """
-        json_path = video_path.replace('.mp4', '.json')
+        json_path = os.path.splitext(video_path)[0] + '.json'
         if os.path.exists(json_path):
             self.asr_engine=JsonASREngine()
-        return self.asr_engine.perform_asr(video_path)
+        elif media_info and not media_info.get('has_audio'):
+            current_app.logger.warning(f"视频没有音频流，跳过语音识别: {video_path}")
+            return None
+        return self.asr_engine.perform_asr(video_path, stop_flag)
     
-    def assign_asr_to_keyframes(self, keyframes_data, asr_result):
+    def assign_asr_to_keyframes(self, keyframes_data, asr_result, mode=None):
         """
         将ASR结果分配给对应的关键帧
         
         参数:
             keyframes_data: 关键帧数据列表
             asr_result: ASR结果列表
+            mode: 分配方式，"start" 分配给语音开始时正在显示的关键帧，
+                  "overlap" 分配给与语音段重叠最长的关键帧，默认读取配置 ASR_ALIGN_MODE
             
         返回:
             处理后的关键帧数据列表
@@ -50,35 +68,13 @@ class ASRProcessor:
         if not asr_result:
             return keyframes_data
         
-        # 初始化每个关键帧的ASR文本列表
-        for frame in keyframes_data:
-            frame["asr_texts_raw"] = []
-        
-        # 按照时间点给关键帧排序
-        sorted_keyframes = sorted(keyframes_data, key=lambda x: x["time_point"])
-        
-        # 遍历每个ASR结果，分配到对应的关键帧
-        for segment in asr_result:
-            asr_start_time = segment["start"]
-            
-            # 找到最后一个时间点小于语音开始时间的关键帧
-            last_frame_before_speech = None
-            for frame in sorted_keyframes:
-                if frame["time_point"] <= asr_start_time:
-                    last_frame_before_speech = frame
-                else:
-                    break
-            
-            # 分配语音段到对应的关键帧
-            if last_frame_before_speech:
-                last_frame_before_speech["asr_texts_raw"].append(segment)
-            elif sorted_keyframes:
-                # 如果所有关键帧都在语音段之后，分配给第一个关键帧
-                sorted_keyframes[0]["asr_texts_raw"].append(segment)
+        mode = mode or current_app.config.get('ASR_ALIGN_MODE', ALIGN_BY_START)
+        timeline = KeyframeTimeline(keyframes_data)
+        groups = timeline.assign_segments(asr_result, mode=mode)
         
         # 生成每个关键帧的ASR文本
-        for frame in keyframes_data:
-            # 将ASR文本提取到asr_texts列表中
-            frame["asr_texts"] = "  ".join([item["text"] for item in frame["asr_texts_raw"]])
+        for frame, segments in zip(timeline.keyframes, groups):
+            frame["asr_texts_raw"] = segments
+            frame["asr_texts"] = "  ".join(segment["text"] for segment in segments)
         
-        return keyframes_data
\ No newline at end of file
+        return keyframes_data
@@ -3,37 +3,51 @@
 负责与数据库交互，保存和加载视频处理相关数据
 """
 
+import json
 from flask import current_app
-from models.models import db, VideoKeyframe, VideoVectorIndex, VideoSummary
+from sqlalchemy import bindparam
+from models.models import db, VideoKeyframe, VideoVectorIndex, VideoSummary, VideoTranscriptSegment
 
-def save_keyframes_to_db(video_id, keyframes_data):
+# 批量写入关键帧时每批的行数
+KEYFRAME_BATCH_SIZE = 500
+# 批量写入语音识别片段时每批的行数
+TRANSCRIPT_INSERT_BATCH_SIZE = 1000
+
+def _keyframe_mapping(video_id, keyframe):
+    """将关键帧数据转换为批量写入使用的列映射"""
+    mapping = {
+        "video_id": video_id,
+        "frame_number": keyframe["frame_number"],
+        "time_point": keyframe["time_point"],
+        "time_formatted": keyframe["time_formatted"],
+        "file_name": keyframe["file_name"],
+        "phash": keyframe.get("phash"),
+        "asr_texts": keyframe.get("asr_texts", "")
+    }
+    if "ocr_result" in keyframe:
+        mapping["ocr_result"] = json.dumps(keyframe["ocr_result"], ensure_ascii=False)
+        mapping["ocr_result_raw"] = json.dumps(keyframe.get("ocr_result_raw", []), ensure_ascii=False)
+    return mapping
+
+def save_keyframes_to_db(video_id, keyframes_data, replace=True):
     """
-    将关键帧数据保存到数据库
+    将关键帧数据批量保存到数据库
     
     参数:
         video_id: 视频ID
         keyframes_data: 关键帧数据列表
+        replace: 是否先删除该视频已有的关键帧，删除与插入在同一事务中完成
         
     返回:
         success: 是否保存成功
     """
     try:
-        for keyframe in keyframes_data:
-            # 创建关键帧记录
-            db_keyframe = VideoKeyframe(
-                video_id=video_id,
-                frame_number=keyframe["frame_number"],
-                time_point=keyframe["time_point"],
-                time_formatted=keyframe["time_formatted"],
-                file_name=keyframe["file_name"],
-                asr_texts=keyframe.get("asr_texts", "")
-            )
-            
-            # 设置OCR结果
-            if "ocr_result" in keyframe:
-                db_keyframe.set_ocr_result(keyframe["ocr_result"])
-            
-            db.session.add(db_keyframe)
+        if replace:
+            VideoKeyframe.query.filter_by(video_id=video_id).delete()
+        
+        rows = [_keyframe_mapping(video_id, keyframe) for keyframe in keyframes_data]
+        for i in range(0, len(rows), KEYFRAME_BATCH_SIZE):
+            db.session.bulk_insert_mappings(VideoKeyframe, rows[i:i + KEYFRAME_BATCH_SIZE])
         
         db.session.commit()
         return True
@@ -42,6 +56,47 @@ def save_keyframes_to_db(video_id, keyframes_data):
         current_app.logger.error(f"保存关键帧数据到数据库失败: {str(e)}")
         return False
 
+def update_keyframe_columns(video_id, keyframes_data, columns):
+    """
+    按 (video_id, file_name) 批量更新关键帧的指定列，其余列保持不变
+    
+    帧号不能作为匹配键：视频帧率未知时所有关键帧的帧号都为0，取整也可能使相邻关键帧帧号相同；
+    关键帧图片文件名在同一视频内按序号生成，不会重复。
+    
+    用于OCR、ASR等只产生部分列的步骤，所有更新以 executemany 方式在同一事务中执行。
+    
+    参数:
+        video_id: 视频ID
+        keyframes_data: 关键帧数据列表
+        columns: 要更新的列名列表，如 ["ocr_result", "ocr_result_raw"]、["asr_texts"]
+        
+    返回:
+        success: 是否更新成功
+    """
+    try:
+        table = VideoKeyframe.__table__
+        stmt = table.update() \
+            .where(table.c.video_id == bindparam("b_video_id")) \
+            .where(table.c.file_name == bindparam("b_file_name")) \
+            .values({column: bindparam(f"v_{column}") for column in columns})
+        
+        params = []
+        for keyframe in keyframes_data:
+            mapping = _keyframe_mapping(video_id, keyframe)
+            row = {"b_video_id": video_id, "b_file_name": keyframe["file_name"]}
+            row.update({f"v_{column}": mapping.get(column) for column in columns})
+            params.append(row)
+        
+        for i in range(0, len(params), KEYFRAME_BATCH_SIZE):
+            db.session.execute(stmt, params[i:i + KEYFRAME_BATCH_SIZE])
+        
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"更新关键帧数据失败: {str(e)}")
+        return False
+
 def load_keyframes_from_db(video_id, include_ocr=True, include_asr=True):
     """
     从数据库加载视频关键帧数据
@@ -70,7 +125,8 @@ def load_keyframes_from_db(video_id, include_ocr=True, include_asr=True):
                 "frame_number": kf.frame_number,
                 "time_point": kf.time_point,
                 "time_formatted": kf.time_formatted,
-                "file_name": kf.file_name
+                "file_name": kf.file_name,
+                "phash": kf.phash
             }
             
             # 加载OCR结果
@@ -79,6 +135,10 @@ def load_keyframes_from_db(video_id, include_ocr=True, include_asr=True):
                     keyframe_data["ocr_result"] = kf.get_ocr_result()
                 except:
                     keyframe_data["ocr_result"] = []
+                try:
+                    keyframe_data["ocr_result_raw"] = kf.get_ocr_result_raw()
+                except:
+                    keyframe_data["ocr_result_raw"] = []
             
             # 加载ASR结果
             if include_asr:
@@ -91,6 +151,79 @@ def load_keyframes_from_db(video_id, include_ocr=True, include_asr=True):
         current_app.logger.error(f"从数据库加载关键帧数据失败: {str(e)}")
         return []
 
+def save_transcript_segments(video_id, asr_result):
+    """
+    将语音识别片段批量保存到数据库，替换该视频已有的片段
+    
+    参数:
+        video_id: 视频ID
+        asr_result: ASR结果列表，每项包含 start、end、text
+        
+    返回:
+        success: 是否保存成功
+    """
+    try:
+        VideoTranscriptSegment.query.filter_by(video_id=video_id).delete()
+        
+        rows = [
+            {
+                "video_id": video_id,
+                "seq": seq,
+                "start": float(segment["start"]),
+                "end": float(segment.get("end", segment["start"])),
+                "text": segment.get("text", "").strip()
+            }
+            for seq, segment in enumerate(sorted(asr_result or [], key=lambda x: x["start"]))
+        ]
+        # 分批执行多行插入，避免逐条构造ORM对象
+        for i in range(0, len(rows), TRANSCRIPT_INSERT_BATCH_SIZE):
+            db.session.bulk_insert_mappings(VideoTranscriptSegment, rows[i:i + TRANSCRIPT_INSERT_BATCH_SIZE])
+        
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"保存语音识别片段到数据库失败: {str(e)}")
+        return False
+
+def query_transcript_segments(video_id, start_time=None, end_time=None, page=1, page_size=100):
+    """
+    按时间窗口分页查询语音识别片段
+    
+    返回与 [start_time, end_time) 有重叠的片段，按开始时间排序。
+    片段之间可能重叠（如字幕文件中同时显示的多条字幕），与 start_time 重叠的片段不一定是它之前的最后一个片段；
+    与 start_time 重叠的片段开始时间一定不早于 start_time 减去该视频最长片段的时长，
+    以此作为 (video_id, start) 索引范围扫描的下界，再用 end > start_time 过滤。
+    
+    参数:
+        video_id: 视频ID
+        start_time: 时间窗口开始（秒），为None表示从头开始
+        end_time: 时间窗口结束（秒），为None表示到结尾
+        page: 页码，从1开始
+        page_size: 每页条数
+        
+    返回:
+        (total, segments): 总条数与当前页的片段列表
+    """
+    query = VideoTranscriptSegment.query.filter(VideoTranscriptSegment.video_id == video_id)
+    
+    if start_time is not None:
+        max_duration = db.session.query(db.func.max(VideoTranscriptSegment.end - VideoTranscriptSegment.start)) \
+            .filter(VideoTranscriptSegment.video_id == video_id) \
+            .scalar() or 0
+        query = query.filter(VideoTranscriptSegment.start >= start_time - max_duration)
+        query = query.filter(VideoTranscriptSegment.end > start_time)
+    
+    if end_time is not None:
+        query = query.filter(VideoTranscriptSegment.start < end_time)
+    
+    total = query.count()
+    segments = query.order_by(VideoTranscriptSegment.start, VideoTranscriptSegment.seq) \
+        .offset((page - 1) * page_size) \
+        .limit(page_size) \
+        .all()
+    return total, [segment.to_dict() for segment in segments]
+
 def check_video_summary_exists(video_id):
     """
     检查视频摘要是否存在
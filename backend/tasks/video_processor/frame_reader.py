@@ -0,0 +1,227 @@
+"""
+帧读取模块
+负责通过ffmpeg管道读取原始视频帧，避免中间图片文件的磁盘读写
+"""
+
+import re
+import queue
+import subprocess
+import threading
+import numpy as np
+
+from .step_scheduler import StepCancelled
+
+# showinfo 滤镜输出格式示例: "n:   0 pts:      0 pts_time:0       ..."
+SHOWINFO_PATTERN = re.compile(r'n:\s*(\d+)\s+pts:\s*(-?\d+)\s+pts_time:\s*(-?[\d.]+)')
+# 滤镜链中第一个滤镜的日志前缀，用于区分滤镜链开头与末尾的两个 showinfo
+FIRST_FILTER_PREFIX = '[Parsed_showinfo_0 @'
+
+# 每种像素格式对应的通道数
+PIX_FMT_CHANNELS = {
+    'bgr24': 3,
+    'rgb24': 3,
+    'gray': 1
+}
+
+
+class FFmpegFrameReader:
+    """
+    ffmpeg原始帧读取器
+
+    ffmpeg将经过滤镜的帧以rawvideo格式写入stdout，同时在滤镜链末尾追加showinfo，
+    从stderr解析每一帧的pts_time，两者按顺序一一对应。
+    迭代时依次产出 (time_point, frame) ，time_point 为视频内的绝对时间（秒），frame为 numpy.ndarray。
+    frame_numbers 为True时在滤镜链开头再加一个 showinfo 记录每个解码帧的序号，
+    迭代产出 (time_point, frame_number, frame)，帧号不受 select 丢帧的影响，可变帧率视频也准确。
+    指定 stop_flag 时由后台线程监视，置位后立即终止ffmpeg进程（即使它正在解码大段被 select 丢弃的帧、
+    迟迟没有输出），迭代随即抛出 StepCancelled。
+    """
+
+    def __init__(self, video_path, width, height, video_filter=None, pix_fmt='bgr24',
+                 start_time=None, end_time=None, max_frames=None, frame_numbers=False, stop_flag=None):
+        """
+        初始化帧读取器
+
+        参数:
+            video_path: 视频文件路径
+            width: 输出帧宽度（需与滤镜输出一致）
+            height: 输出帧高度（需与滤镜输出一致）
+            video_filter: 额外的ffmpeg视频滤镜，如 "select='eq(pict_type\\,I)'"
+            pix_fmt: 输出像素格式，支持 bgr24、rgb24、gray
+            start_time: 起始时间（秒），通过输入端 -ss 精确定位
+            end_time: 结束时间（秒），通过输入端 -to 截止
+            max_frames: 最多输出的帧数
+            frame_numbers: 是否同时产出解码帧的序号（从定位点开始计数）
+            stop_flag: 停止标志(threading.Event)，置位后终止ffmpeg进程
+        """
+        if pix_fmt not in PIX_FMT_CHANNELS:
+            raise ValueError(f"不支持的像素格式: {pix_fmt}")
+
+        self.video_path = video_path
+        self.width = int(width)
+        self.height = int(height)
+        self.video_filter = video_filter
+        self.pix_fmt = pix_fmt
+        self.channels = PIX_FMT_CHANNELS[pix_fmt]
+        self.frame_size = self.width * self.height * self.channels
+        self.start_time = start_time or 0.0
+        self.end_time = end_time
+        self.max_frames = max_frames
+        self.frame_numbers = frame_numbers
+        self.stop_flag = stop_flag
+
+        self._process = None
+        self._stderr_thread = None
+        self._pts_queue = queue.Queue()
+        self._stderr_tail = []
+
+    def _build_command(self):
+        """构建ffmpeg命令"""
+        filters = ['showinfo'] if self.frame_numbers else []
+        if self.video_filter:
+            filters.append(self.video_filter)
+        filters.append('showinfo')
+
+        cmd = ['ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'info']
+        # 输入端定位：ffmpeg 会解码到 start_time 并丢弃之前的帧，输出时间戳从0开始
+        if self.start_time > 0:
+            cmd += ['-ss', f"{self.start_time:.6f}"]
+        if self.end_time is not None:
+            cmd += ['-to', f"{self.end_time:.6f}"]
+        cmd += ['-i', self.video_path, '-an', '-sn', '-vf', ','.join(filters), '-vsync', 'vfr']
+        if self.max_frames is not None:
+            cmd += ['-frames:v', str(self.max_frames)]
+        cmd += ['-f', 'rawvideo', '-pix_fmt', self.pix_fmt, 'pipe:1']
+        return cmd
+
+    def _read_stderr(self):
+        """后台线程：持续读取stderr，解析showinfo输出的时间戳"""
+        # 滤镜链开头的 showinfo 记录的解码帧序号，按 pts 等待对应的输出帧
+        decoded = {}
+        for raw_line in iter(self._process.stderr.readline, b''):
+            line = raw_line.decode('utf-8', errors='ignore')
+            match = SHOWINFO_PATTERN.search(line)
+            if match and self.frame_numbers and FIRST_FILTER_PREFIX in line:
+                decoded[int(match.group(2))] = int(match.group(1))
+            elif match:
+                pts = int(match.group(2))
+                frame_number = decoded.pop(pts, None)
+                if self.frame_numbers:
+                    # 输出帧按时间顺序产生，更早的解码帧已被 select 丢弃
+                    for stale in [key for key in decoded if key < pts]:
+                        del decoded[stale]
+                self._pts_queue.put((pts, float(match.group(3)), frame_number))
+            else:
+                # 保留最后几行，便于出错时定位
+                self._stderr_tail.append(line.rstrip())
+                if len(self._stderr_tail) > 20:
+                    self._stderr_tail.pop(0)
+        # 结束标记
+        self._pts_queue.put(None)
+
+    def open(self):
+        """启动ffmpeg进程"""
+        self._process = subprocess.Popen(
+            self._build_command(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=self.frame_size
+        )
+        self._stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_thread.start()
+        if self.stop_flag is not None:
+            threading.Thread(target=self._watch_stop_flag, args=(self._process,), daemon=True).start()
+        return self
+
+    def _watch_stop_flag(self, process):
+        """后台线程：停止标志置位后终止ffmpeg进程，进程结束后退出"""
+        while process.poll() is None:
+            if self.stop_flag.wait(0.5):
+                if process.poll() is None:
+                    process.kill()
+                return
+
+    def _check_stopped(self):
+        if self.stop_flag is not None and self.stop_flag.is_set():
+            raise StepCancelled()
+
+    def close(self):
+        """终止ffmpeg进程并回收资源"""
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.stdout.close()
+        self._process.wait()
+        if self._stderr_thread is not None:
+            self._stderr_thread.join(timeout=5)
+        self._process.stderr.close()
+        self._process = None
+
+    @property
+    def returncode(self):
+        return self._process.returncode if self._process else None
+
+    @property
+    def error_output(self):
+        """ffmpeg最后输出的非showinfo日志"""
+        return "\n".join(self._stderr_tail)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __iter__(self):
+        if self._process is None:
+            self.open()
+
+        shape = (self.height, self.width) if self.channels == 1 else (self.height, self.width, self.channels)
+        while True:
+            self._check_stopped()
+            buffer = self._process.stdout.read(self.frame_size)
+            if not buffer or len(buffer) < self.frame_size:
+                break
+
+            # showinfo日志与帧数据同步产生，等待对应的时间戳
+            try:
+                pts_info = self._pts_queue.get(timeout=30)
+            except queue.Empty:
+                pts_info = None
+            if pts_info is None:
+                raise RuntimeError(f"无法获取帧时间戳: {self.error_output}")
+
+            frame = np.frombuffer(buffer, dtype=np.uint8).reshape(shape)
+            # 定位后的时间戳相对于 start_time，换算回视频内的绝对时间
+            time_point = round(self.start_time + pts_info[1], 6)
+            if self.frame_numbers:
+                yield time_point, pts_info[2], frame
+            else:
+                yield time_point, frame
+
+        self._process.wait()
+        # 被停止标志终止的进程没有完整输出，不作为读取失败处理
+        self._check_stopped()
+        if self._process.returncode not in (0, None):
+            raise RuntimeError(f"ffmpeg 读取帧失败 (返回码 {self._process.returncode}): {self.error_output}")
+
+
+def grab_frame(video_path, time_point, fps, width, height, pix_fmt='bgr24', video_filter=None, stop_flag=None):
+    """
+    精确读取指定时间点的单帧
+
+    定位到目标时间点前半帧处，输入端精确定位会返回第一帧 pts >= 定位点的帧，即目标帧。
+
+    返回:
+        numpy.ndarray 或 None（读取失败时）
+    """
+    half_frame = 0.5 / fps if fps and fps > 0 else 0.0
+    start_time = max(0.0, time_point - half_frame)
+    reader = FFmpegFrameReader(video_path, width, height, video_filter=video_filter,
+                               pix_fmt=pix_fmt, start_time=start_time, max_frames=1, stop_flag=stop_flag)
+    with reader:
+        for _, frame in reader:
+            return frame.copy()
+    return None
@@ -0,0 +1,108 @@
+"""
+关键帧提取引擎模块
+定义可插拔的关键帧提取引擎接口，可按任务或通过配置 KEYFRAME_ENGINE 选择
+"""
+
+from abc import ABC, abstractmethod
+from flask import current_app
+
+from .keyframe_extractor import extract_keyframes, extract_keyframes_adaptive, extract_keyframes_scene
+
+DEFAULT_KEYFRAME_ENGINE = 'iframe-phash'
+
+class KeyframeEngine(ABC):
+    """关键帧提取引擎基类"""
+
+    name = None
+
+    @abstractmethod
+    def extract_keyframes(self, video_path, output_folder, media_info=None, stop_flag=None):
+        """
+        从视频中提取关键帧
+
+        参数:
+            video_path: 视频文件路径
+            output_folder: 关键帧输出目录
+            media_info: 缓存的媒体信息（见 utils.media_probe.get_media_info），为None时从视频文件读取
+            stop_flag: 停止标志(threading.Event)，置位后终止正在运行的ffmpeg进程并抛出 StepCancelled
+
+        返回:
+            (keyframes_data, fps, total_frames)
+            keyframes_data 中每项包含 id、frame_number、time_point、time_formatted、file_name
+        """
+        pass
+
+class IFramePhashEngine(KeyframeEngine):
+    """基于 I 帧 + 感知哈希去重的关键帧提取引擎"""
+
+    name = 'iframe-phash'
+
+    def __init__(self, similarity_threshold=10, workers=None):
+        self.similarity_threshold = similarity_threshold
+        self.workers = workers if workers is not None else current_app.config.get('KEYFRAME_WORKERS', 1)
+
+    def extract_keyframes(self, video_path, output_folder, media_info=None, stop_flag=None):
+        return extract_keyframes(
+            video_path,
+            output_folder,
+            similarity_threshold=self.similarity_threshold,
+            workers=self.workers,
+            media_info=media_info,
+            stop_flag=stop_flag
+        )
+
+class AdaptiveSSIMEngine(KeyframeEngine):
+    """基于自适应采样 + 二分查找 SSIM 变化点的关键帧提取引擎"""
+
+    name = 'adaptive-ssim'
+
+    def __init__(self, threshold=None, frame_skip=None, initial_step=None):
+        self.threshold = threshold if threshold is not None else current_app.config.get('KEYFRAME_SSIM_THRESHOLD', 0.90)
+        self.frame_skip = frame_skip if frame_skip is not None else current_app.config.get('KEYFRAME_FRAME_SKIP', 5)
+        self.initial_step = initial_step if initial_step is not None else current_app.config.get('KEYFRAME_INITIAL_STEP', 8)
+
+    def extract_keyframes(self, video_path, output_folder, media_info=None, stop_flag=None):
+        return extract_keyframes_adaptive(
+            video_path,
+            output_folder,
+            threshold=self.threshold,
+            frame_skip=self.frame_skip,
+            initial_step=self.initial_step,
+            media_info=media_info,
+            stop_flag=stop_flag
+        )
+
+class SceneDetectEngine(KeyframeEngine):
+    """基于 ffmpeg 场景变化检测的关键帧提取引擎，适合幻灯片类讲课视频"""
+
+    name = 'ffmpeg-scene'
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold if threshold is not None else current_app.config.get('KEYFRAME_SCENE_THRESHOLD', 0.3)
+
+    def extract_keyframes(self, video_path, output_folder, media_info=None, stop_flag=None):
+        return extract_keyframes_scene(video_path, output_folder, threshold=self.threshold, media_info=media_info,
+                                       stop_flag=stop_flag)
+
+# 引擎名称到实现类的映射
+KEYFRAME_ENGINES = {
+    IFramePhashEngine.name: IFramePhashEngine,
+    AdaptiveSSIMEngine.name: AdaptiveSSIMEngine,
+    SceneDetectEngine.name: SceneDetectEngine
+}
+
+def get_keyframe_engine(engine_name=None):
+    """
+    获取关键帧提取引擎实例
+
+    参数:
+        engine_name: 引擎名称，为None时使用配置 KEYFRAME_ENGINE，默认 iframe-phash
+
+    返回:
+        KeyframeEngine 实例
+    """
+    engine_name = (engine_name or current_app.config.get('KEYFRAME_ENGINE', DEFAULT_KEYFRAME_ENGINE)).lower()
+    engine_class = KEYFRAME_ENGINES.get(engine_name)
+    if engine_class is None:
+        raise ValueError(f"未知的关键帧提取引擎: {engine_name}，可选: {list(KEYFRAME_ENGINES.keys())}")
+    return engine_class()
@@ -5,13 +5,71 @@
 
 import os
 import cv2
+import multiprocessing
 import subprocess
 import shutil
-import imagehash
-from PIL import Image
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from skimage.metrics import structural_similarity as ssim
 from flask import current_app
 
+from utils.phash_util import batch_phash, dedup_hashes, downscale_frame, hash_to_hex
+from .frame_reader import FFmpegFrameReader, grab_frame
+from .step_scheduler import StepCancelled
+
+# ffmpeg 选择 I 帧的滤镜表达式
+IFRAME_SELECT_FILTER = "select='eq(pict_type\\,I)'"
+
+# 关键帧图片的保存目录，每个视频一个子目录
+KEYFRAMES_OUTPUT_DIR = "temp_keyframes"
+
+# 从文件读取缩略灰度图时的哈希批大小
+HASH_BATCH_SIZE = 256
+# 流式模式下的哈希批大小（批内只暂存低分辨率灰度帧）
+STREAM_BATCH_SIZE = 256
+# 变化检测使用的低分辨率帧宽度
+DETECT_WIDTH = 160
+# 并行分段提取时每段的最短时长（秒），过短的分段进程开销大于收益
+MIN_SEGMENT_DURATION = 120
+# 自适应采样的最大跳跃步长（同时也是窗口内最多暂存的采样帧数）
+ADAPTIVE_MAX_STEP = 32
+# 按时间点读取原始分辨率帧时，单个 ffmpeg 进程的 select 表达式最多包含的时间点数，避免命令行参数过长
+MAX_SELECT_TIMES = 400
+
+def get_keyframe_folder(video_id):
+    """返回视频关键帧图片的保存目录"""
+    return os.path.join(KEYFRAMES_OUTPUT_DIR, f"video_{video_id}")
+
+def format_time_point(time_point):
+    """将秒数格式化为 mm:ss.xx"""
+    return f"{int(time_point // 60):02d}:{int(time_point % 60):02d}.{int((time_point % 1) * 100):02d}"
+
+def get_video_info(video_path, media_info=None):
+    """
+    获取视频基本信息
+
+    参数:
+        video_path: 视频文件路径
+        media_info: utils.media_probe 缓存的媒体信息，提供时直接使用，不再打开视频文件
+
+    返回:
+        (fps, total_frames, width, height)
+    """
+    if media_info:
+        return media_info['fps'], media_info['frame_count'], media_info['width'], media_info['height']
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    # OpenCV 返回编码尺寸，ffmpeg 输出时会按旋转元数据自动旋转，竖屏等旋转视频需要交换宽高
+    rotation = int(cap.get(cv2.CAP_PROP_ORIENTATION_META) or 0)
+    cap.release()
+    if abs(rotation) % 180 == 90:
+        width, height = height, width
+    return fps, total_frames, width, height
+
 def is_significant_change(frame1, frame2, threshold=0.90):
     """计算结构相似性（SSIM），判断当前帧与前一帧是否有较大变化"""
     gray1 = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY)
@@ -19,10 +77,29 @@ def is_significant_change(frame1, frame2, threshold=0.90):
     score, _ = ssim(gray1, gray2, full=True)
     return score < threshold  # 低于阈值，说明变化明显
 
-def extract_keyframes(video_path, output_folder, similarity_threshold=0.9):
+def extract_keyframes(video_path, output_folder, similarity_threshold=0.9, streaming=True, workers=1, media_info=None,
+                      stop_flag=None):
     """
     从视频中提取相似度去重的 I 帧关键帧
+
+    参数:
+        video_path: 视频文件路径
+        output_folder: 关键帧输出目录
+        similarity_threshold: 感知哈希差异阈值，大于该值才保留
+        streaming: 是否使用流式模式（通过管道读取原始帧，仅为保留的关键帧写入JPEG）
+        workers: 并行解码的进程数，大于1时将视频按时间分段并行提取
+        media_info: 缓存的媒体信息（见 utils.media_probe.get_media_info），为None时从视频文件读取
+        stop_flag: 停止标志(threading.Event)，置位后终止正在运行的ffmpeg进程并抛出 StepCancelled（流式与并行模式）
+
+    返回:
+        (keyframes_data, fps, total_frames)
     """
+    if workers and workers > 1:
+        return extract_keyframes_parallel(video_path, output_folder, similarity_threshold, workers, media_info,
+                                          stop_flag)
+    if streaming:
+        return extract_keyframes_streaming(video_path, output_folder, similarity_threshold, media_info, stop_flag)
+
     os.makedirs(output_folder, exist_ok=True)
     
     video_name = os.path.splitext(os.path.basename(video_path))[0]
@@ -38,10 +115,7 @@ def extract_keyframes(video_path, output_folder, similarity_threshold=0.9):
         return [], 0, 0
 
     # 获取视频基本信息
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    cap.release()
+    fps, total_frames, _, _ = get_video_info(video_path, media_info)
 
     # 加载 I 帧图像
     iframe_files = sorted([f for f in os.listdir(temp_iframe_dir) if f.endswith('.jpg')])
@@ -53,22 +127,20 @@ def extract_keyframes(video_path, output_folder, similarity_threshold=0.9):
     previous_hash = None
     keyframe_index = 1
 
-    for i, filename in enumerate(iframe_files):
-        filepath = os.path.join(temp_iframe_dir, filename)
-        image = Image.open(filepath)
-        current_hash = imagehash.phash(image)
-
-        # 判断是否保留该帧
-        should_save = False
-        
-        # 第一帧或与前一帧相差较大时保留
-        if previous_hash is None or previous_hash - current_hash > similarity_threshold:
-            if previous_hash is not None:
-                print(f"保留关键帧: {filename} (哈希差异: {previous_hash - current_hash})")
-            should_save = True
-            previous_hash = current_hash
-        
-        if should_save:
+    # 按批次读取缩小后的灰度图，一次性计算哈希并去重
+    for batch_start in range(0, len(iframe_files), HASH_BATCH_SIZE):
+        batch_files = iframe_files[batch_start:batch_start + HASH_BATCH_SIZE]
+        small_frames = [
+            downscale_frame(cv2.imread(os.path.join(temp_iframe_dir, filename), cv2.IMREAD_GRAYSCALE))
+            for filename in batch_files
+        ]
+        batch_hashes = batch_phash(small_frames)
+        kept_indices, previous_hash = dedup_hashes(batch_hashes, similarity_threshold, previous_hash)
+
+        for index in kept_indices:
+            filename = batch_files[index]
+            filepath = os.path.join(temp_iframe_dir, filename)
+
             # 获取该帧的时间点和帧号
             frame_number = int(filename.split('_')[1].split('.')[0])
             time_point = frame_number / fps if fps > 0 else 0
@@ -83,8 +155,9 @@ def extract_keyframes(video_path, output_folder, similarity_threshold=0.9):
                 "id": keyframe_index,
                 "frame_number": frame_number,
                 "time_point": time_point,
-                "time_formatted": f"{int(time_point // 60):02d}:{int(time_point % 60):02d}.{int((time_point % 1) * 100):02d}",
-                "file_name": output_filename
+                "time_formatted": format_time_point(time_point),
+                "file_name": output_filename,
+                "phash": hash_to_hex(batch_hashes[index])
             })
             
             keyframe_index += 1
@@ -92,4 +165,477 @@ def extract_keyframes(video_path, output_folder, similarity_threshold=0.9):
     # 清理临时目录
     shutil.rmtree(temp_iframe_dir)
 
-    return keyframes_data, fps, total_frames
\ No newline at end of file
+    return keyframes_data, fps, total_frames
+
+def get_detect_size(width, height, detect_width=DETECT_WIDTH):
+    """计算变化检测用低分辨率帧的尺寸（保持宽高比，高度取偶数）"""
+    if width <= detect_width:
+        return width, height
+    detect_height = max(2, int(round(height * detect_width / width / 2.0)) * 2)
+    return detect_width, detect_height
+
+def build_detect_filter(width, height, select_filter=None):
+    """构建低分辨率灰度检测流的滤镜链"""
+    detect_width, detect_height = get_detect_size(width, height)
+    filters = [select_filter] if select_filter else []
+    filters.append(f"scale={detect_width}:{detect_height}:flags=area")
+    return ",".join(filters), detect_width, detect_height
+
+def is_significant_change_gray(gray1, gray2, threshold=0.90):
+    """对两张灰度帧计算 SSIM，判断是否有较大变化"""
+    score = ssim(gray1, gray2)
+    return score < threshold
+
+def build_time_select_filter(frame_times, tolerance, offset=0.0):
+    """
+    构建只选出指定时间点的帧的 select 滤镜
+
+    参数:
+        frame_times: 时间点列表（秒，视频内绝对时间）
+        tolerance: 帧时间戳与目标时间点的最大偏差（秒）
+        offset: 输入端定位的起始时间，定位后滤镜看到的时间戳从0开始
+    """
+    terms = [f"lt(abs(t-{time_point - offset:.6f})\\,{tolerance:.6f})" for time_point in frame_times]
+    return f"select='{'+'.join(terms)}'"
+
+def _grab_frames(video_path, frame_times, fps, width, height, stop_flag=None):
+    """
+    一次解码读取一组按时间顺序排列的时间点的原始分辨率帧
+
+    输入端定位到第一个时间点之前，读到最后一个时间点为止，由 select 只输出目标帧，
+    每个保留的帧在这里编码为 JPEG 并计算感知哈希，不在内存中暂存原始帧。
+
+    返回:
+        dict: 时间点 -> (JPEG 编码数据, 十六进制感知哈希)，读取不到的时间点不在结果中
+    """
+    # 目标时间点取自同一视频的 showinfo 输出，容差只需覆盖时间戳的舍入误差，不能跨到相邻帧
+    tolerance = 0.25 / fps if fps and fps > 0 else 0.001
+    margin = 0.5 / fps if fps and fps > 0 else 0.1
+    start_time = max(0.0, frame_times[0] - margin)
+    reader = FFmpegFrameReader(video_path, width, height,
+                               video_filter=build_time_select_filter(frame_times, tolerance, start_time),
+                               start_time=start_time, end_time=frame_times[-1] + margin,
+                               max_frames=len(frame_times), stop_flag=stop_flag)
+    captured = {}
+    with reader:
+        for time_point, frame in reader:
+            index = bisect_left(frame_times, time_point - tolerance - 1e-6)
+            if index >= len(frame_times) or abs(frame_times[index] - time_point) > tolerance + 1e-6:
+                continue
+            if frame_times[index] in captured:
+                continue
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            if ok:
+                captured[frame_times[index]] = (encoded, hash_to_hex(batch_phash(downscale_frame(frame))[0]))
+    return captured
+
+def save_full_resolution_keyframes(video_path, output_folder, frame_times, fps, width, height, workers=1,
+                                   stop_flag=None):
+    """
+    按时间点读取原始分辨率帧并保存为关键帧 JPEG
+
+    变化检测只在低分辨率流上进行，保留下来的时间点在这里以原始分辨率读取：
+    时间点按顺序分成连续的若干组，每组由一个 ffmpeg 进程定位到组内第一个时间点后一次解码读出，
+    各组的时间范围互不重叠，总解码量约为一遍视频，而不是每个关键帧启动一个 ffmpeg 进程。
+    同时为每个关键帧计算原始分辨率下的感知哈希（phash），供跨视频复用OCR结果。
+
+    参数:
+        frame_times: 关键帧时间点列表（秒），按时间顺序
+        workers: 并发解码的 ffmpeg 进程数（即分组数的下限）
+        stop_flag: 停止标志(threading.Event)，置位后终止各 ffmpeg 进程并抛出 StepCancelled
+
+    返回:
+        keyframes_data 列表
+    """
+    frame_times = sorted(set(frame_times))
+    if not frame_times:
+        return []
+
+    # 每组的时间点数受 select 表达式长度限制
+    group_count = max(1, min(int(workers), len(frame_times)), -(-len(frame_times) // MAX_SELECT_TIMES))
+    group_size = -(-len(frame_times) // group_count)
+    groups = [frame_times[i:i + group_size] for i in range(0, len(frame_times), group_size)]
+
+    # 分组在没有应用上下文的工作线程中读取，先取出日志对象
+    logger = current_app.logger
+
+    def grab_group(group):
+        try:
+            return _grab_frames(video_path, group, fps, width, height, stop_flag)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"读取关键帧失败 ({group[0]:.3f}s - {group[-1]:.3f}s): {str(e)}")
+            return {}
+
+    captured = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(groups)))) as executor:
+        for group_captured in executor.map(grab_group, groups):
+            captured.update(group_captured)
+
+    # 个别时间点在分组读取中没有匹配到帧（如时间戳异常），单独定位读取
+    for time_point in frame_times:
+        if time_point in captured:
+            continue
+        try:
+            frame = grab_frame(video_path, time_point, fps, width, height, stop_flag=stop_flag)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"读取关键帧失败 ({time_point:.3f}s): {str(e)}")
+            continue
+        if frame is not None:
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            if ok:
+                captured[time_point] = (encoded, hash_to_hex(batch_phash(downscale_frame(frame))[0]))
+
+    keyframes_data = []
+    for time_point in frame_times:
+        if time_point not in captured:
+            continue
+        encoded, phash = captured[time_point]
+
+        keyframe_index = len(keyframes_data) + 1
+        output_filename = f"keyframe_{keyframe_index:04d}.jpg"
+        with open(os.path.join(output_folder, output_filename), 'wb') as f:
+            f.write(encoded.tobytes())
+
+        keyframes_data.append({
+            "id": keyframe_index,
+            "frame_number": int(round(time_point * fps)) if fps > 0 else 0,
+            "time_point": time_point,
+            "time_formatted": format_time_point(time_point),
+            "file_name": output_filename,
+            "phash": phash
+        })
+    return keyframes_data
+
+def _hash_iframes(video_path, width, height, start_time=None, end_time=None, stop_flag=None):
+    """
+    在低分辨率灰度流上计算 I 帧的感知哈希
+
+    返回:
+        list of (time_point, hash)
+    """
+    video_filter, detect_width, detect_height = build_detect_filter(width, height, IFRAME_SELECT_FILTER)
+    entries = []
+    batch = []
+
+    def flush_batch():
+        hashes = batch_phash([downscale_frame(frame) for _, frame in batch])
+        entries.extend((time_point, int(hashes[i])) for i, (time_point, _) in enumerate(batch))
+        batch.clear()
+
+    reader = FFmpegFrameReader(video_path, detect_width, detect_height, video_filter=video_filter,
+                               pix_fmt='gray', start_time=start_time, end_time=end_time, stop_flag=stop_flag)
+    with reader:
+        for time_point, frame in reader:
+            # 分段边界为左闭右开，避免同一帧出现在相邻两段
+            if start_time is not None and time_point < start_time:
+                continue
+            if end_time is not None and time_point >= end_time:
+                continue
+            batch.append((time_point, frame))
+            if len(batch) >= STREAM_BATCH_SIZE:
+                flush_batch()
+    if batch:
+        flush_batch()
+
+    return entries
+
+def extract_keyframes_streaming(video_path, output_folder, similarity_threshold=0.9, media_info=None, stop_flag=None):
+    """
+    流式提取相似度去重的 I 帧关键帧
+
+    ffmpeg 将 I 帧缩小为低分辨率灰度图写入管道，在内存中批量计算感知哈希并去重，
+    只有被保留的时间点才以原始分辨率读取并编码为 JPEG，不再生成 iframes_temp 临时目录。
+    帧号与时间点取自 ffmpeg 输出的 pts_time。
+
+    返回:
+        (keyframes_data, fps, total_frames)，格式与 extract_keyframes 一致
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    fps, total_frames, width, height = get_video_info(video_path, media_info)
+    if width <= 0 or height <= 0:
+        current_app.logger.error(f"无法读取视频分辨率: {video_path}")
+        return [], fps, total_frames
+
+    try:
+        entries = _hash_iframes(video_path, width, height, stop_flag=stop_flag)
+    except (OSError, RuntimeError) as e:
+        current_app.logger.error(f"ffmpeg 流式读取 I 帧失败: {str(e)}")
+        return [], fps, total_frames
+
+    if not entries:
+        current_app.logger.warning("未提取到 I 帧")
+        return [], fps, total_frames
+
+    kept_indices, _ = dedup_hashes([entry[1] for entry in entries], similarity_threshold)
+    frame_times = [entries[i][0] for i in kept_indices]
+    keyframes_data = save_full_resolution_keyframes(video_path, output_folder, frame_times, fps, width, height,
+                                                    stop_flag=stop_flag)
+
+    return keyframes_data, fps, total_frames
+
+
+# 分段提取子进程共享的停止标志（multiprocessing.Event），由进程池初始化时传入
+_segment_stop_flag = None
+
+def _init_segment_worker(stop_flag=None):
+    """分段提取子进程初始化：避免OpenCV内部线程池与多进程叠加造成过度订阅，并记录停止标志"""
+    global _segment_stop_flag
+    _segment_stop_flag = stop_flag
+    cv2.setNumThreads(1)
+
+def _extract_segment(video_path, width, height, start_time, end_time):
+    """
+    在子进程中解码一个时间段内的 I 帧，返回该段所有 I 帧的时间点与感知哈希
+
+    返回:
+        list of (time_point, hash)
+    """
+    return _hash_iframes(video_path, width, height, start_time, end_time, _segment_stop_flag)
+
+def split_time_ranges(duration, workers, min_segment_duration=MIN_SEGMENT_DURATION):
+    """
+    将视频时长均分为若干时间段
+
+    返回:
+        [(start_time, end_time), ...]，最后一段的 end_time 为 None（读到文件末尾）
+    """
+    segment_count = max(1, min(int(workers), int(duration // min_segment_duration)))
+    segment_length = duration / segment_count
+    ranges = []
+    for i in range(segment_count):
+        start_time = round(i * segment_length, 3)
+        end_time = round((i + 1) * segment_length, 3) if i < segment_count - 1 else None
+        ranges.append((start_time, end_time))
+    return ranges
+
+def extract_keyframes_parallel(video_path, output_folder, similarity_threshold=0.9, workers=None, media_info=None,
+                               stop_flag=None):
+    """
+    按时间分段并行提取 I 帧关键帧
+
+    每个时间段在独立进程中用 ffmpeg -ss/-to 解码，只返回各 I 帧的时间点与哈希；
+    主进程拼接各段的哈希序列后按完整序列重新去重，因此分段边界处的取舍与顺序提取完全一致，
+    最后只为保留的时间点读取原始分辨率帧。
+    子进程无法访问主进程的 threading.Event，stop_flag 置位后转发给进程间共享的停止标志，由各子进程终止自己的 ffmpeg。
+
+    返回:
+        (keyframes_data, fps, total_frames)，格式与 extract_keyframes 一致
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    fps, total_frames, width, height = get_video_info(video_path, media_info)
+    if width <= 0 or height <= 0 or fps <= 0:
+        current_app.logger.error(f"无法读取视频信息: {video_path}")
+        return [], fps, total_frames
+
+    workers = workers or os.cpu_count() or 1
+    duration = media_info['duration'] if media_info and media_info.get('duration') else total_frames / fps
+    time_ranges = split_time_ranges(duration, workers)
+    if len(time_ranges) == 1:
+        return extract_keyframes_streaming(video_path, output_folder, similarity_threshold, media_info, stop_flag)
+
+    context = multiprocessing.get_context()
+    segment_stop_flag = context.Event()
+    try:
+        # 并行解码各时间段
+        with ProcessPoolExecutor(max_workers=len(time_ranges), mp_context=context,
+                                 initializer=_init_segment_worker, initargs=(segment_stop_flag,)) as executor:
+            futures = [
+                executor.submit(_extract_segment, video_path, width, height, start_time, end_time)
+                for start_time, end_time in time_ranges
+            ]
+            pending = set(futures)
+            while pending:
+                if stop_flag is not None and stop_flag.is_set():
+                    segment_stop_flag.set()
+                    raise StepCancelled()
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    if future.exception() is not None:
+                        # 一个分段失败时通知其他分段尽快结束
+                        segment_stop_flag.set()
+                    future.result()
+            entries = []
+            for future in futures:
+                entries.extend(future.result())
+    except (OSError, RuntimeError) as e:
+        current_app.logger.error(f"并行提取 I 帧失败: {str(e)}")
+        return [], fps, total_frames
+
+    if not entries:
+        current_app.logger.warning("未提取到 I 帧")
+        return [], fps, total_frames
+
+    # 按完整序列重新去重，得到与顺序提取一致的结果
+    kept_indices, _ = dedup_hashes([entry[1] for entry in entries], similarity_threshold)
+    frame_times = [entries[i][0] for i in kept_indices]
+    keyframes_data = save_full_resolution_keyframes(video_path, output_folder, frame_times, fps, width, height,
+                                                    workers=min(len(time_ranges), 8), stop_flag=stop_flag)
+
+    current_app.logger.info(f"并行提取完成: {len(time_ranges)} 个分段, {len(entries)} 个 I 帧, 保留 {len(keyframes_data)} 个关键帧")
+    return keyframes_data, fps, total_frames
+
+def _binary_search_change(window, reference, threshold):
+    """
+    在采样窗口中二分查找第一个与参考帧有明显变化的位置
+
+    调用前已确认窗口最后一帧相对参考帧有变化。
+    """
+    low, high = -1, len(window) - 1
+    while high - low > 1:
+        mid = (low + high) // 2
+        if is_significant_change_gray(reference, window[mid][1], threshold):
+            high = mid
+        else:
+            low = mid
+    return high
+
+def extract_keyframes_adaptive(video_path, output_folder, threshold=0.90, frame_skip=5,
+                               initial_step=8, max_step=ADAPTIVE_MAX_STEP, media_info=None, stop_flag=None):
+    """
+    使用自适应采样 + 二分查找的 SSIM 策略提取关键帧
+
+    与 playground/keyframe_3.py 的 extract_adaptive_key_frames 算法一致：
+    从参考帧开始按倍增步长向后跳跃比较，发现明显变化后在跳过的区间内二分查找变化点。
+    不同之处在于逐帧流式读取低分辨率灰度采样帧，只在窗口中暂存最近一次比较之后的采样帧，
+    内存占用上限为 max_step 帧，而不是把所有采样帧读入 frames_list；
+    保留的关键帧最后按时间点以原始分辨率读取。
+
+    参数:
+        video_path: 视频文件路径
+        output_folder: 关键帧输出目录
+        threshold: SSIM 阈值，低于该值视为明显变化
+        frame_skip: 帧采样间隔
+        initial_step: 初始跳跃步长（以采样帧计）
+        max_step: 最大跳跃步长（以采样帧计）
+        media_info: 缓存的媒体信息，为None时从视频文件读取
+        stop_flag: 停止标志(threading.Event)，置位后终止ffmpeg进程并抛出 StepCancelled
+
+    返回:
+        (keyframes_data, fps, total_frames)，格式与 extract_keyframes 一致
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    fps, total_frames, width, height = get_video_info(video_path, media_info)
+    if width <= 0 or height <= 0:
+        current_app.logger.error(f"无法读取视频分辨率: {video_path}")
+        return [], fps, total_frames
+
+    # 采样在 ffmpeg 内完成，未采样的帧不经过管道
+    sample_filter = f"select='not(mod(n\\,{int(frame_skip)}))'"
+    video_filter, detect_width, detect_height = build_detect_filter(width, height, sample_filter)
+
+    frame_times = []
+    last_saved_index = None
+
+    def keep(sample):
+        """记录关键帧时间点；与上一关键帧间隔不足半秒的视为重复"""
+        nonlocal last_saved_index
+        time_point = sample[0]
+        frame_index = int(round(time_point * fps)) if fps > 0 else 0
+        if last_saved_index is not None and frame_index - last_saved_index <= fps / 2:
+            return
+        last_saved_index = frame_index
+        frame_times.append(time_point)
+
+    reference = None
+    window = []
+    step = initial_step
+
+    try:
+        reader = FFmpegFrameReader(video_path, detect_width, detect_height, video_filter=video_filter, pix_fmt='gray',
+                                   stop_flag=stop_flag)
+        with reader:
+            for sample in reader:
+                if reference is None:
+                    keep(sample)
+                    reference = sample[1]
+                    continue
+
+                window.append(sample)
+                if len(window) < step:
+                    continue
+
+                if is_significant_change_gray(reference, window[-1][1], threshold):
+                    # 在跳过的区间内二分查找变化点
+                    change_idx = _binary_search_change(window, reference, threshold)
+                    keep(window[change_idx])
+                    reference = window[change_idx][1]
+                    window = window[change_idx + 1:]
+                    step = initial_step
+                else:
+                    # 区间内无变化，丢弃窗口并倍增步长
+                    window = []
+                    step = min(step * 2, max_step)
+
+        # 处理末尾不足一个步长的剩余采样帧
+        if window and reference is not None and is_significant_change_gray(reference, window[-1][1], threshold):
+            change_idx = _binary_search_change(window, reference, threshold)
+            keep(window[change_idx])
+    except (OSError, RuntimeError) as e:
+        current_app.logger.error(f"自适应采样读取视频失败: {str(e)}")
+        return [], fps, total_frames
+
+    keyframes_data = save_full_resolution_keyframes(video_path, output_folder, frame_times, fps, width, height,
+                                                    stop_flag=stop_flag)
+    if not keyframes_data:
+        current_app.logger.warning("自适应采样未提取到关键帧")
+
+    return keyframes_data, fps, total_frames
+
+def extract_keyframes_scene(video_path, output_folder, threshold=0.3, media_info=None, stop_flag=None):
+    """
+    使用 ffmpeg 自带的场景变化检测提取关键帧
+
+    一次 ffmpeg 运行完成检测与输出：select='gt(scene,T)' 计算相邻帧的场景变化分数，
+    只有选中的帧以原始分辨率写入管道，在这里编码为 JPEG 并计算感知哈希，Python 侧不处理任何被丢弃的帧。
+    时间点取自选中帧的 pts_time，帧号取自滤镜链开头 showinfo 记录的解码序号，可变帧率视频也准确。
+
+    参数:
+        video_path: 视频文件路径
+        output_folder: 关键帧输出目录
+        threshold: 场景变化分数阈值（0-1），越小越敏感
+        media_info: 缓存的媒体信息，为None时从视频文件读取
+        stop_flag: 停止标志(threading.Event)，置位后终止ffmpeg进程并抛出 StepCancelled
+
+    返回:
+        (keyframes_data, fps, total_frames)，格式与 extract_keyframes 一致
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    fps, total_frames, width, height = get_video_info(video_path, media_info)
+    if width <= 0 or height <= 0:
+        current_app.logger.error(f"无法读取视频分辨率: {video_path}")
+        return [], fps, total_frames
+
+    # 第一帧总是保留，其余帧仅在场景分数超过阈值时保留
+    scene_filter = f"select='eq(n\\,0)+gt(scene\\,{threshold})'"
+    keyframes_data = []
+    try:
+        reader = FFmpegFrameReader(video_path, width, height, video_filter=scene_filter, frame_numbers=True,
+                                   stop_flag=stop_flag)
+        with reader:
+            for time_point, frame_number, frame in reader:
+                keyframe_index = len(keyframes_data) + 1
+                output_filename = f"keyframe_{keyframe_index:04d}.jpg"
+                cv2.imwrite(os.path.join(output_folder, output_filename), frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+                if frame_number is None:
+                    frame_number = int(round(time_point * fps)) if fps > 0 else 0
+
+                keyframes_data.append({
+                    "id": keyframe_index,
+                    "frame_number": frame_number,
+                    "time_point": time_point,
+                    "time_formatted": format_time_point(time_point),
+                    "file_name": output_filename,
+                    "phash": hash_to_hex(batch_phash(downscale_frame(frame))[0])
+                })
+    except (OSError, RuntimeError) as e:
+        current_app.logger.error(f"ffmpeg 场景检测失败: {str(e)}")
+        return [], fps, total_frames
+
+    if not keyframes_data:
+        current_app.logger.warning("场景检测未提取到关键帧")
+
+    return keyframes_data, fps, total_frames
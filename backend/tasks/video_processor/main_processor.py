@@ -7,26 +7,29 @@ import os
 import uuid
 from datetime import datetime
 from flask import current_app
-import cv2
 
 # 导入数据库模型
 from models.models import db, Video, VideoProcessingTask, VideoSummary
-from models.models import VideoKeyframe, VideoVectorIndex
+from models.models import VideoVectorIndex
+from utils.media_probe import get_media_info, get_content_hash
+from utils.video_processing_pool import is_express_task
 
 # 导入处理模块
-from .keyframe_extractor import extract_keyframes
+from .keyframe_engine import get_keyframe_engine
+from .keyframe_extractor import get_keyframe_folder
 from .ocr_processor import OCRProcessor
 from .asr_processor import ASRProcessor
 from .vector_indexer import build_vector_index, check_vector_index_exists
 from .summary_generator import generate_video_summary, generate_section_summary, group_keyframes_into_sections
-from .db_handler import save_keyframes_to_db, load_keyframes_from_db, check_video_summary_exists, check_video_processing_steps_status
+from .db_handler import save_keyframes_to_db, update_keyframe_columns, save_transcript_segments, load_keyframes_from_db, check_video_summary_exists, check_video_processing_steps_status
 from .task_logger import add_task_log
+from .step_scheduler import StepScheduler, StepCancelled
+from .artifact_cache import ArtifactCache, build_step_keys
 
 # 配置信息
-KEYFRAMES_OUTPUT_DIR = "temp_keyframes"
 VECTOR_INDEX_DIR = "vector_indices"
 
-def process_video_task(video_id, stop_flag=None, processing_steps=None, preview_mode=False):
+def process_video_task(video_id, stop_flag=None, processing_steps=None, preview_mode=False, keyframe_engine=None):
     """
     处理视频任务的主函数
     
@@ -40,6 +43,7 @@ def process_video_task(video_id, stop_flag=None, processing_steps=None, preview_
             - "vector": 向量索引构建
             - "summary": 视频摘要生成
         preview_mode: 预览模式，为True时不写入数据库，只写入TaskLog
+        keyframe_engine: 关键帧提取引擎名称（如 "iframe-phash"、"adaptive-ssim"、"ffmpeg-scene"），为None时使用配置 KEYFRAME_ENGINE
     """
     try:
         # 获取视频信息
@@ -94,6 +98,16 @@ def process_video_task(video_id, stop_flag=None, processing_steps=None, preview_
         
         add_task_log(task_id, video_id, 'info', f"视频路径: {video_path}")
         
+        # 读取媒体信息（文件未变化时直接使用缓存），后续各步骤共用
+        try:
+            media_info = get_media_info(video_id, video_path)
+            add_task_log(task_id, video_id, 'info',
+                         f"媒体信息: {media_info['width']}x{media_info['height']}, FPS: {media_info['fps']:.2f}, "
+                         f"时长: {media_info['duration']:.1f}秒, 音频: {'有' if media_info['has_audio'] else '无'}")
+        except (OSError, RuntimeError) as e:
+            media_info = None
+            add_task_log(task_id, video_id, 'warning', f"获取媒体信息失败，将直接读取视频文件: {str(e)}")
+        
         # 检查是否请求停止
         if stop_flag and stop_flag.is_set():
             add_task_log(task_id, video_id, 'warning', "收到停止请求，任务被中断")
@@ -105,363 +119,269 @@ def process_video_task(video_id, stop_flag=None, processing_steps=None, preview_
             return False
         
         # 3. 创建输出目录
-        output_folder = os.path.join(KEYFRAMES_OUTPUT_DIR, f"video_{video_id}")
+        output_folder = get_keyframe_folder(video_id)
         os.makedirs(output_folder, exist_ok=True)
         add_task_log(task_id, video_id, 'info', f"创建输出目录: {output_folder}")
         
         # 初始化变量
         keyframes_data = []
-        fps = 0
-        total_frames = 0
         total_steps = len(processing_steps)
         completed_steps = 0
-          # 4. 关键帧提取
-        if "keyframes" in processing_steps:
-            add_task_log(task_id, video_id, 'info', "步骤：关键帧提取")
-            
-            # 包含关键帧步骤，清空并重新提取
-            add_task_log(task_id, video_id, 'info', "开始提取关键帧...")
-            keyframes_data, fps, total_frames = extract_keyframes(video_path, output_folder, similarity_threshold=10)
-            add_task_log(task_id, video_id, 'info', f"提取了 {len(keyframes_data)} 个关键帧, FPS: {fps}, 总帧数: {total_frames}")
-            
-            # 保存关键帧数据到数据库（非预览模式）
+        # 视频属性在调度线程中读取，工作线程使用各自的数据库会话，不直接访问 video 对象
+        course_id = video.course_id
+        video_title = video.title
+        video_description = video.description if video.description else ""
+        asr_processor = ASRProcessor() if "asr" in processing_steps else None
+        later_steps = [step for step in ["ocr", "asr", "vector", "summary"] if step in processing_steps]
+        
+        def step_completed():
+            nonlocal completed_steps
+            completed_steps += 1
             if not preview_mode:
-                # 清除旧的关键帧数据
-                VideoKeyframe.query.filter_by(video_id=video_id).delete()
+                task.progress = completed_steps / total_steps * 0.8  # 80%为处理进度，20%为后期整理
                 db.session.commit()
-                
-                success = save_keyframes_to_db(video_id, keyframes_data)
+        
+        def save_keyframes(step_label, columns=None):
+            """关键帧提取后整体写入；OCR、ASR步骤只批量更新各自的列"""
+            if not preview_mode:
+                if columns:
+                    success = update_keyframe_columns(video_id, keyframes_data, columns)
+                else:
+                    success = save_keyframes_to_db(video_id, keyframes_data)
                 if not success:
-                    add_task_log(task_id, video_id, 'error', "保存关键帧数据到数据库失败")
-                    raise Exception("保存关键帧数据到数据库失败")
-                add_task_log(task_id, video_id, 'info', "关键帧数据已保存到数据库")
+                    add_task_log(task_id, video_id, 'error', f"保存关键帧{step_label}数据到数据库失败")
+                    raise Exception(f"保存关键帧{step_label}数据到数据库失败")
+                add_task_log(task_id, video_id, 'info', f"关键帧{step_label}数据已保存到数据库")
             else:
-                add_task_log(task_id, video_id, 'info', "预览模式：关键帧数据不保存到数据库")
+                add_task_log(task_id, video_id, 'info', f"预览模式：关键帧{step_label}数据不保存到数据库")
+        
+        # 4. 各步骤的依赖关系：关键帧提取与语音识别同时开始，OCR在关键帧提取之后，
+        # 语音片段在关键帧与OCR都完成后分配到关键帧，最后并行构建向量索引和生成摘要。
+        # 步骤函数在工作线程中执行，完成回调（写数据库、更新进度）在当前线程中执行。
+        # 预览与单步骤任务进入快速通道，资源通道已满时可以使用预留名额
+        scheduler = StepScheduler(express=is_express_task(processing_steps, preview_mode))
+        
+        # 步骤产物缓存：视频内容、引擎与参数都未变化的步骤直接读取上次的产物，缓存键在调度前计算
+        artifact_cache = ArtifactCache() if current_app.config.get('ARTIFACT_CACHE_ENABLED', True) else None
+        step_keys = {}
+        
+        def load_artifact(step, restore_to=None):
+            key = step_keys.get(step)
+            if not key:
+                return None
+            data = artifact_cache.load(step, key, restore_to)
+            if data is not None:
+                add_task_log(task_id, video_id, 'info', f"步骤 {step} 命中产物缓存 ({key[:12]})，跳过计算")
+            return data
+        
+        def save_artifact(step, data, files_from=None, file_names=None):
+            # 收到停止请求或其他步骤失败后，步骤的结果可能不完整，不写入缓存
+            if scheduler.stop_event.is_set():
+                raise StepCancelled()
+            key = step_keys.get(step)
+            if key:
+                artifact_cache.save(step, key, data, files_from, file_names)
+        
+        if "keyframes" in processing_steps:
+            def run_keyframes(results):
+                add_task_log(task_id, video_id, 'info', "步骤：关键帧提取")
+                cached = load_artifact("keyframes", restore_to=output_folder)
+                if cached is not None:
+                    return cached["keyframes"], cached["fps"], cached["total_frames"]
+                
+                engine = get_keyframe_engine(keyframe_engine)
+                add_task_log(task_id, video_id, 'info', f"开始提取关键帧 (引擎: {engine.name})...")
+                result = engine.extract_keyframes(video_path, output_folder, media_info, stop_flag=scheduler.stop_event)
+                extracted, fps, total_frames = result
+                save_artifact(
+                    "keyframes",
+                    {"keyframes": extracted, "fps": fps, "total_frames": total_frames},
+                    files_from=output_folder,
+                    file_names=[keyframe["file_name"] for keyframe in extracted]
+                )
+                return result
             
-            completed_steps += 1
-            if not preview_mode:
-                task.progress = completed_steps / total_steps * 0.8  # 80%为处理进度，20%为后期整理
-                db.session.commit()        
-            else:
-                # 如果不执行关键帧提取，需要从数据库加载现有数据
-                keyframes_data = load_keyframes_from_db(video_id)
-                if keyframes_data:
-                    cap = cv2.VideoCapture(video_path)
-                    fps = cap.get(cv2.CAP_PROP_FPS)
-                    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                    cap.release()
-                    add_task_log(task_id, video_id, 'info', f"从数据库加载了 {len(keyframes_data)} 个关键帧数据")
+            def keyframes_done(result):
+                nonlocal keyframes_data
+                keyframes_data, fps, total_frames = result
+                add_task_log(task_id, video_id, 'info', f"提取了 {len(keyframes_data)} 个关键帧, FPS: {fps}, 总帧数: {total_frames}")
+                if not keyframes_data and later_steps:
+                    add_task_log(task_id, video_id, 'error', "没有关键帧数据，无法进行OCR、ASR、向量索引或摘要处理")
+                    raise Exception("没有关键帧数据，无法进行后续处理")
+                save_keyframes("")
+                step_completed()
+            
+            scheduler.add_step("keyframes", run_keyframes, on_done=keyframes_done)
+        else:
+            # 如果不执行关键帧提取，需要从数据库加载现有数据
+            keyframes_data = load_keyframes_from_db(video_id)
+            if keyframes_data:
+                add_task_log(task_id, video_id, 'info', f"从数据库加载了 {len(keyframes_data)} 个关键帧数据")
             
-        # 如果没有关键帧数据，无法继续后续处理
-        if not keyframes_data and any(step in processing_steps for step in ["ocr", "asr", "vector", "summary"]):
-            add_task_log(task_id, video_id, 'error', "没有关键帧数据，无法进行OCR、ASR、向量索引或摘要处理")
-            raise Exception("没有关键帧数据，无法进行后续处理")
+            # 如果没有关键帧数据，无法继续后续处理
+            if not keyframes_data and later_steps:
+                add_task_log(task_id, video_id, 'error', "没有关键帧数据，无法进行OCR、ASR、向量索引或摘要处理")
+                raise Exception("没有关键帧数据，无法进行后续处理")
         
-        # 检查是否请求停止
-        if stop_flag and stop_flag.is_set():
-            add_task_log(task_id, video_id, 'warning', "收到停止请求，任务被中断")
-            if not preview_mode:
-                task.status = 'cancelled'
-                task.error_message = '任务被手动停止'
-                task.end_time = datetime.now()
-                db.session.commit()
-            return False
-          # 5. OCR处理
+        # 5. OCR处理
         if "ocr" in processing_steps:
-            add_task_log(task_id, video_id, 'info', "步骤：OCR文字识别")
-            
-            # 包含OCR步骤，清空并重新处理
-            add_task_log(task_id, video_id, 'info', "开始OCR文字识别...")
-            ocr_processor = OCRProcessor()
-            keyframes_data = ocr_processor.perform_ocr(keyframes_data, output_folder)
-            add_task_log(task_id, video_id, 'info', "OCR处理完成")
-            
-            # 更新数据库中的关键帧数据（非预览模式）
-            if not preview_mode:
-                # 清除旧的关键帧数据并重新保存
-                VideoKeyframe.query.filter_by(video_id=video_id).delete()
-                db.session.commit()
+            def run_ocr(results):
+                add_task_log(task_id, video_id, 'info', "步骤：OCR文字识别")
+                cached = load_artifact("ocr")
+                if cached is not None:
+                    return cached["keyframes"]
                 
-                success = save_keyframes_to_db(video_id, keyframes_data)
-                if not success:
-                    add_task_log(task_id, video_id, 'error', "更新关键帧OCR数据到数据库失败")
-                    raise Exception("更新关键帧OCR数据到数据库失败")
-                add_task_log(task_id, video_id, 'info', "关键帧OCR数据已更新到数据库")
-            else:
-                add_task_log(task_id, video_id, 'info', "预览模式：OCR数据不保存到数据库")
+                add_task_log(task_id, video_id, 'info', "开始OCR文字识别...")
+                result = OCRProcessor().perform_ocr(keyframes_data, output_folder, course_id=course_id, video_id=video_id,
+                                                    stop_flag=scheduler.stop_event)
+                save_artifact("ocr", {"keyframes": result})
+                return result
             
-            completed_steps += 1
-            if not preview_mode:
-                task.progress = completed_steps / total_steps * 0.8
-                db.session.commit()
+            def ocr_done(result):
+                nonlocal keyframes_data
+                keyframes_data = result
+                add_task_log(task_id, video_id, 'info', "OCR处理完成")
+                save_keyframes("OCR", ["ocr_result", "ocr_result_raw"])
+                step_completed()
+            
+            scheduler.add_step("ocr", run_ocr, deps=["keyframes"], on_done=ocr_done)
         
-        # 检查是否请求停止
-        if stop_flag and stop_flag.is_set():
-            add_task_log(task_id, video_id, 'warning', "收到停止请求，任务被中断")
-            if not preview_mode:
-                task.status = 'cancelled'
-                task.error_message = '任务被手动停止'
-                task.end_time = datetime.now()
-                db.session.commit()
-            return False
-          # 6. ASR处理
+        # 6. ASR处理，只依赖视频文件，与关键帧提取、OCR并行
         if "asr" in processing_steps:
-            add_task_log(task_id, video_id, 'info', "步骤：语音识别")
+            def run_asr(results):
+                add_task_log(task_id, video_id, 'info', "步骤：语音识别")
+                cached = load_artifact("asr")
+                if cached is not None:
+                    return cached["segments"]
+                
+                add_task_log(task_id, video_id, 'info', "开始语音识别...")
+                asr_result = asr_processor.perform_asr(video_path, media_info, stop_flag=scheduler.stop_event)
+                # 识别失败时引擎返回None（没有语音时返回空列表），失败结果不缓存，下次重新识别
+                if asr_result is not None:
+                    save_artifact("asr", {"segments": asr_result})
+                return asr_result
             
-            # 包含ASR步骤，清空并重新处理
-            add_task_log(task_id, video_id, 'info', "开始语音识别...")
-            asr_processor = ASRProcessor()
-            asr_result = asr_processor.perform_asr(video_path)
-            if asr_result:
-                add_task_log(task_id, video_id, 'info', f"语音识别成功，识别了 {len(asr_result)} 个语音片段")
-                keyframes_data = asr_processor.assign_asr_to_keyframes(keyframes_data, asr_result)
-            else:
-                add_task_log(task_id, video_id, 'warning', "语音识别失败或没有可识别的语音")
+            def asr_done(asr_result):
+                if asr_result is None:
+                    # 识别失败时保留数据库中已有的语音识别片段
+                    add_task_log(task_id, video_id, 'warning', "语音识别失败或视频没有音频，保留已有的语音识别片段")
+                    return
+                if asr_result:
+                    add_task_log(task_id, video_id, 'info', f"语音识别成功，识别了 {len(asr_result)} 个语音片段")
+                else:
+                    add_task_log(task_id, video_id, 'warning', "没有可识别的语音")
+                if not preview_mode:
+                    if not save_transcript_segments(video_id, asr_result):
+                        add_task_log(task_id, video_id, 'error', "保存语音识别片段到数据库失败")
+                        raise Exception("保存语音识别片段到数据库失败")
+                    add_task_log(task_id, video_id, 'info', f"已保存 {len(asr_result)} 个语音识别片段")
             
-            # 更新数据库中的关键帧数据（非预览模式）
-            if not preview_mode:
-                # 清除旧的关键帧数据并重新保存
-                VideoKeyframe.query.filter_by(video_id=video_id).delete()
-                db.session.commit()
-                
-                success = save_keyframes_to_db(video_id, keyframes_data)
-                if not success:
-                    add_task_log(task_id, video_id, 'error', "更新关键帧ASR数据到数据库失败")
-                    raise Exception("更新关键帧ASR数据到数据库失败")
-                add_task_log(task_id, video_id, 'info', "关键帧ASR数据已更新到数据库")
-            else:
-                add_task_log(task_id, video_id, 'info', "预览模式：ASR数据不保存到数据库")
+            def run_align(results):
+                asr_result = results["asr"]
+                if asr_result:
+                    return asr_processor.assign_asr_to_keyframes(keyframes_data, asr_result)
+                return keyframes_data
             
-            completed_steps += 1
-            if not preview_mode:
-                task.progress = completed_steps / total_steps * 0.8
-                db.session.commit()
+            def align_done(result):
+                nonlocal keyframes_data
+                keyframes_data = result
+                save_keyframes("ASR", ["asr_texts"])
+                step_completed()
+            
+            scheduler.add_step("asr", run_asr, on_done=asr_done)
+            scheduler.add_step("align", run_align, deps=["keyframes", "ocr", "asr"], on_done=align_done)
         
-        # 检查是否请求停止
-        if stop_flag and stop_flag.is_set():
-            add_task_log(task_id, video_id, 'warning', "收到停止请求，任务被中断")
-            if not preview_mode:
-                task.status = 'cancelled'
-                task.error_message = '任务被手动停止'
-                task.end_time = datetime.now()
-                db.session.commit()
-            return False
-              # 7. 构建向量索引
+        keyframe_steps = ["keyframes", "ocr", "align"]
+        
+        # 7. 构建向量索引
         if "vector" in processing_steps:
-            add_task_log(task_id, video_id, 'info', "步骤：构建向量索引")
-            
-            # 包含向量索引步骤，清空并重新构建
-            add_task_log(task_id, video_id, 'info', "开始构建向量索引...")
-            
             index_path = os.path.join(VECTOR_INDEX_DIR, f"video_{video_id}")
-            success = build_vector_index(video_id, keyframes_data, index_path)
-            if success:
-                add_task_log(task_id, video_id, 'info', f"向量索引构建成功，保存到 {index_path}")
+            
+            def run_vector(results):
+                add_task_log(task_id, video_id, 'info', "步骤：构建向量索引")
+                if load_artifact("vector", restore_to=index_path) is not None:
+                    return True
                 
-                # 保存索引信息到数据库（非预览模式）
-                if not preview_mode:
-                    # 清除旧的向量索引记录
-                    VideoVectorIndex.query.filter_by(video_id=video_id).delete()
-                    db.session.commit()
+                add_task_log(task_id, video_id, 'info', "开始构建向量索引...")
+                success = build_vector_index(video_id, keyframes_data, index_path)
+                if success:
+                    save_artifact("vector", {"total_vectors": len(keyframes_data)}, files_from=index_path)
+                return success
+            
+            def vector_done(success):
+                if success:
+                    add_task_log(task_id, video_id, 'info', f"向量索引构建成功，保存到 {index_path}")
                     
-                    vector_index = VideoVectorIndex(
-                        video_id=video_id,
-                        index_path=index_path,
-                        embedding_model="Pro/BAAI/bge-m3",
-                        total_vectors=len(keyframes_data)
+                    # 保存索引信息到数据库（非预览模式）
+                    if not preview_mode:
+                        # 清除旧的向量索引记录
+                        VideoVectorIndex.query.filter_by(video_id=video_id).delete()
+                        db.session.commit()
+                        
+                        vector_index = VideoVectorIndex(
+                            video_id=video_id,
+                            index_path=index_path,
+                            embedding_model="Pro/BAAI/bge-m3",
+                            total_vectors=len(keyframes_data)
+                        )
+                        db.session.add(vector_index)
+                        db.session.commit()
+                    else:
+                        add_task_log(task_id, video_id, 'info', "预览模式：向量索引信息不保存到数据库")
+                else:
+                    add_task_log(task_id, video_id, 'warning', "向量索引构建失败")
+                step_completed()
+            
+            scheduler.add_step("vector", run_vector, deps=keyframe_steps, on_done=vector_done)
+        
+        # 8. 生成视频摘要和关键词，与向量索引并行
+        if "summary" in processing_steps:
+            def run_summary(results):
+                add_task_log(task_id, video_id, 'info', "步骤：生成视频摘要和关键词")
+                add_task_log(task_id, video_id, 'info', "开始生成视频摘要和关键词...")
+                summary_data = generate_video_summary(video_id, keyframes_data, task_id)
+                section_summaries = []
+                if summary_data and not preview_mode:
+                    section_summaries = generate_section_summaries(
+                        task_id, video_id, keyframes_data, video_title, video_description
                     )
-                    db.session.add(vector_index)
-                    db.session.commit()
+                return summary_data, section_summaries
+            
+            def summary_done(result):
+                summary_data, section_summaries = result
+                if summary_data:
+                    if not preview_mode:
+                        save_video_summary(task_id, video_id, course_id, summary_data, section_summaries)
+                    else:
+                        add_task_log(task_id, video_id, 'info', f"预览模式：生成摘要成功，包含{len(summary_data.get('keywords', []))}个关键词，但不保存到数据库")
                 else:
-                    add_task_log(task_id, video_id, 'info', "预览模式：向量索引信息不保存到数据库")
-            else:
-                add_task_log(task_id, video_id, 'warning', "向量索引构建失败")
+                    add_task_log(task_id, video_id, 'warning', "视频摘要生成失败")
+                step_completed()
             
-            completed_steps += 1
-            if not preview_mode:
-                task.progress = completed_steps / total_steps * 0.8
-                db.session.commit()
+            scheduler.add_step("summary", run_summary, deps=keyframe_steps, on_done=summary_done)
         
-        # 检查是否请求停止
-        if stop_flag and stop_flag.is_set():
+        if artifact_cache:
+            try:
+                step_keys = build_step_keys(
+                    get_content_hash(video_id, video_path),
+                    processing_steps,
+                    keyframe_engine=keyframe_engine,
+                    keyframes_data=keyframes_data if "keyframes" not in processing_steps else None,
+                    subtitle_path=os.path.splitext(video_path)[0] + '.json'
+                )
+            except (OSError, ValueError) as e:
+                add_task_log(task_id, video_id, 'warning', f"计算步骤产物缓存键失败，本次不使用缓存: {str(e)}")
+        
+        try:
+            scheduler.run(stop_flag)
+        except StepCancelled:
             add_task_log(task_id, video_id, 'warning', "收到停止请求，任务被中断")
             if not preview_mode:
                 task.status = 'cancelled'
                 task.error_message = '任务被手动停止'
                 task.end_time = datetime.now()
                 db.session.commit()
-            return False        # 8. 生成视频摘要和关键词
-        if "summary" in processing_steps:
-            add_task_log(task_id, video_id, 'info', "步骤：生成视频摘要和关键词")
-            
-            # 包含摘要步骤，清空并重新生成
-            add_task_log(task_id, video_id, 'info', "开始生成视频摘要和关键词...")
-            summary_data = generate_video_summary(video_id, keyframes_data, task_id)
-            
-            if summary_data:
-                if not preview_mode:
-                    # 在删除之前先获取当前视频的关键词ID列表
-                    current_video_keyword_ids = [vk.keyword_id for vk in VideoKeyword.query.filter_by(video_id=video_id).all()]
-                    
-                    # 清除旧的摘要记录
-                    VideoSummary.query.filter_by(video_id=video_id).delete()
-                    # 清除旧的视频关键词关系
-                    VideoKeyword.query.filter_by(video_id=video_id).delete()
-                    db.session.flush()
-
-                    # 获取要删除的课程关键词 - 只存在于这个视频的关键词
-                    course_keywords_to_delete_ids = []
-                    if current_video_keyword_ids:
-                        course_keywords_to_delete_ids = db.session.query(CourseKeyword.keyword_id).filter(
-                            CourseKeyword.course_id == video.course_id,
-                            CourseKeyword.keyword_id.in_(current_video_keyword_ids),
-                            ~CourseKeyword.keyword_id.in_(
-                                db.session.query(VideoKeyword.keyword_id).filter(
-                                    VideoKeyword.video_id != video_id,
-                                    VideoKeyword.video_id.in_(
-                                        db.session.query(Video.id).filter(Video.course_id == video.course_id)
-                                    )
-                                )
-                            )
-                        ).all()
-                        course_keywords_to_delete_ids = [ck.keyword_id for ck in course_keywords_to_delete_ids]
-
-                    # 删除只属于这个视频的课程关键词关系
-                    if course_keywords_to_delete_ids:
-                        CourseKeyword.query.filter(
-                            CourseKeyword.course_id == video.course_id,
-                            CourseKeyword.keyword_id.in_(course_keywords_to_delete_ids)
-                        ).delete(synchronize_session=False)
-
-                    # 删除不再被任何视频使用的关键词
-                    orphaned_keyword_ids = []
-                    if current_video_keyword_ids:
-                        orphaned_keyword_ids = [kw_id for kw_id in current_video_keyword_ids 
-                                              if not db.session.query(VideoKeyword.query.filter_by(keyword_id=kw_id).exists()).scalar()]
-                    
-                    from models.models import KeywordRelation
-                    # 删除被删除关键词的所有关系
-                    if orphaned_keyword_ids:
-                        KeywordRelation.query.filter(
-                            (KeywordRelation.keyword1_id.in_(orphaned_keyword_ids)) |
-                            (KeywordRelation.keyword2_id.in_(orphaned_keyword_ids))
-                        ).delete(synchronize_session=False)
-                        add_task_log(task_id, video_id, 'info', f"删除了孤立关键词的相关关系")
-                        Keyword.query.filter(Keyword.id.in_(orphaned_keyword_ids)).delete(synchronize_session=False)
-                        add_task_log(task_id, video_id, 'info', f"删除了 {len(orphaned_keyword_ids)} 个孤立关键词")
-    
-                    db.session.commit()
-                    
-                    # 将关键帧分组成区间
-                    add_task_log(task_id, video_id, 'info', "将视频关键帧分组成区间...")
-                        
-                    sections_data = group_keyframes_into_sections(
-                        keyframes_data,
-                        max_section_duration=300,  # 5分钟
-                        min_keyframes_per_section=2,
-                        max_keyframes_per_section=15,
-                        content_similarity_threshold=0.6
-                    )
-                    
-                    add_task_log(task_id, video_id, 'info', f"视频被分为 {len(sections_data)} 个区间")
-                    
-                    # 为每个区间生成摘要
-                    section_summaries = []
-                    for idx, section in enumerate(sections_data):
-                        add_task_log(task_id, video_id, 'info', f"为区间 {idx+1}/{len(sections_data)} 生成摘要...")
-                        
-                        start_time = section["start_time"]
-                        end_time = section["end_time"]
-                        section_summary = generate_section_summary(
-                            section, 
-                            video.title, 
-                            video.description if video.description else "", 
-                            task_id, 
-                            video_id
-                        )
-                        
-                        duration = end_time - start_time
-                        minutes = int(duration // 60)
-                        seconds = int(duration % 60)
-                        duration_text = f"{minutes}分{seconds}秒" if minutes > 0 else f"{seconds}秒"
-                        
-                        section_summaries.append({
-                            "title": f"区间 {idx+1} ({duration_text})",
-                            "content": section_summary,
-                            "time_point": start_time,
-                            "end_time": end_time,
-                            "keyframe_count": len(section["keyframes"])
-                        })
-                    
-                    # 保存摘要到数据库
-                    video_summary = VideoSummary(
-                        video_id=video_id,
-                        whole_summary=summary_data['summary'],
-                        generate_time=datetime.now()
-                    )
-                    
-                    # 处理关键词
-                    from models.models import Keyword, VideoKeyword, CourseKeyword
-                    if summary_data['keywords']:
-                        existing_keywords = {kw.name: kw for kw in Keyword.query.filter(Keyword.name.in_(summary_data['keywords'])).all()}
-                        
-                        new_keywords = []
-                        all_keyword_objects = []
-                        
-                        for keyword_name in summary_data['keywords']:
-                            if keyword_name in existing_keywords:
-                                keyword_obj = existing_keywords[keyword_name]
-                                add_task_log(task_id, video_id, 'debug', f"使用已存在的关键词: {keyword_name}")
-                            else:
-                                keyword_obj = Keyword(name=keyword_name, category='specific_point')
-                                new_keywords.append(keyword_obj)
-                                existing_keywords[keyword_name] = keyword_obj
-                                add_task_log(task_id, video_id, 'debug', f"创建新关键词: {keyword_name}")
-                            
-                            all_keyword_objects.append(keyword_obj)
-                        
-                        if new_keywords:
-                            db.session.add_all(new_keywords)
-                            db.session.flush()
-                        
-                        # 创建关系
-                        video_keywords = []
-                        course_keywords_to_check = []
-                        
-                        for keyword_obj in all_keyword_objects:
-                            video_keywords.append(VideoKeyword(video_id=video_id, keyword_id=keyword_obj.id))
-                            course_keywords_to_check.append(keyword_obj.id)
-                        
-                        db.session.add_all(video_keywords)
-                        
-                        # 处理课程关键词关系
-                        existing_course_keywords = {ck.keyword_id for ck in CourseKeyword.query.filter(
-                            CourseKeyword.course_id == video.course_id,
-                            CourseKeyword.keyword_id.in_(course_keywords_to_check)
-                        ).all()}
-                        
-                        new_course_keywords = []
-                        for keyword_id in course_keywords_to_check:
-                            if keyword_id not in existing_course_keywords:
-                                new_course_keywords.append(CourseKeyword(course_id=video.course_id, keyword_id=keyword_id))
-                        
-                        if new_course_keywords:
-                            db.session.add_all(new_course_keywords)
-                    
-                    video_summary.set_sections(section_summaries)
-                    db.session.add(video_summary)
-                    db.session.commit()
-                    add_task_log(task_id, video_id, 'info', f"视频摘要生成成功: {len(summary_data.get('keywords', []))}个关键词")
-                else:
-                    add_task_log(task_id, video_id, 'info', f"预览模式：生成摘要成功，包含{len(summary_data.get('keywords', []))}个关键词，但不保存到数据库")
-            else:
-                add_task_log(task_id, video_id, 'warning', "视频摘要生成失败")
-
-            
-            completed_steps += 1
-            if not preview_mode:
-                task.progress = completed_steps / total_steps * 0.8
-                db.session.commit()
+            return False
         
         # 9. 更新任务状态为完成
         if not preview_mode:
@@ -488,3 +408,169 @@ def process_video_task(video_id, stop_flag=None, processing_steps=None, preview_
         add_task_log(task_id if 'task_id' in locals() else f"task-{uuid.uuid4().hex[:8]}", video_id, 'error', f"处理视频任务失败: {str(e)}")
         current_app.logger.error(f"处理视频任务失败: {str(e)}")
         return False
+
+def generate_section_summaries(task_id, video_id, keyframes_data, video_title, video_description):
+    """
+    将关键帧分组成区间并为每个区间生成摘要
+    
+    返回:
+        区间摘要列表，每项包含 title、content、time_point、end_time、keyframe_count
+    """
+    # 将关键帧分组成区间
+    add_task_log(task_id, video_id, 'info', "将视频关键帧分组成区间...")
+        
+    sections_data = group_keyframes_into_sections(
+        keyframes_data,
+        max_section_duration=300,  # 5分钟
+        min_keyframes_per_section=2,
+        max_keyframes_per_section=15,
+        content_similarity_threshold=0.6
+    )
+    
+    add_task_log(task_id, video_id, 'info', f"视频被分为 {len(sections_data)} 个区间")
+    
+    # 为每个区间生成摘要
+    section_summaries = []
+    for idx, section in enumerate(sections_data):
+        add_task_log(task_id, video_id, 'info', f"为区间 {idx+1}/{len(sections_data)} 生成摘要...")
+        
+        start_time = section["start_time"]
+        end_time = section["end_time"]
+        section_summary = generate_section_summary(
+            section, 
+            video_title, 
+            video_description, 
+            task_id, 
+            video_id
+        )
+        
+        duration = end_time - start_time
+        minutes = int(duration // 60)
+        seconds = int(duration % 60)
+        duration_text = f"{minutes}分{seconds}秒" if minutes > 0 else f"{seconds}秒"
+        
+        section_summaries.append({
+            "title": f"区间 {idx+1} ({duration_text})",
+            "content": section_summary,
+            "time_point": start_time,
+            "end_time": end_time,
+            "keyframe_count": len(section["keyframes"])
+        })
+    
+    return section_summaries
+
+def save_video_summary(task_id, video_id, course_id, summary_data, section_summaries):
+    """
+    保存视频摘要、区间摘要和关键词，替换该视频已有的摘要与关键词关系
+    """
+    from models.models import Keyword, VideoKeyword, CourseKeyword, KeywordRelation
+    
+    # 在删除之前先获取当前视频的关键词ID列表
+    current_video_keyword_ids = [vk.keyword_id for vk in VideoKeyword.query.filter_by(video_id=video_id).all()]
+    
+    # 清除旧的摘要记录
+    VideoSummary.query.filter_by(video_id=video_id).delete()
+    # 清除旧的视频关键词关系
+    VideoKeyword.query.filter_by(video_id=video_id).delete()
+    db.session.flush()
+
+    # 获取要删除的课程关键词 - 只存在于这个视频的关键词
+    course_keywords_to_delete_ids = []
+    if current_video_keyword_ids:
+        course_keywords_to_delete_ids = db.session.query(CourseKeyword.keyword_id).filter(
+            CourseKeyword.course_id == course_id,
+            CourseKeyword.keyword_id.in_(current_video_keyword_ids),
+            ~CourseKeyword.keyword_id.in_(
+                db.session.query(VideoKeyword.keyword_id).filter(
+                    VideoKeyword.video_id != video_id,
+                    VideoKeyword.video_id.in_(
+                        db.session.query(Video.id).filter(Video.course_id == course_id)
+                    )
+                )
+            )
+        ).all()
+        course_keywords_to_delete_ids = [ck.keyword_id for ck in course_keywords_to_delete_ids]
+
+    # 删除只属于这个视频的课程关键词关系
+    if course_keywords_to_delete_ids:
+        CourseKeyword.query.filter(
+            CourseKeyword.course_id == course_id,
+            CourseKeyword.keyword_id.in_(course_keywords_to_delete_ids)
+        ).delete(synchronize_session=False)
+
+    # 删除不再被任何视频使用的关键词
+    orphaned_keyword_ids = []
+    if current_video_keyword_ids:
+        orphaned_keyword_ids = [kw_id for kw_id in current_video_keyword_ids 
+                              if not db.session.query(VideoKeyword.query.filter_by(keyword_id=kw_id).exists()).scalar()]
+    
+    # 删除被删除关键词的所有关系
+    if orphaned_keyword_ids:
+        KeywordRelation.query.filter(
+            (KeywordRelation.keyword1_id.in_(orphaned_keyword_ids)) |
+            (KeywordRelation.keyword2_id.in_(orphaned_keyword_ids))
+        ).delete(synchronize_session=False)
+        add_task_log(task_id, video_id, 'info', f"删除了孤立关键词的相关关系")
+        Keyword.query.filter(Keyword.id.in_(orphaned_keyword_ids)).delete(synchronize_session=False)
+        add_task_log(task_id, video_id, 'info', f"删除了 {len(orphaned_keyword_ids)} 个孤立关键词")
+
+    db.session.commit()
+    
+    # 保存摘要到数据库
+    video_summary = VideoSummary(
+        video_id=video_id,
+        whole_summary=summary_data['summary'],
+        generate_time=datetime.now()
+    )
+    
+    # 处理关键词
+    if summary_data['keywords']:
+        existing_keywords = {kw.name: kw for kw in Keyword.query.filter(Keyword.name.in_(summary_data['keywords'])).all()}
+        
+        new_keywords = []
+        all_keyword_objects = []
+        
+        for keyword_name in summary_data['keywords']:
+            if keyword_name in existing_keywords:
+                keyword_obj = existing_keywords[keyword_name]
+                add_task_log(task_id, video_id, 'debug', f"使用已存在的关键词: {keyword_name}")
+            else:
+                keyword_obj = Keyword(name=keyword_name, category='specific_point')
+                new_keywords.append(keyword_obj)
+                existing_keywords[keyword_name] = keyword_obj
+                add_task_log(task_id, video_id, 'debug', f"创建新关键词: {keyword_name}")
+            
+            all_keyword_objects.append(keyword_obj)
+        
+        if new_keywords:
+            db.session.add_all(new_keywords)
+            db.session.flush()
+        
+        # 创建关系
+        video_keywords = []
+        course_keywords_to_check = []
+        
+        for keyword_obj in all_keyword_objects:
+            video_keywords.append(VideoKeyword(video_id=video_id, keyword_id=keyword_obj.id))
+            course_keywords_to_check.append(keyword_obj.id)
+        
+        db.session.add_all(video_keywords)
+        
+        # 处理课程关键词关系
+        existing_course_keywords = {ck.keyword_id for ck in CourseKeyword.query.filter(
+            CourseKeyword.course_id == course_id,
+            CourseKeyword.keyword_id.in_(course_keywords_to_check)
+        ).all()}
+        
+        new_course_keywords = []
+        for keyword_id in course_keywords_to_check:
+            if keyword_id not in existing_course_keywords:
+                new_course_keywords.append(CourseKeyword(course_id=course_id, keyword_id=keyword_id))
+        
+        if new_course_keywords:
+            db.session.add_all(new_course_keywords)
+    
+    video_summary.set_sections(section_summaries)
+    db.session.add(video_summary)
+    db.session.commit()
+    add_task_log(task_id, video_id, 'info', f"视频摘要生成成功: {len(summary_data.get('keywords', []))}个关键词")
@@ -4,8 +4,11 @@ OCR处理模块
 """
 
 import os
+import cv2
 from flask import current_app
 from utils.ocr_engine import CnOcrEngine, TencentOCR
+from utils.phash_util import batch_phash, downscale_frame, hash_to_hex
+from .slide_index import SlideFingerprintIndex
 
 class OCRProcessor:
     """OCR处理器类"""
@@ -27,15 +30,58 @@ class OCRProcessor:
             else:
                 self.ocr_engine = CnOcrEngine()
         
-    def perform_ocr(self, keyframes_data, output_folder):
+    def perform_ocr(self, keyframes_data, output_folder, course_id=None, video_id=None, stop_flag=None):
         """
         对关键帧进行OCR处理，提取文字信息
         
+        指定 course_id 时先在同一课程已处理视频的幻灯片指纹索引中查找，
+        命中的关键帧直接复用已有OCR结果，只有未命中的关键帧交给OCR引擎识别。
+        
         参数:
             keyframes_data: 关键帧数据列表
             output_folder: 输出文件夹路径
+            course_id: 课程ID，为None时不查找可复用的OCR结果
+            video_id: 当前视频ID，构建索引时排除该视频自身的旧记录
+            stop_flag: 停止标志(threading.Event)，置位后OCR引擎跳过剩余的关键帧
             
         返回:
-            处理后的关键帧数据列表
+            处理后的关键帧数据列表，中途停止时结果不完整
         """
-        return self.ocr_engine.perform_ocr(keyframes_data, output_folder)
\ No newline at end of file
+        if course_id is None or not keyframes_data:
+            return self.ocr_engine.perform_ocr(keyframes_data, output_folder, stop_flag)
+        
+        try:
+            index = SlideFingerprintIndex.build_for_course(course_id, exclude_video_id=video_id)
+        except Exception as e:
+            current_app.logger.warning(f"构建幻灯片指纹索引失败，全部关键帧重新识别: {str(e)}")
+            return self.ocr_engine.perform_ocr(keyframes_data, output_folder, stop_flag)
+        
+        if len(index) == 0:
+            return self.ocr_engine.perform_ocr(keyframes_data, output_folder, stop_flag)
+        
+        pending_frames = []
+        for frame_info in keyframes_data:
+            image_path = os.path.join(output_folder, frame_info["file_name"])
+            phash = frame_info.get("phash") or self._compute_phash(image_path)
+            frame_info["phash"] = phash
+            
+            match = index.lookup(phash, image_path)
+            if match is None:
+                pending_frames.append(frame_info)
+            else:
+                frame_info["ocr_result"], frame_info["ocr_result_raw"] = match
+        
+        current_app.logger.info(f"幻灯片指纹索引命中 {len(keyframes_data) - len(pending_frames)}/{len(keyframes_data)} 个关键帧")
+        
+        # OCR引擎原地更新传入的关键帧字典，未命中的关键帧识别后即反映在 keyframes_data 中
+        if pending_frames:
+            self.ocr_engine.perform_ocr(pending_frames, output_folder, stop_flag)
+        return keyframes_data
+    
+    @staticmethod
+    def _compute_phash(image_path):
+        """为缺少感知哈希的关键帧（如旧数据）从图片文件计算哈希"""
+        image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            return None
+        return hash_to_hex(batch_phash(downscale_frame(image))[0])
@@ -0,0 +1,207 @@
+"""
+幻灯片指纹索引模块
+以关键帧感知哈希为键，在同一课程已处理视频的关键帧中查找相同幻灯片，复用其OCR结果
+"""
+
+import os
+import json
+import cv2
+from flask import current_app
+
+from models.models import db, Video, VideoKeyframe
+from utils.phash_util import hex_to_hash
+from utils.ocr_incremental import find_changed_regions
+from .keyframe_extractor import get_keyframe_folder
+
+# 默认汉明距离半径：只查找哈希完全相同的幻灯片
+DEFAULT_FINGERPRINT_RADIUS = 0
+# 每次查找最多做像素差分确认的候选数
+MAX_CONFIRM_CANDIDATES = 3
+
+
+def _hamming(hash1, hash2):
+    return bin(hash1 ^ hash2).count('1')
+
+
+class BKTree:
+    """
+    BK 树：按汉明距离组织整数哈希，支持在给定半径内查找
+
+    每个节点的子节点按与该节点的距离分桶，查询时利用三角不等式只访问
+    距离在 [d - radius, d + radius] 范围内的子树。
+    """
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, hash_value, item):
+        """插入哈希及其关联数据"""
+        self._size += 1
+        if self._root is None:
+            self._root = (hash_value, item, {})
+            return
+
+        node = self._root
+        while True:
+            distance = _hamming(hash_value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (hash_value, item, {})
+                return
+            node = child
+
+    def search(self, hash_value, radius):
+        """
+        查找与给定哈希汉明距离不超过 radius 的所有条目
+
+        返回:
+            [(distance, item), ...]，按距离升序
+        """
+        if self._root is None:
+            return []
+
+        results = []
+        stack = [self._root]
+        while stack:
+            node_hash, item, children = stack.pop()
+            distance = _hamming(hash_value, node_hash)
+            if distance <= radius:
+                results.append((distance, item))
+            for child_distance in range(max(0, distance - radius), distance + radius + 1):
+                child = children.get(child_distance)
+                if child is not None:
+                    stack.append(child)
+
+        results.sort(key=lambda x: x[0])
+        return results
+
+
+class SlideFingerprintIndex:
+    """课程范围内的幻灯片指纹索引：关键帧感知哈希 -> OCR结果"""
+
+    def __init__(self, radius=DEFAULT_FINGERPRINT_RADIUS):
+        self.radius = radius
+        self.tree = BKTree()
+
+    def __len__(self):
+        return len(self.tree)
+
+    @classmethod
+    def build_for_course(cls, course_id, exclude_video_id=None, radius=None):
+        """
+        从数据库中同一课程的 VideoKeyframe 记录构建索引
+
+        只收录有感知哈希且OCR结果非空的关键帧；哈希相同但OCR文本不同的关键帧（不同的幻灯片）分别收录。
+
+        参数:
+            course_id: 课程ID
+            exclude_video_id: 排除的视频ID（通常为当前正在处理的视频，避免复用自身旧结果）
+            radius: 汉明距离半径，为None时使用配置 OCR_FINGERPRINT_RADIUS（默认0，只复用完全相同的哈希）
+        """
+        if radius is None:
+            radius = current_app.config.get('OCR_FINGERPRINT_RADIUS', DEFAULT_FINGERPRINT_RADIUS)
+        index = cls(radius)
+
+        query = db.session.query(
+            VideoKeyframe.phash, VideoKeyframe.ocr_result, VideoKeyframe.ocr_result_raw,
+            VideoKeyframe.video_id, VideoKeyframe.file_name
+        ).join(
+            Video, VideoKeyframe.video_id == Video.id
+        ).filter(
+            Video.course_id == course_id,
+            Video.is_deleted == False,
+            VideoKeyframe.phash.isnot(None),
+            VideoKeyframe.ocr_result.isnot(None)
+        )
+        if exclude_video_id is not None:
+            query = query.filter(VideoKeyframe.video_id != exclude_video_id)
+
+        # 哈希与OCR文本都相同的关键帧只保留一份
+        seen = set()
+        for phash, ocr_result, ocr_result_raw, video_id, file_name in query:
+            if (phash, ocr_result) in seen:
+                continue
+            try:
+                texts = json.loads(ocr_result)
+                raw = json.loads(ocr_result_raw) if ocr_result_raw else []
+            except (TypeError, ValueError):
+                continue
+            if not texts:
+                continue
+            seen.add((phash, ocr_result))
+            index.add(phash, texts, raw, os.path.join(get_keyframe_folder(video_id), file_name))
+
+        return index
+
+    def add(self, phash, ocr_result, ocr_result_raw=None, image_path=None):
+        """
+        添加一条指纹记录
+
+        参数:
+            phash: 十六进制感知哈希
+            ocr_result: OCR文本列表
+            ocr_result_raw: OCR原始结果（文本框位置与置信度）
+            image_path: 关键帧图片路径，命中前用于像素差分确认
+        """
+        self.tree.add(hex_to_hash(phash), (ocr_result, ocr_result_raw or [], image_path))
+
+    def lookup(self, phash, image_path):
+        """
+        查找相同幻灯片的OCR结果
+
+        32x32 的 pHash 对只改动一个词、修正一个错别字的两张幻灯片往往完全相同，
+        因此哈希距离只用于筛选候选，每个候选（包括哈希完全相同的）都要与 image_path 做像素差分，
+        两帧没有变化区域时才复用。
+
+        参数:
+            phash: 当前关键帧的十六进制感知哈希
+            image_path: 当前关键帧图片路径
+
+        返回:
+            (OCR文本列表, OCR原始结果)，未命中时返回None；原始结果的文本框位置已换算到当前关键帧的尺寸
+        """
+        if not phash or self.radius < 0:
+            return None
+        matches = self.tree.search(hex_to_hash(phash), self.radius)
+        for _, (ocr_result, ocr_result_raw, source_path) in matches[:MAX_CONFIRM_CANDIDATES]:
+            scale = _compare_slides(image_path, source_path)
+            if scale is not None:
+                return list(ocr_result), _scale_raw(ocr_result_raw, *scale)
+        return None
+
+
+def _compare_slides(image_path, source_path):
+    """
+    像素差分确认两张关键帧是否为同一幻灯片
+
+    来源关键帧缩放到当前关键帧的尺寸后没有变化区域时视为同一幻灯片，任一图片无法读取时不复用。
+
+    返回:
+        (x 缩放比例, y 缩放比例)，不是同一幻灯片时返回None
+    """
+    if not image_path or not source_path:
+        return None
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    source = cv2.imread(source_path, cv2.IMREAD_GRAYSCALE)
+    if image is None or source is None:
+        return None
+    scale = (image.shape[1] / source.shape[1], image.shape[0] / source.shape[0])
+    if source.shape != image.shape:
+        source = cv2.resize(source, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_AREA)
+    regions, _ = find_changed_regions(source, image)
+    return None if regions else scale
+
+
+def _scale_raw(ocr_result_raw, scale_x, scale_y):
+    """复制OCR原始结果，并按比例换算文本框位置"""
+    scaled = []
+    for item in ocr_result_raw:
+        item = dict(item)
+        if scale_x != 1 or scale_y != 1:
+            item['position'] = [[x * scale_x, y * scale_y] for x, y in item.get('position', [])]
+        scaled.append(item)
+    return scaled
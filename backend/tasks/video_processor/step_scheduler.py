@@ -0,0 +1,247 @@
+"""
+处理步骤调度模块
+将视频处理的各步骤描述为依赖图（DAG），依赖已满足的步骤并发执行，
+整体耗时接近关键路径（如 max(关键帧提取 + OCR, 语音识别) + 向量索引/摘要）
+
+步骤按资源类别进入进程内所有任务共享的通道：CPU密集的步骤（关键帧、OCR、ASR）与
+等待网络请求的步骤（向量索引、摘要）分别限制并发，一个任务的CPU步骤完成后立即让出CPU通道，
+其网络步骤等待大模型接口时，其他任务的CPU步骤可以继续执行。
+快速通道任务（预览、单步骤重新处理）在通道已满时还可以使用每个通道预留的名额（配置 PIPELINE_EXPRESS_RESERVE，默认1）。
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from flask import current_app
+
+# 资源类别
+RESOURCE_CPU = "cpu"
+RESOURCE_NETWORK = "network"
+
+# 步骤所属的资源类别，可通过配置 PIPELINE_STEP_RESOURCES 覆盖（如 {"asr": "asr"} 让ASR使用独立通道）；
+# 不在表中的步骤（如耗时很短的时间对齐）不占用通道
+STEP_RESOURCES = {
+    "keyframes": RESOURCE_CPU,
+    "ocr": RESOURCE_CPU,
+    "asr": RESOURCE_CPU,
+    "vector": RESOURCE_NETWORK,
+    "summary": RESOURCE_NETWORK
+}
+
+# 各通道的默认并发数，可通过配置 PIPELINE_LANES 覆盖
+DEFAULT_LANE_SIZES = {
+    RESOURCE_CPU: 2,
+    RESOURCE_NETWORK: 4
+}
+
+
+class StepCancelled(Exception):
+    """收到停止请求，调度被中断"""
+
+
+class ResourceLanes:
+    """进程内所有任务共享的资源通道，每个资源类别对应一个信号量"""
+
+    def __init__(self):
+        self._lanes = {}
+        self._reserves = {}
+        self._sizes = {}
+        self._reserve_sizes = {}
+        self._in_use = {}
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+    def _lane(self, resource):
+        with self._lock:
+            if resource not in self._lanes:
+                sizes = dict(DEFAULT_LANE_SIZES, **current_app.config.get('PIPELINE_LANES', {}))
+                self._sizes[resource] = sizes.get(resource, 1)
+                self._lanes[resource] = threading.BoundedSemaphore(self._sizes[resource])
+                self._reserve_sizes[resource] = current_app.config.get('PIPELINE_EXPRESS_RESERVE', 1)
+                self._reserves[resource] = threading.BoundedSemaphore(self._reserve_sizes[resource])
+                self._in_use[resource] = 0
+                self._waiting[resource] = 0
+            return self._lanes[resource], self._reserves[resource]
+
+    def acquire(self, resource, stop_flag=None, poll_interval=0.5, express=False):
+        """
+        占用通道，通道已满时等待
+
+        参数:
+            resource: 资源类别
+            stop_flag: 停止标志(threading.Event)
+            poll_interval: 检查停止标志的间隔（秒）
+            express: 是否为快速通道任务，通道已满时可以使用预留名额
+
+        返回:
+            占用的信号量，释放时传给 release
+
+        异常:
+            StepCancelled: 等待期间收到停止请求
+        """
+        lane, reserve = self._lane(resource)
+        with self._lock:
+            self._waiting[resource] += 1
+        try:
+            while True:
+                if lane.acquire(timeout=min(poll_interval, 0.1) if express else poll_interval):
+                    acquired = lane
+                    break
+                if express and reserve.acquire(blocking=False):
+                    acquired = reserve
+                    break
+                if stop_flag and stop_flag.is_set():
+                    raise StepCancelled()
+        finally:
+            with self._lock:
+                self._waiting[resource] -= 1
+        with self._lock:
+            self._in_use[resource] += 1
+        return acquired
+
+    def release(self, resource, acquired):
+        with self._lock:
+            self._in_use[resource] -= 1
+        acquired.release()
+
+    def status(self):
+        """返回各通道的并发上限、占用数与等待数"""
+        with self._lock:
+            return {
+                resource: {
+                    "size": self._sizes[resource],
+                    "express_reserve": self._reserve_sizes[resource],
+                    "in_use": self._in_use[resource],
+                    "waiting": self._waiting[resource]
+                }
+                for resource in self._lanes
+            }
+
+
+# 全局资源通道实例
+resource_lanes = ResourceLanes()
+
+
+class Step:
+    """
+    处理步骤
+
+    属性:
+        name: 步骤名称
+        func: 步骤函数，签名为 func(results)，results 为已完成步骤的返回值字典；在工作线程中执行。
+              耗时的步骤应在循环中检查调度器的 stop_event，置位后尽快返回或抛出 StepCancelled，且不再写入结果
+        deps: 依赖的步骤名称列表
+        on_done: 步骤完成后的回调，签名为 on_done(result)；在调度线程中执行，用于写数据库、更新进度
+        resource: 资源类别，执行时占用对应的通道；为None时不受通道限制
+    """
+
+    def __init__(self, name, func, deps=(), on_done=None, resource=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.on_done = on_done
+        self.resource = resource
+
+
+class StepScheduler:
+    """
+    按依赖关系调度处理步骤
+
+    每个步骤在线程池中执行，并在独立的应用上下文中运行（拥有独立的数据库会话）；
+    停止标志检查、步骤完成回调均在调用 run 的线程中执行，因此任务状态和进度只由一个线程更新。
+    收到停止请求或任一步骤失败时置位 stop_event，通知仍在执行的步骤尽快结束。
+    """
+
+    def __init__(self, max_workers=None, poll_interval=0.5, express=False):
+        """
+        参数:
+            max_workers: 同时执行的最大步骤数，默认读取配置 PIPELINE_MAX_PARALLEL_STEPS（默认3）
+            poll_interval: 等待步骤完成时检查停止标志的间隔（秒）
+            express: 是否为快速通道任务，资源通道已满时可以使用预留名额
+        """
+        self.max_workers = max_workers or current_app.config.get('PIPELINE_MAX_PARALLEL_STEPS', 3)
+        self.poll_interval = poll_interval
+        self.express = express
+        self.steps = {}
+        self.stop_event = threading.Event()
+
+    def add_step(self, name, func, deps=(), on_done=None, resource=None):
+        """
+        添加步骤
+
+        依赖必须先于步骤添加，保证图中无环；未添加的依赖（如本次未选择执行的步骤）视为已满足。
+        resource 为None时按步骤名称从 STEP_RESOURCES（及配置 PIPELINE_STEP_RESOURCES）中查找资源类别。
+        """
+        if name in self.steps:
+            raise ValueError(f"步骤已存在: {name}")
+        if resource is None:
+            resource = dict(STEP_RESOURCES, **current_app.config.get('PIPELINE_STEP_RESOURCES', {})).get(name)
+        self.steps[name] = Step(name, func, [dep for dep in deps if dep in self.steps], on_done, resource)
+        return self.steps[name]
+
+    def has_step(self, name):
+        return name in self.steps
+
+    def _run_step(self, app, step, results):
+        with app.app_context():
+            if self.stop_event.is_set():
+                raise StepCancelled()
+            if step.resource is None:
+                return step.func(results)
+            acquired = resource_lanes.acquire(step.resource, self.stop_event, self.poll_interval, self.express)
+            try:
+                return step.func(results)
+            finally:
+                resource_lanes.release(step.resource, acquired)
+
+    def run(self, stop_flag=None):
+        """
+        执行所有步骤
+
+        参数:
+            stop_flag: 停止标志(threading.Event)
+
+        返回:
+            dict: 步骤名称 -> 步骤返回值
+
+        异常:
+            StepCancelled: 收到停止请求
+            其他异常: 任一步骤或回调失败时原样抛出，尚未开始的步骤不再执行
+
+        抛出异常前会等待仍在执行的步骤结束，保证返回后不再有步骤占用资源通道或写入结果
+        """
+        app = current_app._get_current_object()
+        results = {}
+        pending = dict(self.steps)
+        running = {}
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="video-step")
+        try:
+            while pending or running:
+                if stop_flag and stop_flag.is_set():
+                    raise StepCancelled()
+
+                # 提交所有依赖已完成的步骤，按添加顺序保证优先级
+                for name, step in list(pending.items()):
+                    if all(dep in results for dep in step.deps):
+                        del pending[name]
+                        future = executor.submit(self._run_step, app, step, results)
+                        running[future] = step
+
+                if not running:
+                    raise RuntimeError(f"步骤依赖无法满足: {', '.join(pending)}")
+
+                done, _ = wait(list(running), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    result = future.result()
+                    if step.on_done:
+                        step.on_done(result)
+                    results[step.name] = result
+            return results
+        except BaseException:
+            # 通知执行中的步骤停止，尚未开始的步骤直接取消
+            self.stop_event.set()
+            raise
+        finally:
+            # 等待执行中的步骤结束，它们检查到 stop_event 后会丢弃结果并释放通道
+            executor.shutdown(wait=True, cancel_futures=True)
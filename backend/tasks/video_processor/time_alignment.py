@@ -0,0 +1,121 @@
+"""
+时间对齐模块
+将关键帧时间点保存为有序数组，用二分查找回答"某一时刻对应哪个关键帧"，
+并批量将带时间范围的片段（ASR语音段、字幕等）分配给关键帧
+"""
+
+import numpy as np
+
+# 分配方式：按片段开始时间分配，或按与关键帧显示区间的重叠时长分配
+ALIGN_BY_START = "start"
+ALIGN_BY_OVERLAP = "overlap"
+ALIGN_MODES = (ALIGN_BY_START, ALIGN_BY_OVERLAP)
+
+
+class KeyframeTimeline:
+    """
+    关键帧时间轴
+
+    第 i 个关键帧的显示区间为 [t_i, t_{i+1})，最后一个关键帧一直持续到视频结束；
+    早于第一个关键帧的时刻归属第一个关键帧。
+    """
+
+    def __init__(self, keyframes_data):
+        """
+        参数:
+            keyframes_data: 关键帧数据列表，每项包含 time_point
+        """
+        times = np.asarray([frame["time_point"] for frame in keyframes_data], dtype=np.float64)
+        # 稳定排序，时间点相同的关键帧保持原有顺序
+        self.order = np.argsort(times, kind="stable")
+        self.times = times[self.order]
+        self.keyframes = [keyframes_data[i] for i in self.order]
+
+    def __len__(self):
+        return len(self.keyframes)
+
+    def indices_at(self, time_points):
+        """
+        批量查找时刻对应的关键帧下标（有序关键帧列表中的位置）
+
+        参数:
+            time_points: 时刻数组（秒）
+
+        返回:
+            np.ndarray，与 time_points 一一对应的下标
+        """
+        indices = np.searchsorted(self.times, np.asarray(time_points, dtype=np.float64), side="right") - 1
+        return np.clip(indices, 0, len(self.times) - 1)
+
+    def index_at(self, time_point):
+        """返回时刻对应的关键帧下标"""
+        return int(self.indices_at([time_point])[0])
+
+    def keyframe_at(self, time_point):
+        """返回时刻对应的关键帧，没有关键帧时返回None"""
+        if not self.keyframes:
+            return None
+        return self.keyframes[self.index_at(time_point)]
+
+    def assign_indices(self, starts, ends=None, mode=ALIGN_BY_START):
+        """
+        将时间片段分配给关键帧
+
+        参数:
+            starts: 片段开始时间数组
+            ends: 片段结束时间数组，overlap 模式下必须提供
+            mode: "start" 按开始时间所在的关键帧分配；
+                  "overlap" 分配给与片段重叠时长最长的关键帧，适用于跨越翻页的长片段
+
+        返回:
+            np.ndarray，每个片段对应的关键帧下标
+        """
+        if mode not in ALIGN_MODES:
+            raise ValueError(f"不支持的对齐方式: {mode}")
+
+        starts = np.asarray(starts, dtype=np.float64)
+        first = self.indices_at(starts)
+        if mode == ALIGN_BY_START or ends is None or len(first) == 0:
+            return first
+
+        ends = np.maximum(np.asarray(ends, dtype=np.float64), starts)
+        # 结束时刻本身不属于片段，取左侧查找，避免恰好在翻页时刻结束的片段被算作跨页
+        last = np.clip(np.searchsorted(self.times, ends, side="left") - 1, first, len(self.times) - 1)
+        spanning = np.nonzero(last > first)[0]
+        if len(spanning) == 0:
+            return first
+
+        # 各关键帧显示区间的边界，首尾向外延伸到无穷
+        lower = np.concatenate(([-np.inf], self.times[1:]))
+        upper = np.concatenate((self.times[1:], [np.inf]))
+
+        result = first.copy()
+        for i in spanning:
+            candidates = np.arange(first[i], last[i] + 1)
+            overlap = np.minimum(upper[candidates], ends[i]) - np.maximum(lower[candidates], starts[i])
+            # 重叠时长相同时取较早的关键帧
+            result[i] = candidates[int(np.argmax(overlap))]
+        return result
+
+    def assign_segments(self, segments, mode=ALIGN_BY_START, start_key="start", end_key="end"):
+        """
+        将片段列表分配给关键帧
+
+        参数:
+            segments: 片段列表，每项包含开始与结束时间
+            mode: 分配方式，见 assign_indices
+            start_key: 开始时间字段名
+            end_key: 结束时间字段名
+
+        返回:
+            列表，与有序关键帧一一对应，每项为分配到该关键帧的片段列表（保持片段原有顺序）
+        """
+        groups = [[] for _ in self.keyframes]
+        if not segments or not self.keyframes:
+            return groups
+
+        starts = [segment[start_key] for segment in segments]
+        ends = [segment.get(end_key, segment[start_key]) for segment in segments] if mode == ALIGN_BY_OVERLAP else None
+        for segment, index in zip(segments, self.assign_indices(starts, ends, mode).tolist()):
+            groups[index].append(segment)
+        return groups
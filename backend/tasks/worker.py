@@ -0,0 +1,96 @@
+"""
+独立的任务执行进程
+API 进程配置 TASK_WORKERS_EMBEDDED = False 后只负责将任务写入持久化队列，
+由本进程租用并执行视频处理与知识图谱任务，OCR/ASR 等CPU密集的步骤不再与请求处理争用GIL。
+可以同时启动多个进程横向扩展，各进程通过队列租约保证同一任务只被执行一次。
+
+用法（在 backend 目录下运行，视频等文件路径相对于当前目录解析）:
+    python -m tasks.worker
+    python -m tasks.worker --queues video --workers 4
+"""
+
+import os
+# 导入 OpenMP 冲突修复
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+import signal
+import logging
+import argparse
+import threading
+
+import dotenv
+from flask import Flask
+
+from config import Config, DebugConfig
+from models.models import db
+
+QUEUES = ["video", "knowledge_graph"]
+
+
+def create_worker_app():
+    """创建只用于执行任务的应用，不注册路由"""
+    app = Flask(__name__)
+    if os.getenv('IS_DEBUG') == 'True':
+        app.config.from_object(DebugConfig)
+    else:
+        app.config.from_object(Config)
+    db.init_app(app)
+
+    # 设置app的全局线程信息字典
+    app.PROCESSING_THREADS = {}
+    return app
+
+
+def get_pool(queue_name):
+    """返回队列对应的全局线程池实例"""
+    if queue_name == "video":
+        from utils.video_processing_pool import video_processing_pool
+        return video_processing_pool
+    from utils.knowledge_graph_processing_pool import knowledge_graph_processing_pool
+    return knowledge_graph_processing_pool
+
+
+def run_worker(queues, workers=None):
+    """
+    启动工作线程并阻塞，收到 SIGTERM/SIGINT 后关闭线程池，执行中的任务放回队列
+
+    参数:
+        queues: 要消费的队列名称列表
+        workers: 每个队列的工作线程数，为None时使用配置或线程池的默认值
+    """
+    app = create_worker_app()
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+
+    pools = []
+    for queue_name in queues:
+        pool = get_pool(queue_name)
+        pool.init_app(app, consume=True, max_workers=workers)
+        pools.append(pool)
+        app.logger.info(f"开始消费队列 {queue_name}，工作线程数: {pool.max_workers}")
+
+    while not stop_event.wait(1):
+        pass
+
+    app.logger.info("正在关闭，执行中的任务将放回队列")
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+    # 关闭常驻的模型进程池
+    from utils.model_registry import model_registry
+    model_registry.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视频处理与知识图谱任务执行进程")
+    parser.add_argument("-q", "--queues", nargs="+", choices=QUEUES, default=QUEUES, help="要消费的队列")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="每个队列的工作线程数")
+    args = parser.parse_args()
+
+    dotenv.load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+    run_worker(args.queues, args.workers)
+
+
+if __name__ == "__main__":
+    main()
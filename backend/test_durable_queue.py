@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+测试基于SQLite的持久化任务队列：租用、续租、过期回收、优先级与公平轮转
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from utils.durable_queue import (
+    DurableQueue, FAIRNESS_WINDOW, PRIORITY_EXPRESS, PRIORITY_HIGH, PRIORITY_LOW, STATUS_CANCELLED, STATUS_DONE,
+    STATUS_FAILED, STATUS_LEASED, STATUS_PENDING
+)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return DurableQueue(str(tmp_path / "queue.db"), visibility_timeout=60, max_attempts=2)
+
+
+def expire_leases(queue):
+    """把所有执行中任务的租约改为已过期"""
+    queue._connection().execute("UPDATE jobs SET lease_expires = ? WHERE status = ?", (time.time() - 1, STATUS_LEASED))
+
+
+def test_lease_complete_and_fail(queue):
+    queue.put("video", "t1", {"video_id": 1})
+    queue.put("video", "t2", {"video_id": 2})
+
+    job = queue.lease("video", "owner-a")
+    assert job.task_id == "t1"
+    assert job.payload == {"video_id": 1}
+    assert job.attempts == 1
+    assert queue.get_status("t1") == STATUS_LEASED
+
+    # 其他执行者不能完成不属于自己的租约
+    assert not queue.complete(job.id, "owner-b")
+    assert queue.complete(job.id, "owner-a")
+    assert queue.get_status("t1") == STATUS_DONE
+
+    job = queue.lease("video", "owner-a")
+    assert queue.fail(job.id, "owner-a", "boom")
+    assert queue.get_status("t2") == STATUS_FAILED
+    assert queue.lease("video", "owner-a") is None
+
+
+def test_queues_are_isolated(queue):
+    queue.put("knowledge_graph", "kg", {})
+    assert queue.lease("video", "owner") is None
+    assert queue.lease("knowledge_graph", "owner").task_id == "kg"
+
+
+def test_heartbeat_extends_lease_until_cancelled(queue):
+    queue.put("video", "t1", {})
+    job = queue.lease("video", "owner")
+    before = queue.get_job("t1").lease_expires
+
+    time.sleep(0.01)
+    assert queue.heartbeat(job.id, "owner")
+    assert queue.get_job("t1").lease_expires > before
+    assert not queue.heartbeat(job.id, "someone-else")
+
+    assert queue.cancel("t1") == STATUS_LEASED
+    assert queue.get_status("t1") == STATUS_CANCELLED
+    assert not queue.heartbeat(job.id, "owner")
+    assert not queue.complete(job.id, "owner")
+
+
+def test_expired_leases_are_requeued_then_failed(queue):
+    queue.put("video", "t1", {})
+    queue.lease("video", "owner-a")
+
+    # 租约未过期时不回收
+    assert queue.requeue_expired("video") == ([], [])
+
+    expire_leases(queue)
+    assert queue.requeue_expired("video") == (["t1"], [])
+    assert queue.get_status("t1") == STATUS_PENDING
+
+    # 第二次租用后过期，达到 max_attempts 标记为失败
+    job = queue.lease("video", "owner-b")
+    assert job.attempts == 2
+    expire_leases(queue)
+    assert queue.requeue_expired("video") == ([], ["t1"])
+    assert queue.get_status("t1") == STATUS_FAILED
+
+
+def test_release_does_not_count_as_attempt(queue):
+    queue.put("video", "t1", {})
+    job = queue.lease("video", "owner")
+    assert queue.release(job.id, "owner")
+    assert queue.get_status("t1") == STATUS_PENDING
+    assert queue.lease("video", "owner").attempts == 1
+
+
+def test_priority_order_and_min_priority(queue):
+    queue.put("video", "low", {}, priority=PRIORITY_LOW)
+    queue.put("video", "normal", {})
+    queue.put("video", "high", {}, priority=PRIORITY_HIGH)
+    queue.put("video", "express", {}, priority=PRIORITY_EXPRESS)
+
+    # 快速通道只租用 express 任务
+    assert queue.lease("video", "express-lane", min_priority=PRIORITY_EXPRESS).task_id == "express"
+    assert queue.lease("video", "express-lane", min_priority=PRIORITY_EXPRESS) is None
+
+    assert [queue.lease("video", "owner").task_id for _ in range(3)] == ["high", "normal", "low"]
+
+
+def test_fair_groups_take_turns(queue):
+    for index in range(3):
+        queue.put("video", f"a{index}", {}, fair_key="teacher:a")
+    for index in range(2):
+        queue.put("video", f"b{index}", {}, fair_key="teacher:b")
+    queue.put("video", "c0", {}, fair_key="teacher:c")
+
+    expected = ["a0", "b0", "c0", "a1", "b1", "a2"]
+    assert [job.task_id for job in queue.ordered_pending("video")] == expected
+
+    # 租用顺序与预计顺序一致；每个任务在下一次租用前完成，按最久未被执行的分组轮转
+    leased = []
+    for _ in expected:
+        job = queue.lease("video", "owner")
+        leased.append(job.task_id)
+        queue.complete(job.id, "owner")
+        time.sleep(0.002)
+    assert leased == expected
+
+
+def test_fair_groups_prefer_fewer_running_tasks(queue):
+    queue.put("video", "a0", {}, fair_key="teacher:a")
+    queue.put("video", "a1", {}, fair_key="teacher:a")
+    queue.put("video", "b0", {}, fair_key="teacher:b")
+    queue.put("video", "b1", {}, fair_key="teacher:b")
+
+    assert queue.lease("video", "owner").task_id == "a0"
+    # a0 仍在执行，b 分组先执行
+    assert queue.lease("video", "owner").task_id == "b0"
+    assert queue.lease("video", "owner").task_id == "a1"
+
+
+def test_fairness_ignores_leases_outside_window(queue):
+    queue.put("video", "old", {}, fair_key="teacher:a")
+    job = queue.lease("video", "owner")
+    queue.complete(job.id, "owner")
+    queue.put("video", "a0", {}, fair_key="teacher:a")
+    queue.put("video", "b0", {}, fair_key="teacher:b")
+
+    # 分组 a 刚被执行过，b 先执行
+    assert [job.task_id for job in queue.ordered_pending("video")] == ["b0", "a0"]
+
+    # 超出公平窗口的租用记录不再影响顺序，两个分组都按从未执行处理，按入队顺序
+    queue._connection().execute(
+        "UPDATE jobs SET leased_at = ? WHERE task_id = ?", (time.time() - FAIRNESS_WINDOW - 10, "old")
+    )
+    assert [job.task_id for job in queue.ordered_pending("video")] == ["a0", "b0"]
+    assert queue.lease("video", "owner").task_id == "a0"
+
+
+def test_purge_removes_only_old_finished_jobs(queue):
+    queue.put("video", "done", {})
+    queue.put("video", "pending", {})
+    queue.put("knowledge_graph", "other", {})
+    job = queue.lease("video", "owner")
+    queue.complete(job.id, "owner")
+    job = queue.lease("knowledge_graph", "owner")
+    queue.complete(job.id, "owner")
+
+    assert queue.purge(3600) == 0
+    queue._connection().execute("UPDATE jobs SET updated_at = ?", (time.time() - 7200,))
+    assert queue.purge(3600, "video") == 1
+    assert queue.get_job("done") is None
+    assert queue.get_status("pending") == STATUS_PENDING
+    assert queue.get_status("other") == STATUS_DONE
+    assert queue.purge(3600) == 1
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+测试区域差分增量OCR：变化区域检测、旧文本框沿用与整帧/增量/沿用三种识别方式
+"""
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+
+from utils.ocr_incremental import (
+    expand_regions, find_changed_regions, incremental_ocr, item_bbox, merge_boxes
+)
+
+WIDTH, HEIGHT = 400, 300
+
+
+class FakeOCR:
+    """把每个深色矩形当作一行文字，文本为矩形的宽度，记录每次识别的输入尺寸"""
+
+    def __init__(self):
+        self.calls = []
+
+    def ocr(self, image, rec_batch_size=1):
+        self.calls.append(image.shape[:2])
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        count, _, stats, _ = cv2.connectedComponentsWithStats((gray < 128).astype(np.uint8), connectivity=8)
+        result = []
+        for label in range(1, count):
+            x, y, w, h, _ = stats[label]
+            result.append({
+                'text': f"line-{w}",
+                'position': [[x, y], [x + w, y], [x + w, y + h], [x, y + h]],
+                'score': 0.99
+            })
+        return result
+
+
+def serialize(result):
+    return [item['text'] for item in result], [dict(item) for item in result]
+
+
+def slide(lines):
+    """白底幻灯片，lines 为 [(x, y, w), ...]，每行画一个高12像素的黑色矩形"""
+    image = np.full((HEIGHT, WIDTH, 3), 255, dtype=np.uint8)
+    for x, y, w in lines:
+        cv2.rectangle(image, (x, y), (x + w - 1, y + 11), (0, 0, 0), thickness=-1)
+    return image
+
+
+def write_slides(tmp_path, slides):
+    paths = []
+    for index, image in enumerate(slides):
+        path = str(tmp_path / f"keyframe_{index:04d}.png")
+        cv2.imwrite(path, image)
+        paths.append(path)
+    return paths
+
+
+def test_find_changed_regions():
+    base = cv2.cvtColor(slide([(20, 20, 200)]), cv2.COLOR_BGR2GRAY)
+    assert find_changed_regions(base, base.copy()) == ([], 0.0)
+
+    changed = cv2.cvtColor(slide([(20, 20, 200), (20, 200, 120)]), cv2.COLOR_BGR2GRAY)
+    regions, ratio = find_changed_regions(base, changed)
+    assert len(regions) == 1
+    x0, y0, x1, y1 = regions[0]
+    assert x0 <= 20 and y0 <= 200 and x1 >= 140 and y1 >= 212
+    # 未变化的第一行不在变化区域内
+    assert y0 > 32
+    assert 0 < ratio < 0.2
+
+
+def test_merge_and_expand_regions():
+    assert sorted(merge_boxes([(0, 0, 10, 10), (5, 5, 20, 20), (50, 50, 60, 60)])) == [(0, 0, 20, 20), (50, 50, 60, 60)]
+
+    items = [
+        {'text': 'kept', 'position': [[10, 10], [100, 10], [100, 20], [10, 20]]},
+        {'text': 'cut', 'position': [[10, 100], [300, 100], [300, 112], [10, 112]]},
+    ]
+    regions, carried = expand_regions([(250, 95, 320, 115)], items, WIDTH, HEIGHT)
+    # 变化区域扩展到覆盖被它切开的旧文本框
+    assert regions == [(10, 95, 320, 115)]
+    assert [item['text'] for item in carried] == ['kept']
+    assert item_bbox(items[1]) == (10, 100, 300, 112)
+
+
+def test_incremental_modes(tmp_path):
+    first = [(20, 20, 200), (20, 60, 150)]
+    slides = [
+        slide(first),
+        slide(first),                          # 无变化
+        slide(first + [(20, 200, 120)]),       # 新增一行
+        slide([(x, y + 100, w) for x, y, w in first] + [(30, 30, 330), (30, 240, 330)]),  # 整页变化
+    ]
+    ocr = FakeOCR()
+    results = incremental_ocr(ocr, write_slides(tmp_path, slides), serialize)
+
+    assert [mode for _, _, _, mode in results] == ["full", "carried", "incremental", "full"]
+    assert all(error is None for _, _, error, _ in results)
+    assert results[1][0] == results[0][0] == ["line-200", "line-150"]
+
+    # 增量识别只处理新增行附近的区域，合并后按阅读顺序排列，坐标换算回整帧
+    texts, raw, _, _ = results[2]
+    assert texts == ["line-200", "line-150", "line-120"]
+    assert item_bbox(raw[2]) == (20, 200, 140, 212)
+    assert ocr.calls[1][0] < HEIGHT // 2
+
+    assert len(ocr.calls) == 3
+    assert ocr.calls[0] == ocr.calls[2] == (HEIGHT, WIDTH)
+
+
+def test_unreadable_frame_resets_to_full(tmp_path):
+    paths = write_slides(tmp_path, [slide([(20, 20, 200)]), slide([(20, 20, 200)])])
+    paths.insert(1, str(tmp_path / "missing.png"))
+    results = incremental_ocr(FakeOCR(), paths, serialize)
+
+    assert results[1][2].startswith("无法读取图片")
+    assert [mode for _, _, _, mode in results] == ["full", "full", "full"]
+
+
+def test_stop_flag_skips_remaining_frames(tmp_path):
+    stop_flag = threading.Event()
+    stop_flag.set()
+    ocr = FakeOCR()
+    assert incremental_ocr(ocr, write_slides(tmp_path, [slide([])]), serialize, stop_flag=stop_flag) == []
+    assert ocr.calls == []
+
+
+def test_ocr_errors_are_reported_per_frame(tmp_path):
+    class FailingOCR(FakeOCR):
+        def ocr(self, image, rec_batch_size=1):
+            raise RuntimeError("模型推理失败")
+
+    results = incremental_ocr(FailingOCR(), write_slides(tmp_path, [slide([(20, 20, 200)])]), serialize)
+    assert results == [([], [], "模型推理失败", "full")]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+测试批量感知哈希工具
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+
+from utils.phash_util import (
+    DEDUP_WINDOW, IMAGE_SIZE, batch_phash, dedup_hashes, downscale_frame, hamming_distance, hash_to_hex,
+    hex_to_hash, popcount
+)
+
+
+def reference_phash(small_frame):
+    """与 imagehash.phash 相同的逐帧实现：二维 DCT 后取左上 8x8 与中位数比较"""
+    fftpack = pytest.importorskip("scipy.fftpack")
+    dct = fftpack.dct(fftpack.dct(small_frame.astype(np.float64), axis=0), axis=1)
+    low = dct[:8, :8]
+    bits = (low > np.median(low)).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def sequential_dedup(hashes, threshold, previous_hash=None):
+    """逐帧比较的去重，作为 dedup_hashes 的对照"""
+    kept = []
+    reference = previous_hash
+    for index, value in enumerate(hashes):
+        if reference is None or bin(int(value) ^ int(reference)).count("1") > threshold:
+            kept.append(index)
+            reference = value
+    return kept, reference
+
+
+def random_frames(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(count, IMAGE_SIZE, IMAGE_SIZE), dtype=np.uint8)
+
+
+def test_batch_phash_matches_reference():
+    """批量计算的哈希与逐帧 DCT 的结果逐位一致"""
+    frames = random_frames(16)
+    hashes = batch_phash(frames)
+    assert hashes.dtype == np.uint64
+    assert [int(value) for value in hashes] == [reference_phash(frame) for frame in frames]
+
+
+def test_batch_phash_accepts_single_frame_and_empty_batch():
+    frame = random_frames(1, seed=1)[0]
+    assert batch_phash(frame).shape == (1,)
+    assert int(batch_phash(frame)[0]) == int(batch_phash([frame])[0])
+    assert batch_phash([]).shape == (0,)
+
+
+def test_downscale_frame_converts_color_frames():
+    rng = np.random.default_rng(2)
+    color = rng.integers(0, 256, size=(72, 128, 3), dtype=np.uint8)
+    small = downscale_frame(color)
+    assert small.shape == (IMAGE_SIZE, IMAGE_SIZE)
+    assert small.dtype == np.uint8
+
+
+def test_popcount_and_hamming_distance():
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 2 ** 63, size=100, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    assert popcount(values).tolist() == [bin(int(value)).count("1") for value in values]
+    assert hamming_distance(values, values[0]).tolist() == [
+        bin(int(value) ^ int(values[0])).count("1") for value in values
+    ]
+
+
+@pytest.mark.parametrize("threshold", [0, 5, 20])
+def test_dedup_matches_sequential_comparison(threshold):
+    """去重结果与逐帧比较完全一致，包括超过比较窗口的长静止片段"""
+    rng = np.random.default_rng(threshold)
+    hashes = []
+    current = int(rng.integers(0, 2 ** 63))
+    for _ in range(40):
+        # 每个片段内只翻转少量位，片段之间整体变化
+        for _ in range(int(rng.integers(1, DEDUP_WINDOW * 3))):
+            hashes.append(current ^ (1 << int(rng.integers(0, 64))))
+        current = int(rng.integers(0, 2 ** 63))
+    hashes = np.array(hashes, dtype=np.uint64)
+
+    kept, last = dedup_hashes(hashes, threshold)
+    expected, expected_last = sequential_dedup(hashes, threshold)
+    assert kept == expected
+    assert int(last) == int(expected_last)
+
+
+def test_dedup_continues_from_previous_batch():
+    """分批去重时传入上一批的最后保留哈希，结果与整段去重一致"""
+    rng = np.random.default_rng(7)
+    hashes = np.repeat(rng.integers(0, 2 ** 63, size=30, dtype=np.uint64), 50)
+
+    whole, _ = dedup_hashes(hashes, 10)
+    kept = []
+    previous = None
+    for start in range(0, len(hashes), 256):
+        batch_kept, previous = dedup_hashes(hashes[start:start + 256], 10, previous)
+        kept.extend(start + index for index in batch_kept)
+    assert kept == whole
+    assert dedup_hashes([], 10) == ([], None)
+
+
+def test_hex_round_trip():
+    value = np.uint64(0x0123456789ABCDEF)
+    assert hash_to_hex(value) == "0123456789abcdef"
+    assert hex_to_hash(hash_to_hex(value)) == int(value)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+测试处理步骤调度：依赖顺序、停止请求与步骤失败时的中断，以及ffmpeg读取器响应停止标志
+"""
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask
+
+from tasks.video_processor.step_scheduler import StepScheduler, StepCancelled
+from tasks.video_processor.frame_reader import FFmpegFrameReader
+
+
+@pytest.fixture
+def app_context():
+    app = Flask(__name__)
+    app.config['PIPELINE_LANES'] = {'cpu': 4, 'network': 4}
+    with app.app_context():
+        yield app
+
+
+def wait_for_stop(scheduler, timeout=5):
+    """模拟耗时步骤：循环检查 stop_event，置位后抛出 StepCancelled"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if scheduler.stop_event.wait(0.01):
+            raise StepCancelled()
+    raise AssertionError("步骤没有收到停止通知")
+
+
+def test_steps_run_after_dependencies(app_context):
+    scheduler = StepScheduler(poll_interval=0.05)
+    order = []
+
+    scheduler.add_step("keyframes", lambda results: "frames", on_done=order.append)
+    scheduler.add_step("asr", lambda results: "segments", on_done=order.append)
+    scheduler.add_step("ocr", lambda results: results["keyframes"] + "+ocr", deps=["keyframes"], on_done=order.append)
+    scheduler.add_step("align", lambda results: (results["ocr"], results["asr"]), deps=["ocr", "asr", "missing"])
+
+    results = scheduler.run()
+    assert results["align"] == ("frames+ocr", "segments")
+    assert order.index("frames") < order.index("frames+ocr")
+    assert not scheduler.stop_event.is_set()
+
+
+def test_stop_flag_interrupts_running_steps(app_context):
+    scheduler = StepScheduler(poll_interval=0.05)
+    stop_flag = threading.Event()
+    finished = []
+    started = threading.Event()
+
+    def long_step(results):
+        started.set()
+        try:
+            wait_for_stop(scheduler)
+        finally:
+            finished.append("keyframes")
+
+    scheduler.add_step("keyframes", long_step)
+    scheduler.add_step("ocr", lambda results: finished.append("ocr"), deps=["keyframes"])
+
+    threading.Thread(target=lambda: started.wait(5) and stop_flag.set(), daemon=True).start()
+    with pytest.raises(StepCancelled):
+        scheduler.run(stop_flag)
+
+    # run 返回前执行中的步骤已经结束，依赖它的步骤没有开始
+    assert finished == ["keyframes"]
+    assert scheduler.stop_event.is_set()
+
+
+def test_failed_step_stops_other_steps(app_context):
+    scheduler = StepScheduler(poll_interval=0.05)
+    cancelled = []
+
+    def asr(results):
+        try:
+            wait_for_stop(scheduler)
+        except StepCancelled:
+            cancelled.append("asr")
+            raise
+
+    def keyframes(results):
+        time.sleep(0.05)
+        raise ValueError("解码失败")
+
+    scheduler.add_step("asr", asr)
+    scheduler.add_step("keyframes", keyframes)
+    scheduler.add_step("ocr", lambda results: pytest.fail("依赖失败步骤的步骤不应执行"), deps=["keyframes"])
+
+    with pytest.raises(ValueError):
+        scheduler.run()
+    assert cancelled == ["asr"]
+
+
+def test_failed_callback_stops_scheduling(app_context):
+    scheduler = StepScheduler(poll_interval=0.05)
+
+    def keyframes_done(result):
+        raise RuntimeError("没有关键帧数据")
+
+    scheduler.add_step("keyframes", lambda results: [], on_done=keyframes_done)
+    scheduler.add_step("ocr", lambda results: pytest.fail("回调失败后不应继续调度"), deps=["keyframes"])
+
+    with pytest.raises(RuntimeError):
+        scheduler.run()
+
+
+def test_frame_reader_kills_process_on_stop(monkeypatch):
+    """ffmpeg 长时间没有输出（如场景检测丢弃了大段帧）时，停止标志也能立即终止进程"""
+    stop_flag = threading.Event()
+    reader = FFmpegFrameReader("video.mp4", 4, 4, stop_flag=stop_flag)
+    monkeypatch.setattr(reader, "_build_command", lambda: [sys.executable, "-c", "import time; time.sleep(30)"])
+
+    threading.Timer(0.2, stop_flag.set).start()
+    start = time.monotonic()
+    with pytest.raises(StepCancelled):
+        with reader:
+            for _ in reader:
+                pass
+    assert time.monotonic() - start < 5
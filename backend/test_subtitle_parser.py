@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+测试字幕解析：SRT、WebVTT、ASS 的时间轴与文本清理、编码识别，以及转换为 JSON 字幕文件
+"""
+import sys
+import os
+import io
+import json
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from utils.subtitle_parser import (
+    convert_subtitle_to_json, iter_subtitle_segments, open_text_stream, parse_timestamp
+)
+
+SRT = """1
+00:00:01,000 --> 00:00:04,500
+<i>第一行</i>
+第二行
+
+2
+00:00:05,000 --> 00:00:06,000
+A &amp; B
+3
+00:00:06,000 --> 00:00:07,250
+缺少空行分隔
+"""
+
+VTT = """WEBVTT
+
+NOTE 这是注释块
+
+STYLE
+::cue { color: yellow }
+
+intro
+01:02.500 --> 01:04.000 align:start position:10%
+<v 讲师>欢迎</v>
+
+01:00:00.000 --> 01:00:01.000
+一小时
+"""
+
+ASS = """[Script Info]
+Title: 测试
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize
+Style: Default,Arial,20
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Dialogue: 0,0:00:03.00,0:00:05.50,Default,,0,0,0,,{\\an8}第二条, 含逗号
+Dialogue: 0,0:00:01.20,0:00:02.00,Default,,0,0,0,,第一条\\N换行
+Comment: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,注释不输出
+Dialogue: 0,0:00:06.00,0:00:07.00,Default,,0,0,0,,{\\b1}
+"""
+
+
+def parse(text, subtitle_format):
+    return list(iter_subtitle_segments(io.StringIO(text), subtitle_format))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("00:00:01,000", 1.0),
+    ("01:02.5", 62.5),
+    ("1:00:00.25", 3600.25),
+    ("0:00:03.00", 3.0),
+])
+def test_parse_timestamp(text, expected):
+    assert parse_timestamp(text) == expected
+
+
+def test_srt_cues():
+    segments = parse(SRT, "srt")
+    assert [(s["id"], s["start"], s["end"], s["text"]) for s in segments] == [
+        (0, 1.0, 4.5, "第一行 第二行"),
+        (1, 5.0, 6.0, "A & B"),
+        (2, 6.0, 7.25, "缺少空行分隔"),
+    ]
+
+
+def test_vtt_skips_header_and_blocks():
+    segments = parse(VTT, "vtt")
+    assert [(s["start"], s["end"], s["text"]) for s in segments] == [
+        (62.5, 64.0, "欢迎"),
+        (3600.0, 3601.0, "一小时"),
+    ]
+
+
+def test_ass_events():
+    segments = parse(ASS, "ass")
+    assert [(s["start"], s["end"], s["text"]) for s in segments] == [
+        (3.0, 5.5, "第二条, 含逗号"),
+        (1.2, 2.0, "第一条 换行"),
+    ]
+
+
+def test_unsupported_format():
+    with pytest.raises(ValueError):
+        parse("", "sub")
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "gbk"])
+def test_open_text_stream_detects_encoding(encoding):
+    stream = open_text_stream(io.BytesIO(SRT.encode(encoding)))
+    segments = list(iter_subtitle_segments(stream, "srt"))
+    assert segments[0]["text"] == "第一行 第二行"
+
+
+def test_convert_sorts_and_numbers_cues(tmp_path):
+    json_path = tmp_path / "video.json"
+    count = convert_subtitle_to_json(io.BytesIO(ASS.encode("utf-8")), "ass", str(json_path))
+    assert count == 2
+
+    body = json.loads(json_path.read_text(encoding="utf-8"))["body"]
+    assert body == [
+        {"from": 1.2, "to": 2.0, "content": "第一条 换行", "sid": 1},
+        {"from": 3.0, "to": 5.5, "content": "第二条, 含逗号", "sid": 2},
+    ]
+
+    # 转换结果可以作为 JSON 字幕再次读取
+    segments = parse(json_path.read_text(encoding="utf-8"), "json")
+    assert [(s["start"], s["end"], s["text"]) for s in segments] == [(1.2, 2.0, "第一条 换行"), (3.0, 5.5, "第二条, 含逗号")]
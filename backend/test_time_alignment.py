@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+测试关键帧时间轴：二分查找时刻对应的关键帧，以及按开始时间或重叠时长分配片段
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+
+from tasks.video_processor.time_alignment import KeyframeTimeline, ALIGN_BY_OVERLAP, ALIGN_BY_START
+
+
+def make_timeline(times):
+    return KeyframeTimeline([{"id": i, "time_point": t} for i, t in enumerate(times)])
+
+
+def linear_index(times, time_point):
+    """逐个比较的参考实现：开始时间不晚于该时刻的最后一个关键帧，早于第一个关键帧时取第一个"""
+    index = 0
+    for i, t in enumerate(times):
+        if t <= time_point:
+            index = i
+    return index
+
+
+def linear_overlap(times, start, end):
+    """逐个计算重叠时长的参考实现，重叠相同时取较早的关键帧"""
+    if end <= start:
+        return linear_index(times, start)
+    best, best_overlap = None, -1.0
+    for i in range(len(times)):
+        lower = times[i] if i > 0 else -np.inf
+        upper = times[i + 1] if i + 1 < len(times) else np.inf
+        overlap = min(upper, end) - max(lower, start)
+        if overlap > best_overlap:
+            best, best_overlap = i, overlap
+    return best
+
+
+def test_sorts_keyframes_stably():
+    timeline = make_timeline([10.0, 0.0, 5.0, 5.0])
+    assert [frame["id"] for frame in timeline.keyframes] == [1, 2, 3, 0]
+    assert len(timeline) == 4
+
+
+def test_keyframe_at_boundaries():
+    timeline = make_timeline([0.0, 5.0, 10.0])
+    assert timeline.keyframe_at(-1.0)["id"] == 0
+    assert timeline.keyframe_at(4.999)["id"] == 0
+    # 翻页时刻属于新的关键帧
+    assert timeline.keyframe_at(5.0)["id"] == 1
+    assert timeline.keyframe_at(1000.0)["id"] == 2
+    assert make_timeline([]).keyframe_at(1.0) is None
+
+
+def test_indices_match_linear_search():
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.uniform(0, 600, size=50)).tolist()
+    timeline = make_timeline(times)
+    points = rng.uniform(-10, 650, size=500)
+    assert timeline.indices_at(points).tolist() == [linear_index(times, p) for p in points]
+
+
+def test_assign_by_start():
+    timeline = make_timeline([0.0, 10.0, 20.0])
+    segments = [
+        {"start": 1.0, "end": 3.0, "text": "a"},
+        {"start": 9.0, "end": 19.0, "text": "b"},
+        {"start": 12.0, "end": 13.0, "text": "c"},
+        {"start": 25.0, "end": 26.0, "text": "d"},
+    ]
+    groups = timeline.assign_segments(segments)
+    assert [[s["text"] for s in group] for group in groups] == [["a", "b"], ["c"], ["d"]]
+
+
+def test_assign_by_overlap():
+    timeline = make_timeline([0.0, 10.0, 20.0])
+    segments = [
+        {"start": 9.0, "end": 19.0, "text": "mostly-second"},
+        {"start": 8.0, "end": 10.0, "text": "ends-at-page-turn"},
+        {"start": 8.0, "end": 12.0, "text": "tie"},
+        {"start": 5.0, "text": "no-end"},
+        {"start": 2.0, "end": 30.0, "text": "spans-all"},
+    ]
+    groups = timeline.assign_segments(segments, mode=ALIGN_BY_OVERLAP)
+    assert [[s["text"] for s in group] for group in groups] == [
+        ["ends-at-page-turn", "tie", "no-end"],
+        ["mostly-second", "spans-all"],
+        [],
+    ]
+
+
+def test_overlap_matches_reference():
+    rng = np.random.default_rng(1)
+    times = np.sort(rng.uniform(0, 300, size=20)).tolist()
+    timeline = make_timeline(times)
+    starts = rng.uniform(-5, 320, size=300)
+    ends = starts + rng.exponential(20, size=300)
+    result = timeline.assign_indices(starts, ends, ALIGN_BY_OVERLAP).tolist()
+    assert result == [linear_overlap(times, s, e) for s, e in zip(starts, ends)]
+
+
+def test_invalid_mode_and_empty_input():
+    timeline = make_timeline([0.0, 10.0])
+    with pytest.raises(ValueError):
+        timeline.assign_indices([1.0], mode="nearest")
+    assert timeline.assign_indices([], [], ALIGN_BY_OVERLAP).tolist() == []
+    assert timeline.assign_segments([], mode=ALIGN_BY_START) == [[], []]
+    assert make_timeline([]).assign_segments([{"start": 1.0, "end": 2.0}]) == []
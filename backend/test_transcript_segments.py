@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+测试语音识别片段的保存与按时间窗口查询，包括相互重叠的字幕片段
+"""
+import sys
+import os
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask
+
+from models.models import db, VideoTranscriptSegment
+from tasks.video_processor.db_handler import save_transcript_segments, query_transcript_segments
+
+
+@pytest.fixture
+def app_context():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        VideoTranscriptSegment.__table__.create(db.engine)
+        yield app
+        db.session.remove()
+
+
+def save(video_id, cues):
+    assert save_transcript_segments(video_id, [{"start": start, "end": end, "text": text} for start, end, text in cues])
+
+
+def texts(result):
+    return [segment["text"] for segment in result[1]]
+
+
+def test_window_returns_overlapping_cues(app_context):
+    video_id = uuid.uuid4()
+    save(video_id, [
+        (0.0, 30.0, "long"),      # 一直显示到 30 秒的长字幕
+        (5.0, 8.0, "short-1"),
+        (9.0, 12.0, "short-2"),
+        (12.0, 16.0, "short-3"),
+        (31.0, 35.0, "later")
+    ])
+
+    # 10 秒时正在显示的有 long 与 short-2，long 不是 10 秒前开始的最后一个片段
+    assert texts(query_transcript_segments(video_id, 10.0, 13.0)) == ["long", "short-2", "short-3"]
+    assert texts(query_transcript_segments(video_id, 29.0)) == ["long", "later"]
+    # 结束时间等于窗口开始的片段不算重叠
+    assert texts(query_transcript_segments(video_id, 30.0, 32.0)) == ["later"]
+    assert texts(query_transcript_segments(video_id, None, 6.0)) == ["long", "short-1"]
+
+
+def test_window_without_overlap(app_context):
+    video_id = uuid.uuid4()
+    save(video_id, [(i * 2.0, i * 2.0 + 2.0, f"s{i}") for i in range(10)])
+
+    assert texts(query_transcript_segments(video_id, 3.0, 7.0)) == ["s1", "s2", "s3"]
+    assert texts(query_transcript_segments(video_id, 100.0)) == []
+    assert query_transcript_segments(uuid.uuid4(), 0.0) == (0, [])
+
+
+def test_pagination_and_replacement(app_context):
+    video_id = uuid.uuid4()
+    other_id = uuid.uuid4()
+    save(video_id, [(float(i), i + 1.5, f"s{i}") for i in range(7)])
+    save(other_id, [(0.0, 100.0, "other")])
+
+    total, first_page = query_transcript_segments(video_id, 2.0, page=1, page_size=3)
+    assert total == 6
+    assert [segment["text"] for segment in first_page] == ["s1", "s2", "s3"]
+    assert texts(query_transcript_segments(video_id, 2.0, page=2, page_size=3)) == ["s4", "s5", "s6"]
+
+    # 重新保存时替换该视频已有的片段，不影响其他视频
+    save(video_id, [(0.0, 1.0, "new")])
+    assert texts(query_transcript_segments(video_id)) == ["new"]
+    assert texts(query_transcript_segments(other_id, 50.0)) == ["other"]
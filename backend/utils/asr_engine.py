@@ -1,60 +1,259 @@
 from abc import ABC, abstractmethod
 from flask import current_app
 import os
-import subprocess
 import json
+import math
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.model_registry import model_registry, map_until_stopped
+from utils.audio_util import load_audio, split_on_silence, SAMPLE_RATE
 try:
     import whisper
 except ImportError:
     whisper = None
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
 
 class ASREngine(ABC):
     @abstractmethod
-    def perform_asr(self, video_path):
-        """对视频执行ASR处理，返回识别结果列表"""
+    def perform_asr(self, video_path, stop_flag=None):
+        """
+        对视频执行ASR处理，返回识别结果列表
+
+        stop_flag(threading.Event) 置位后尽快结束识别并返回None
+        """
         pass
 
+# 子进程内预加载的 Whisper 模型（每个进程一份）
+_worker_model = None
+
+def _init_whisper_worker(model_name):
+    """ASR子进程初始化：每个进程加载一次模型，并限制进程内线程数避免过度订阅"""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    _worker_model = whisper.load_model(model_name)
+
+def _whisper_ready(delay):
+    """进程池预热任务：确保每个子进程都已启动并完成模型加载"""
+    time.sleep(delay)
+    return os.getpid()
+
+def _create_whisper_pool(model_name, workers):
+    """创建预加载模型的ASR进程池，并启动全部子进程"""
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_whisper_worker,
+                                   initargs=(model_name,))
+    list(executor.map(_whisper_ready, [0.5] * workers))
+    return executor
+
+def _transcribe_chunk(audio, offset):
+    """
+    在子进程中识别一段音频，返回时间已换算为整段音频绝对时间的片段列表
+    """
+    result = _worker_model.transcribe(audio, fp16=False, verbose=None)
+    segments = result.get("segments", [])
+    for segment in segments:
+        segment["start"] = round(segment["start"] + offset, 3)
+        segment["end"] = round(segment["end"] + offset, 3)
+        for word in segment.get("words") or []:
+            word["start"] = round(word["start"] + offset, 3)
+            word["end"] = round(word["end"] + offset, 3)
+    return segments
+
 class WhisperASREngine(ASREngine):
-    def __init__(self, model_name="base"):
+    def __init__(self, model_name="base", workers=None, chunk_seconds=None):
+        """
+        参数:
+            model_name: Whisper 模型名称
+            workers: ASR进程数，大于1时按静音切分音频并在预加载模型的进程池中并行识别，为None时使用配置 ASR_WORKERS
+            chunk_seconds: 并行识别时每块音频的目标时长（秒），为None时使用配置 ASR_CHUNK_SECONDS
+        """
+        self.model_name = model_name
+        self.workers = workers if workers is not None else current_app.config.get('ASR_WORKERS', 1)
+        self.chunk_seconds = chunk_seconds if chunk_seconds is not None else current_app.config.get('ASR_CHUNK_SECONDS', 120)
+        self.model_entry = None
         if whisper is None:
             current_app.logger.error("Whisper库未安装，无法进行ASR处理")
-            self.model = None
-        else:
+            return
+        if self.workers > 1:
+            return
+
+        def load():
             try:
-                self.model = whisper.load_model(model_name)
+                return whisper.load_model(model_name)
             except Exception as e:
                 current_app.logger.error(f"加载Whisper模型失败: {e}")
-                self.model = None
+                return None
 
-    def perform_asr(self, video_path):
-        if not self.model:
+        # 模型在进程内只加载一次，由注册表在各处理线程间共享
+        self.model_entry = model_registry.get(f"whisper:{model_name}", load)
+
+    @property
+    def model(self):
+        return self.model_entry.model if self.model_entry else None
+
+    def perform_asr(self, video_path, stop_flag=None):
+        if whisper is None or (self.workers <= 1 and not self.model):
             return None
-        audio_path = video_path.replace('.mp4', '.wav')
+        # 直接解码为 16 kHz 单声道 float32 数组交给 Whisper，不再写临时 WAV 文件
         try:
-            cmd = f"ffmpeg -i \"{video_path}\" -ab 160k -ac 2 -ar 44100 -vn \"{audio_path}\""
-            subprocess.call(cmd, shell=True)
-        except Exception as e:
+            audio = load_audio(video_path)
+        except RuntimeError as e:
             current_app.logger.error(f"提取音频失败: {e}")
             return None
+        if self.workers > 1:
+            return self._perform_asr_parallel(audio, stop_flag)
+        if stop_flag is not None and stop_flag.is_set():
+            return None
+
+        # 单进程识别是一次无法中途停止的阻塞调用，放在守护线程中执行：收到停止请求时不再等待，
+        # 识别在后台执行完后结果被丢弃（期间仍持有模型锁），服务关闭时也不会被它阻塞
+        outcome = {}
+
+        def transcribe():
+            try:
+                with self.model_entry.lock:
+                    outcome["result"] = self.model.transcribe(audio, fp16=False, verbose=True)
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=transcribe, name="whisper-transcribe", daemon=True)
+        thread.start()
+        while thread.is_alive():
+            thread.join(timeout=0.5)
+            if stop_flag is not None and stop_flag.is_set():
+                current_app.logger.info("收到停止请求，不再等待语音识别结束")
+                return None
+        if "error" in outcome:
+            current_app.logger.error(f"语音识别出错: {outcome['error']}")
+            return None
+        return outcome["result"].get("segments", [])
+
+    def _perform_asr_parallel(self, audio, stop_flag=None):
+        """
+        在静音处切分音频，并行识别各块后按顺序合并
+
+        块长度取 ASR_CHUNK_SECONDS 与“总时长 / 进程数”中的较小值（不少于30秒），保证各进程都有任务。
+        各块识别结果的 start/end 加上块起始时间，合并后的格式与整段识别一致。
+        识别失败或收到停止请求时返回None，与没有语音（空列表）区分，避免失败结果被当作空字幕缓存和保存。
+        """
+        duration = len(audio) / SAMPLE_RATE
+        target_seconds = max(30.0, min(float(self.chunk_seconds), math.ceil(duration / self.workers)))
+        chunks = split_on_silence(audio, SAMPLE_RATE, target_chunk_seconds=target_seconds)
+        if not chunks:
+            # 音频长度为0，没有可识别的语音
+            return []
+        current_app.logger.info(f"音频按静音切分为 {len(chunks)} 块，使用 {self.workers} 个进程并行识别")
+
+        pool_name = f"whisper-pool:{self.model_name}:{self.workers}"
         try:
-            result = self.model.transcribe(
-                audio_path,
-                fp16=False,
-                verbose=True
+            entry = model_registry.get(pool_name, lambda: _create_whisper_pool(self.model_name, self.workers))
+            chunk_results = map_until_stopped(
+                entry.model,
+                _transcribe_chunk,
+                [audio[start:end] for start, end in chunks],
+                [start / SAMPLE_RATE for start, _ in chunks],
+                stop_flag=stop_flag
             )
-            segments = result.get("segments", [])
+            if chunk_results is None:
+                current_app.logger.info("收到停止请求，语音识别已中断")
+                return None
+            segments = []
+            for chunk_segments in chunk_results:
+                segments.extend(chunk_segments)
+        except BrokenProcessPool as e:
+            current_app.logger.error(f"ASR进程池执行失败: {str(e)}")
+            # 进程池损坏后移除，下次使用时重建
+            model_registry.evict(pool_name)
+            return None
         except Exception as e:
             current_app.logger.error(f"语音识别出错: {e}")
+            return None
+
+        for index, segment in enumerate(segments):
+            segment["id"] = index
+        return segments
+
+class FasterWhisperASREngine(ASREngine):
+    """基于 CTranslate2（faster-whisper）的 int8 量化 CPU 推理引擎"""
+
+    def __init__(self, model_name="base", compute_type=None, cpu_threads=None):
+        """
+        参数:
+            model_name: 模型名称或本地 CTranslate2 模型目录
+            compute_type: 计算精度，为None时使用配置 ASR_COMPUTE_TYPE，默认 int8
+            cpu_threads: 每次推理使用的CPU线程数，为None时使用配置 ASR_CPU_THREADS（0 表示由 CTranslate2 自动选择）
+        """
+        self.model_name = model_name
+        self.compute_type = compute_type or current_app.config.get('ASR_COMPUTE_TYPE', 'int8')
+        self.cpu_threads = cpu_threads if cpu_threads is not None else current_app.config.get('ASR_CPU_THREADS', 0)
+        self.model_entry = None
+        if WhisperModel is None:
+            current_app.logger.error("faster-whisper库未安装，无法进行ASR处理")
+            return
+
+        # 多个处理线程同时调用 transcribe 时，num_workers 个推理实例可真正并行（默认与视频处理线程池线程数一致）
+        num_workers = max(1, current_app.config.get('ASR_NUM_WORKERS', 2))
+
+        def load():
+            try:
+                return WhisperModel(model_name, device="cpu", compute_type=self.compute_type,
+                                    cpu_threads=self.cpu_threads, num_workers=num_workers)
+            except Exception as e:
+                current_app.logger.error(f"加载faster-whisper模型失败: {e}")
+                return None
+
+        self.model_entry = model_registry.get(f"faster-whisper:{model_name}:{self.compute_type}", load)
+
+    @property
+    def model(self):
+        return self.model_entry.model if self.model_entry else None
+
+    def perform_asr(self, video_path, stop_flag=None):
+        if not self.model:
+            return None
+        try:
+            audio = load_audio(video_path)
+        except RuntimeError as e:
+            current_app.logger.error(f"提取音频失败: {e}")
+            return None
+        try:
+            segments_iter, _ = self.model.transcribe(audio, beam_size=5)
+            # segments_iter 是惰性生成器，逐段解码，每段之间检查停止标志
             segments = []
-        finally:
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
+            for index, segment in enumerate(segments_iter):
+                if stop_flag is not None and stop_flag.is_set():
+                    current_app.logger.info("收到停止请求，语音识别已中断")
+                    return None
+                # 转换为与 openai-whisper 一致的片段字典
+                segments.append({
+                    'id': index,
+                    'seek': segment.seek,
+                    'start': segment.start,
+                    'end': segment.end,
+                    'text': segment.text,
+                    'tokens': list(segment.tokens),
+                    'temperature': segment.temperature,
+                    'avg_logprob': segment.avg_logprob,
+                    'compression_ratio': segment.compression_ratio,
+                    'no_speech_prob': segment.no_speech_prob
+                })
+        except Exception as e:
+            current_app.logger.error(f"语音识别出错: {e}")
+            return None
         return segments
 
 class JsonASREngine(ASREngine):
-    def perform_asr(self, video_path):
+    def perform_asr(self, video_path, stop_flag=None):
         """从视频同名JSON文件读取字幕信息"""
-        json_path = video_path.replace('.mp4', '.json')
+        json_path = os.path.splitext(video_path)[0] + '.json'
         
         if not os.path.exists(json_path):
             current_app.logger.error(f"JSON文件不存在: {json_path}")
@@ -83,3 +282,24 @@ class JsonASREngine(ASREngine):
             current_app.logger.error(f"读取JSON文件失败: {e}")
             return None
 
+# 引擎名称到实现类的映射（JsonASREngine 由字幕文件自动选择，不在此列）
+ASR_ENGINES = {
+    'whisper': WhisperASREngine,
+    'faster-whisper': FasterWhisperASREngine
+}
+
+def get_asr_engine(engine_name=None):
+    """
+    获取ASR引擎实例
+
+    参数:
+        engine_name: 引擎名称，为None时使用配置 ASR_ENGINE，默认 whisper
+
+    返回:
+        ASREngine 实例
+    """
+    engine_name = (engine_name or current_app.config.get('ASR_ENGINE', 'whisper')).lower()
+    engine_class = ASR_ENGINES.get(engine_name)
+    if engine_class is None:
+        raise ValueError(f"未知的ASR引擎: {engine_name}，可选: {list(ASR_ENGINES.keys())}")
+    return engine_class(model_name=current_app.config.get('ASR_MODEL', 'base'))
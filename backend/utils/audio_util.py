@@ -0,0 +1,108 @@
+"""
+音频解码工具
+
+通过 ffmpeg 管道直接将媒体文件的音轨解码为 16 kHz 单声道 float32 数组，
+即 Whisper 模型的输入格式，不再生成中间 WAV 文件，也避免二次重采样。
+"""
+
+import subprocess
+import numpy as np
+
+# Whisper 模型要求的采样率
+SAMPLE_RATE = 16000
+
+
+def load_audio(file_path, sample_rate=SAMPLE_RATE, start_time=None, duration=None):
+    """
+    解码媒体文件的音轨为单声道 float32 数组，取值范围 [-1, 1]
+
+    参数:
+        file_path: 音视频文件路径
+        sample_rate: 目标采样率
+        start_time: 起始时间（秒），为None时从头开始
+        duration: 解码时长（秒），为None时解码到文件末尾
+
+    返回:
+        numpy.ndarray: 形状为 (N,) 的 float32 数组
+
+    异常:
+        RuntimeError: ffmpeg 执行失败
+    """
+    cmd = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-threads', '0']
+    if start_time:
+        cmd += ['-ss', f"{start_time:.3f}"]
+    if duration is not None:
+        cmd += ['-t', f"{duration:.3f}"]
+    cmd += [
+        '-i', file_path,
+        '-vn', '-sn', '-dn',
+        '-f', 's16le',
+        '-ac', '1',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate),
+        'pipe:1'
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg 解码音频失败: {e.stderr.decode('utf-8', errors='ignore').strip()}")
+    except OSError as e:
+        raise RuntimeError(f"无法启动 ffmpeg: {str(e)}")
+
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _frame_energy_db(audio, frame_size):
+    """按帧计算能量（dB）"""
+    frame_count = len(audio) // frame_size
+    if frame_count == 0:
+        return np.empty(0, dtype=np.float64)
+    frames = audio[:frame_count * frame_size].reshape(frame_count, frame_size).astype(np.float64)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20.0 * np.log10(rms + 1e-10)
+
+
+def split_on_silence(audio, sample_rate=SAMPLE_RATE, target_chunk_seconds=120, max_chunk_seconds=None,
+                     frame_ms=30, smooth_ms=300):
+    """
+    基于能量的语音活动检测（VAD），在静音处将音频切分为若干块
+
+    每块长度达到 target_chunk_seconds 后，在 [target, max] 范围内寻找平滑能量最低的位置切分，
+    平滑窗口使较长的停顿优先于单词间的短暂间隙；该范围内没有明显静音时也在能量最低处切分。
+
+    参数:
+        audio: float32 音频数组
+        sample_rate: 采样率
+        target_chunk_seconds: 目标块长度（秒）
+        max_chunk_seconds: 最大块长度（秒），默认为目标长度的1.5倍
+        frame_ms: 能量计算的帧长（毫秒）
+        smooth_ms: 能量平滑窗口（毫秒）
+
+    返回:
+        [(start_sample, end_sample), ...]，按时间顺序覆盖整段音频
+    """
+    total = len(audio)
+    if max_chunk_seconds is None:
+        max_chunk_seconds = target_chunk_seconds * 1.5
+    if total <= int(max_chunk_seconds * sample_rate):
+        return [(0, total)] if total > 0 else []
+
+    frame_size = max(1, int(sample_rate * frame_ms / 1000))
+    energy = _frame_energy_db(audio, frame_size)
+    smooth_frames = max(1, int(smooth_ms / frame_ms))
+    if smooth_frames > 1 and len(energy) >= smooth_frames:
+        energy = np.convolve(energy, np.ones(smooth_frames) / smooth_frames, mode='same')
+
+    target_frames = max(1, int(target_chunk_seconds * 1000 / frame_ms))
+    max_frames = max(target_frames, int(max_chunk_seconds * 1000 / frame_ms))
+
+    chunks = []
+    start_frame = 0
+    while (len(energy) - start_frame) > max_frames:
+        window_start = start_frame + target_frames
+        window_end = min(start_frame + max_frames, len(energy))
+        cut_frame = window_start + int(np.argmin(energy[window_start:window_end]))
+        chunks.append((start_frame * frame_size, cut_frame * frame_size))
+        start_frame = cut_frame
+    chunks.append((start_frame * frame_size, total))
+    return chunks
@@ -0,0 +1,428 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# 任务状态
+STATUS_PENDING = 'pending'
+STATUS_LEASED = 'leased'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+# 优先级类别，数值越大越先执行；同一优先级内按公平分组（如教师）轮流执行
+PRIORITY_EXPRESS = 20
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+PRIORITY_CLASSES = {
+    'express': PRIORITY_EXPRESS,
+    'high': PRIORITY_HIGH,
+    'normal': PRIORITY_NORMAL,
+    'low': PRIORITY_LOW
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    task_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT,
+    lease_expires REAL,
+    leased_at REAL,
+    fair_key TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_ready ON jobs (queue, status, priority DESC, id);
+CREATE INDEX IF NOT EXISTS ix_jobs_lease ON jobs (status, lease_expires);
+"""
+
+# 旧版本创建的队列文件缺少的列
+ADDED_COLUMNS = {
+    'leased_at': 'REAL',
+    'fair_key': 'TEXT'
+}
+
+# 依赖新增列的索引，在补齐列之后创建
+ADDED_INDEXES = """
+CREATE INDEX IF NOT EXISTS ix_jobs_fair ON jobs (queue, fair_key, leased_at);
+CREATE INDEX IF NOT EXISTS ix_jobs_fair_status ON jobs (queue, status, fair_key);
+"""
+
+# 公平轮转只看这段时间（秒）内的租用记录，超过该时间未被执行的分组与从未执行过的分组同等优先，
+# 使排序子查询只扫描近期的任务记录，而不是整个历史
+FAIRNESS_WINDOW = 24 * 3600
+
+# 租用顺序：先取最高优先级，再在该优先级的各公平分组中选择执行中任务最少、最久未被执行的分组，
+# 分组内按入队顺序
+LEASE_CANDIDATE_SQL = """
+SELECT heads.id FROM (
+    SELECT fair_key, MIN(id) AS id FROM jobs
+    WHERE queue = :queue AND status = :pending AND priority = (
+        SELECT MAX(priority) FROM jobs WHERE queue = :queue AND status = :pending AND (:min_priority IS NULL OR priority >= :min_priority)
+    )
+    GROUP BY fair_key
+) AS heads
+ORDER BY
+    (SELECT COUNT(*) FROM jobs AS running
+     WHERE running.queue = :queue AND running.status = :leased AND running.fair_key IS heads.fair_key),
+    COALESCE((SELECT MAX(served.leased_at) FROM jobs AS served
+              WHERE served.queue = :queue AND served.fair_key IS heads.fair_key AND served.leased_at >= :since), 0),
+    heads.id
+LIMIT 1
+"""
+
+
+class Job:
+    """从队列中租用的任务"""
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.queue = row['queue']
+        self.task_id = row['task_id']
+        self.payload = json.loads(row['payload'])
+        self.priority = row['priority']
+        self.attempts = row['attempts']
+        self.lease_owner = row['lease_owner']
+        self.lease_expires = row['lease_expires']
+        self.leased_at = row['leased_at']
+        self.fair_key = row['fair_key']
+        self.created_at = row['created_at']
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'queue': self.queue,
+            'task_id': self.task_id,
+            'payload': self.payload,
+            'priority': self.priority,
+            'fair_key': self.fair_key,
+            'attempts': self.attempts,
+            'lease_owner': self.lease_owner,
+            'leased_at': datetime.fromtimestamp(self.leased_at).isoformat() if self.leased_at else None,
+            'created_at': datetime.fromtimestamp(self.created_at).isoformat()
+        }
+
+
+# 基于SQLite的持久化任务队列，服务重启后未完成的任务不会丢失
+class DurableQueue:
+    def __init__(self, path, visibility_timeout=300, max_attempts=3):
+        """
+        初始化持久化队列
+
+        Args:
+            path: SQLite数据库文件路径
+            visibility_timeout: 租约有效期（秒），超过该时间没有心跳的任务视为执行者已退出，会被重新放回队列
+            max_attempts: 任务最多被租用的次数，租约过期次数达到上限后标记为失败
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        # 同一进程内入队时唤醒等待中的消费者，跨进程时依靠轮询
+        self._condition = threading.Condition()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        columns = {row['name'] for row in connection.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in columns:
+                connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        connection.executescript(ADDED_INDEXES)
+
+    def _connection(self):
+        """每个线程使用独立的连接，以自动提交模式运行，显式事务使用 BEGIN IMMEDIATE"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=30000")
+            self._local.connection = connection
+        return connection
+
+    def put(self, queue, task_id, payload, priority=PRIORITY_NORMAL, fair_key=None):
+        """
+        添加任务
+
+        Args:
+            queue: 队列名称
+            task_id: 任务ID（唯一）
+            payload: 可JSON序列化的任务参数
+            priority: 优先级，数值越大越先执行
+            fair_key: 公平分组（如 teacher:<教师ID>），同一优先级内各分组轮流执行
+
+        Returns:
+            int: 任务在队列表中的ID
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO jobs (queue, task_id, payload, priority, fair_key, max_attempts, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (queue, task_id, json.dumps(payload, ensure_ascii=False), priority, fair_key, self.max_attempts, now, now)
+        )
+        with self._condition:
+            self._condition.notify()
+        return cursor.lastrowid
+
+    def lease(self, queue, owner, timeout=0, min_priority=None):
+        """
+        租用一个待执行的任务
+
+        查找与租用在同一条 UPDATE ... RETURNING 语句中完成，多个线程或进程同时租用时不会拿到同一个任务。
+        租用顺序见 LEASE_CANDIDATE_SQL：优先级 → 公平分组轮转 → 入队顺序。
+
+        Args:
+            queue: 队列名称
+            owner: 租用者标识（如 进程ID-线程ID）
+            timeout: 队列为空时最多等待的秒数
+            min_priority: 只租用不低于该优先级的任务（如快速通道只处理 PRIORITY_EXPRESS 任务）
+
+        Returns:
+            Job: 租用到的任务，超时仍没有任务时返回None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.time()
+            row = self._connection().execute(
+                "UPDATE jobs SET status = :leased, lease_owner = :owner, lease_expires = :expires, leased_at = :now, "
+                f"attempts = attempts + 1, updated_at = :now WHERE id = ({LEASE_CANDIDATE_SQL}) RETURNING *",
+                {
+                    'leased': STATUS_LEASED,
+                    'pending': STATUS_PENDING,
+                    'owner': owner,
+                    'expires': now + self.visibility_timeout,
+                    'now': now,
+                    'queue': queue,
+                    'min_priority': min_priority,
+                    'since': now - FAIRNESS_WINDOW
+                }
+            ).fetchone()
+            if row is not None:
+                return Job(row)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            with self._condition:
+                self._condition.wait(min(remaining, 1.0))
+
+    def heartbeat(self, job_id, owner):
+        """
+        续租
+
+        Returns:
+            bool: 是否续租成功，租约已被回收或任务已被取消时返回False
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+            (now + self.visibility_timeout, now, job_id, owner, STATUS_LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def _finish(self, job_id, owner, status, error=None):
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = ?",
+            (status, error, time.time(), job_id, owner, STATUS_LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, owner):
+        """标记任务完成"""
+        return self._finish(job_id, owner, STATUS_DONE)
+
+    def fail(self, job_id, owner, error=None):
+        """标记任务失败"""
+        return self._finish(job_id, owner, STATUS_FAILED, error)
+
+    def cancel(self, task_id):
+        """
+        取消任务
+
+        Returns:
+            str: 取消前的任务状态，任务不存在时返回None
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT status FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+            if row is not None and row['status'] in (STATUS_PENDING, STATUS_LEASED):
+                connection.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE task_id = ?",
+                    (STATUS_CANCELLED, time.time(), task_id)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return row['status'] if row is not None else None
+
+    def release(self, job_id, owner):
+        """归还租约，任务重新放回队列（不计入租用次数），用于服务关闭时中断的任务"""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, lease_expires = NULL, "
+            "updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+            (STATUS_PENDING, time.time(), job_id, owner, STATUS_LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def get_job(self, task_id):
+        """按任务ID查询任务，不存在时返回None"""
+        row = self._connection().execute("SELECT * FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+        return Job(row) if row is not None else None
+
+    def get_status(self, task_id):
+        """返回任务状态，任务不存在时返回None"""
+        row = self._connection().execute("SELECT status FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+        return row['status'] if row is not None else None
+
+    def requeue_expired(self, queue=None):
+        """
+        回收租约已过期的任务：未达到最大租用次数的重新放回队列，否则标记为失败
+
+        Args:
+            queue: 队列名称，为None时处理所有队列
+
+        Returns:
+            (requeued, failed): 重新入队与标记失败的任务ID列表
+        """
+        now = time.time()
+        queue_filter = " AND queue = ?" if queue else ""
+        params = (queue,) if queue else ()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            failed = [row['task_id'] for row in connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                f"WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts{queue_filter} RETURNING task_id",
+                (STATUS_FAILED, "租约多次过期，任务执行者可能已退出", now, STATUS_LEASED, now) + params
+            ).fetchall()]
+            requeued = [row['task_id'] for row in connection.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                f"WHERE status = ? AND lease_expires < ?{queue_filter} RETURNING task_id",
+                (STATUS_PENDING, now, STATUS_LEASED, now) + params
+            ).fetchall()]
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        if requeued:
+            with self._condition:
+                self._condition.notify_all()
+        return requeued, failed
+
+    def count(self, queue, status=STATUS_PENDING):
+        """统计指定状态的任务数量"""
+        row = self._connection().execute(
+            "SELECT COUNT(*) AS total FROM jobs WHERE queue = ? AND status = ?", (queue, status)
+        ).fetchone()
+        return row['total']
+
+    def list_jobs(self, queue, status=STATUS_PENDING, limit=100):
+        """按执行顺序列出指定状态的任务"""
+        rows = self._connection().execute(
+            "SELECT * FROM jobs WHERE queue = ? AND status = ? ORDER BY priority DESC, id LIMIT ?",
+            (queue, status, limit)
+        ).fetchall()
+        return [Job(row) for row in rows]
+
+    def ordered_pending(self, queue, limit=None):
+        """
+        按预计的执行顺序列出待执行任务
+
+        在内存中重放 LEASE_CANDIDATE_SQL 的选择规则，假设排在前面的任务依次被租用且尚未完成；
+        期间新入队或执行完成的任务会改变实际顺序，结果只用于展示排队位置。
+        """
+        connection = self._connection()
+        jobs = [Job(row) for row in connection.execute(
+            "SELECT * FROM jobs WHERE queue = ? AND status = ? ORDER BY priority DESC, id", (queue, STATUS_PENDING)
+        ).fetchall()]
+        running = {row['fair_key']: row['total'] for row in connection.execute(
+            "SELECT fair_key, COUNT(*) AS total FROM jobs WHERE queue = ? AND status = ? GROUP BY fair_key",
+            (queue, STATUS_LEASED)
+        ).fetchall()}
+        served = {row['fair_key']: row['last_leased'] for row in connection.execute(
+            "SELECT fair_key, MAX(leased_at) AS last_leased FROM jobs WHERE queue = ? AND leased_at >= ? GROUP BY fair_key",
+            (queue, time.time() - FAIRNESS_WINDOW)
+        ).fetchall()}
+
+        # 按优先级分层，每层内按公平分组排成先进先出的队列
+        levels = {}
+        for job in jobs:
+            levels.setdefault(job.priority, {}).setdefault(job.fair_key, deque()).append(job)
+
+        ordered = []
+        clock = time.time()
+        for priority in sorted(levels, reverse=True):
+            groups = levels[priority]
+            while groups and (limit is None or len(ordered) < limit):
+                fair_key = min(groups, key=lambda key: (running.get(key, 0), served.get(key, 0), groups[key][0].id))
+                ordered.append(groups[fair_key].popleft())
+                running[fair_key] = running.get(fair_key, 0) + 1
+                clock += 1e-3
+                served[fair_key] = clock
+                if not groups[fair_key]:
+                    del groups[fair_key]
+        return ordered
+
+    def average_durations(self, queue, limit=50):
+        """
+        最近完成的任务的平均执行时长（秒）
+
+        Returns:
+            (overall, by_priority): 全部任务的平均时长（没有记录时为None）与各优先级的平均时长
+        """
+        rows = self._connection().execute(
+            "SELECT priority, updated_at - leased_at AS duration FROM jobs "
+            "WHERE queue = ? AND status = ? AND leased_at IS NOT NULL ORDER BY updated_at DESC LIMIT ?",
+            (queue, STATUS_DONE, limit)
+        ).fetchall()
+        if not rows:
+            return None, {}
+        by_priority = {}
+        for row in rows:
+            by_priority.setdefault(row['priority'], []).append(row['duration'])
+        overall = sum(row['duration'] for row in rows) / len(rows)
+        return overall, {priority: sum(values) / len(values) for priority, values in by_priority.items()}
+
+    def active_task_ids(self, queue):
+        """返回待执行与执行中的任务ID"""
+        rows = self._connection().execute(
+            "SELECT task_id FROM jobs WHERE queue = ? AND status IN (?, ?)", (queue, STATUS_PENDING, STATUS_LEASED)
+        ).fetchall()
+        return {row['task_id'] for row in rows}
+
+    def purge(self, older_than_seconds=7 * 24 * 3600, queue=None):
+        """
+        删除已结束且超过保留期的任务记录
+
+        Args:
+            older_than_seconds: 保留期（秒）
+            queue: 队列名称，为None时处理所有队列
+
+        Returns:
+            int: 删除的记录数
+        """
+        queue_filter = " AND queue = ?" if queue else ""
+        params = (queue,) if queue else ()
+        cursor = self._connection().execute(
+            f"DELETE FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?{queue_filter}",
+            (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED, time.time() - older_than_seconds) + params
+        )
+        return cursor.rowcount
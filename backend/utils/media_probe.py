@@ -0,0 +1,221 @@
+"""
+媒体探测工具
+
+每个视频文件只运行一次 ffprobe，将帧率、时长、帧数、编码、分辨率和音频流信息
+缓存到 media_probes 表，以视频ID + 文件大小/修改时间判断缓存是否有效，
+上传接口与各处理步骤都从这里读取，不再各自打开 cv2.VideoCapture 或调用 ffprobe。
+"""
+
+import os
+import json
+import hashlib
+import subprocess
+from flask import current_app
+
+from models.models import db, MediaProbe
+
+
+def _parse_rate(rate):
+    """解析 ffprobe 的分数形式帧率，如 "30000/1001" """
+    if not rate:
+        return 0.0
+    try:
+        if '/' in rate:
+            numerator, denominator = rate.split('/', 1)
+            denominator = float(denominator)
+            return float(numerator) / denominator if denominator else 0.0
+        return float(rate)
+    except ValueError:
+        return 0.0
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_rotation(stream):
+    """读取视频流的旋转角度（新版 ffprobe 在 side_data_list 中，旧版在 tags.rotate 中）"""
+    for side_data in stream.get('side_data_list', []):
+        if 'rotation' in side_data:
+            return _parse_int(side_data['rotation']) or 0
+    return _parse_int(stream.get('tags', {}).get('rotate')) or 0
+
+
+def probe_media_file(file_path):
+    """
+    使用 ffprobe 探测媒体文件
+
+    参数:
+        file_path: 媒体文件路径
+
+    返回:
+        dict: 包含 format_name、duration、bit_rate、fps、frame_count、video_codec、width、height、
+              has_audio、audio_codec、audio_sample_rate、audio_channels
+
+    异常:
+        RuntimeError: ffprobe 执行失败或输出无法解析
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_format',
+        '-show_streams',
+        '-of', 'json',
+        file_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        data = json.loads(result.stdout)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffprobe 执行失败: {e.stderr.strip()}")
+    except (OSError, json.JSONDecodeError) as e:
+        raise RuntimeError(f"ffprobe 执行失败: {str(e)}")
+
+    format_info = data.get('format', {})
+    streams = data.get('streams', [])
+    video_stream = next((s for s in streams if s.get('codec_type') == 'video'
+                         and not s.get('disposition', {}).get('attached_pic')), None)
+    audio_stream = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+
+    duration = _parse_float(format_info.get('duration'))
+    info = {
+        'format_name': format_info.get('format_name'),
+        'duration': duration or 0.0,
+        'bit_rate': _parse_int(format_info.get('bit_rate')),
+        'fps': 0.0,
+        'frame_count': 0,
+        'video_codec': None,
+        'width': 0,
+        'height': 0,
+        'has_audio': audio_stream is not None,
+        'audio_codec': None,
+        'audio_sample_rate': None,
+        'audio_channels': None
+    }
+
+    if video_stream:
+        fps = _parse_rate(video_stream.get('avg_frame_rate')) or _parse_rate(video_stream.get('r_frame_rate'))
+        width = _parse_int(video_stream.get('width')) or 0
+        height = _parse_int(video_stream.get('height')) or 0
+        # ffmpeg 解码时默认自动旋转，输出帧的宽高以旋转后为准
+        if abs(_get_rotation(video_stream)) % 180 == 90:
+            width, height = height, width
+        if not info['duration']:
+            info['duration'] = _parse_float(video_stream.get('duration')) or 0.0
+        # 部分容器不记录 nb_frames，此时按时长与帧率估算
+        frame_count = _parse_int(video_stream.get('nb_frames'))
+        if not frame_count:
+            frame_count = int(round(info['duration'] * fps)) if fps > 0 else 0
+
+        info.update({
+            'fps': fps,
+            'frame_count': frame_count,
+            'video_codec': video_stream.get('codec_name'),
+            'width': width,
+            'height': height
+        })
+
+    if audio_stream:
+        info.update({
+            'audio_codec': audio_stream.get('codec_name'),
+            'audio_sample_rate': _parse_int(audio_stream.get('sample_rate')),
+            'audio_channels': _parse_int(audio_stream.get('channels'))
+        })
+
+    return info
+
+
+def save_media_probe(video_id, file_path, info=None):
+    """
+    保存（或更新）视频的媒体探测信息
+
+    参数:
+        video_id: 视频ID
+        file_path: 视频文件路径
+        info: 已有的探测结果，为None时重新探测
+
+    返回:
+        dict: 探测结果
+    """
+    stat = os.stat(file_path)
+    if info is None:
+        info = probe_media_file(file_path)
+
+    probe = MediaProbe.query.filter_by(video_id=video_id).first()
+    if probe is None:
+        probe = MediaProbe(video_id=video_id)
+        db.session.add(probe)
+
+    probe.file_size = stat.st_size
+    probe.file_mtime_ns = stat.st_mtime_ns
+    # 文件已变化，内容哈希需要重新计算
+    probe.content_hash = None
+    for key, value in info.items():
+        setattr(probe, key, value)
+    db.session.commit()
+
+    return info
+
+
+def get_media_info(video_id, file_path):
+    """
+    获取视频的媒体信息，文件大小与修改时间未变化时直接读取缓存
+
+    参数:
+        video_id: 视频ID
+        file_path: 视频文件路径
+
+    返回:
+        dict: 与 probe_media_file 格式一致
+    """
+    stat = os.stat(file_path)
+    probe = MediaProbe.query.filter_by(video_id=video_id).first()
+    if probe and probe.file_size == stat.st_size and probe.file_mtime_ns == stat.st_mtime_ns:
+        return probe.to_dict()
+
+    current_app.logger.info(f"媒体信息缓存未命中，重新探测: {file_path}")
+    return save_media_probe(video_id, file_path)
+
+
+def compute_file_hash(file_path, chunk_size=4 * 1024 * 1024):
+    """流式计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_content_hash(video_id, file_path):
+    """
+    获取视频文件的内容哈希，文件大小与修改时间未变化时直接读取缓存
+
+    内容哈希用于处理步骤产物缓存的键，同一视频重新处理时无需再次读取整个文件。
+
+    参数:
+        video_id: 视频ID
+        file_path: 视频文件路径
+
+    返回:
+        str: 十六进制 SHA-256
+    """
+    stat = os.stat(file_path)
+    probe = MediaProbe.query.filter_by(video_id=video_id).first()
+    if probe is None or probe.file_size != stat.st_size or probe.file_mtime_ns != stat.st_mtime_ns:
+        save_media_probe(video_id, file_path)
+        probe = MediaProbe.query.filter_by(video_id=video_id).first()
+
+    if not probe.content_hash:
+        probe.content_hash = compute_file_hash(file_path)
+        db.session.commit()
+    return probe.content_hash
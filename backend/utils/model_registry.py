@@ -0,0 +1,148 @@
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class ModelEntry:
+    """已加载模型的登记项"""
+
+    def __init__(self, name, model, load_seconds, memory_bytes):
+        self.name = name
+        self.model = model
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self.loaded_at = datetime.now()
+        self.use_count = 0
+        # 推理锁：同一模型实例在多个处理线程间共享，推理时串行使用
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'load_seconds': round(self.load_seconds, 3),
+            'memory_mb': round(self.memory_bytes / (1024 * 1024), 1) if self.memory_bytes is not None else None,
+            'loaded_at': self.loaded_at.isoformat(),
+            'use_count': self.use_count
+        }
+
+
+# 进程级模型注册表：每个模型只加载一次，供所有视频处理线程共享
+class ModelRegistry:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._loading_locks = {}
+
+    @staticmethod
+    def _rss():
+        """当前进程及其子进程（如预加载模型的OCR进程池）的常驻内存"""
+        if psutil is None:
+            return None
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def get(self, name, loader):
+        """
+        获取已加载的模型，首次调用时加载
+
+        Args:
+            name: 模型名称，如 "cnocr:ch_PP-OCRv4_server"
+            loader: 无参加载函数，返回模型实例；返回None表示加载失败，不会被缓存
+
+        Returns:
+            ModelEntry 或 None（加载失败时）
+        """
+        entry = self._entries.get(name)
+        if entry is not None:
+            entry.use_count += 1
+            return entry
+
+        with self._lock:
+            loading_lock = self._loading_locks.setdefault(name, threading.Lock())
+
+        # 每个模型单独加锁，不同模型可以同时加载
+        with loading_lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                rss_before = self._rss()
+                start = time.perf_counter()
+                model = loader()
+                if model is None:
+                    return None
+                load_seconds = time.perf_counter() - start
+                rss_after = self._rss()
+                memory_bytes = max(0, rss_after - rss_before) if rss_before is not None else None
+
+                entry = ModelEntry(name, model, load_seconds, memory_bytes)
+                self._entries[name] = entry
+            entry.use_count += 1
+            return entry
+
+    def evict(self, name):
+        """移除模型（如进程池损坏后需要重建），下次获取时重新加载"""
+        with self._lock:
+            entry = self._entries.pop(name, None)
+        if entry is not None and hasattr(entry.model, 'shutdown'):
+            entry.model.shutdown(wait=False)
+
+    def status(self):
+        """获取已加载模型的加载耗时与内存占用"""
+        return [entry.to_dict() for entry in list(self._entries.values())]
+
+    def shutdown(self):
+        """关闭持有子进程的模型（如OCR进程池）"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            if hasattr(entry.model, 'shutdown'):
+                entry.model.shutdown(wait=True)
+
+
+def map_until_stopped(executor, fn, *iterables, stop_flag=None, poll_interval=0.5):
+    """
+    与 executor.map 相同，按输入顺序返回结果列表，等待期间检查停止标志
+
+    Args:
+        executor: 进程池或线程池（如注册表中常驻的模型进程池）
+        fn: 任务函数
+        iterables: 任务参数，与 executor.map 相同
+        stop_flag: 停止标志(threading.Event)，置位后取消尚未开始的任务
+        poll_interval: 检查停止标志的间隔（秒）
+
+    Returns:
+        结果列表；收到停止请求时返回None（已开始的任务在子进程中执行完，结果被丢弃）
+    """
+    futures = [executor.submit(fn, *args) for args in zip(*iterables)]
+    results = []
+    try:
+        for future in futures:
+            while True:
+                if stop_flag is not None and stop_flag.is_set():
+                    return None
+                try:
+                    results.append(future.result(timeout=poll_interval))
+                    break
+                except FutureTimeoutError:
+                    continue
+        return results
+    finally:
+        # 停止或出错时取消尚未开始的任务，避免继续占用共享的进程池
+        for future in futures:
+            future.cancel()
+
+
+# 创建全局模型注册表实例
+model_registry = ModelRegistry()
@@ -2,7 +2,14 @@ from abc import ABC, abstractmethod
 import os
 import json
 import base64
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from flask import current_app
+from utils.model_registry import model_registry, map_until_stopped
+from utils.ocr_incremental import incremental_ocr
+from utils.rate_limiter import get_shared_bucket
 try:
     from cnocr import CnOcr
 except ImportError:
@@ -20,49 +27,201 @@ except ImportError:
 
 class OCREngine(ABC):
     @abstractmethod
-    def perform_ocr(self, keyframes_data, output_folder):
-        """对关键帧列表执行OCR处理，返回更新后的关键帧数据"""
+    def perform_ocr(self, keyframes_data, output_folder, stop_flag=None):
+        """
+        对关键帧列表执行OCR处理，返回更新后的关键帧数据
+
+        stop_flag(threading.Event) 置位后跳过剩余的关键帧，返回的结果不完整，调用方应丢弃
+        """
+        pass
+
+CNOCR_REC_MODEL = "ch_PP-OCRv4_server"
+
+# 子进程内预加载的 CnOcr 模型（每个进程一份）
+_worker_ocr = None
+
+def _serialize_cnocr_result(result):
+    """将 CnOcr 的识别结果转换为 (文本列表, 可JSON序列化的原始结果)"""
+    texts = []
+    serializable_result = []
+    for item in result:
+        if isinstance(item, dict) and 'position' in item and 'text' in item:
+            position_list = item['position'].tolist() if hasattr(item['position'], 'tolist') else item['position']
+            serializable_item = {
+                'position': position_list,
+                'score': float(item.get('score', 0.0)),
+                'text': item['text']
+            }
+            serializable_result.append(serializable_item)
+            texts.append(item['text'])
+    return texts, serializable_result
+
+def _init_cnocr_worker(rec_model_name):
+    """OCR子进程初始化：每个进程加载一次模型，并限制进程内线程数避免过度订阅"""
+    global _worker_ocr
+    try:
+        import cv2
+        cv2.setNumThreads(1)
+    except ImportError:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
         pass
+    _worker_ocr = CnOcr(rec_model_name=rec_model_name)
+
+def _cnocr_ready(delay):
+    """进程池预热任务：确保每个子进程都已启动并完成模型加载"""
+    time.sleep(delay)
+    return os.getpid()
+
+def _load_cnocr():
+    return CnOcr(rec_model_name=CNOCR_REC_MODEL)
+
+def _create_cnocr_pool(workers):
+    """创建预加载模型的OCR进程池，并启动全部子进程"""
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_cnocr_worker,
+                                   initargs=(CNOCR_REC_MODEL,))
+    list(executor.map(_cnocr_ready, [0.5] * workers))
+    return executor
+
+def _cnocr_worker(image_path, rec_batch_size):
+    """在子进程中识别单张图片，返回 (文本列表, 原始结果, 错误信息)"""
+    try:
+        result = _worker_ocr.ocr(image_path, rec_batch_size=rec_batch_size)
+        texts, serializable_result = _serialize_cnocr_result(result)
+        return texts, serializable_result, None
+    except Exception as e:
+        return [], [], str(e)
+
+def _cnocr_incremental_worker(image_paths, rec_batch_size):
+    """在子进程中对一段连续关键帧做增量OCR"""
+    return incremental_ocr(_worker_ocr, image_paths, _serialize_cnocr_result, rec_batch_size=rec_batch_size)
 
 class CnOcrEngine(OCREngine):
-    def __init__(self):
+    def __init__(self, workers=None, rec_batch_size=None, incremental=None):
+        """
+        参数:
+            workers: OCR进程数，大于1时使用预加载模型的进程池并行识别，为None时使用配置 OCR_WORKERS
+            rec_batch_size: 单张图片内文本行识别的批大小，为None时使用配置 OCR_REC_BATCH_SIZE
+            incremental: 是否启用区域差分增量OCR（见 utils.ocr_incremental），为None时使用配置 OCR_INCREMENTAL
+        """
+        self.incremental = incremental if incremental is not None else current_app.config.get('OCR_INCREMENTAL', False)
+        self.workers = workers if workers is not None else current_app.config.get('OCR_WORKERS', 1)
+        self.rec_batch_size = rec_batch_size if rec_batch_size is not None else current_app.config.get('OCR_REC_BATCH_SIZE', 16)
         if CnOcr is None:
             current_app.logger.error("cnocr库未安装，无法进行OCR处理")
-            self.ocr = None
-        else:
-            self.ocr = CnOcr(rec_model_name="ch_PP-OCRv4_server")
 
-    def perform_ocr(self, keyframes_data, output_folder):
-        if not self.ocr:
+    @property
+    def _model_entry(self):
+        """进程内共享的 CnOcr 模型，首次使用时加载"""
+        return model_registry.get(f"cnocr:{CNOCR_REC_MODEL}", _load_cnocr)
+
+    @property
+    def _pool_name(self):
+        return f"cnocr-pool:{CNOCR_REC_MODEL}:{self.workers}"
+
+    def perform_ocr(self, keyframes_data, output_folder, stop_flag=None):
+        if CnOcr is None:
             return keyframes_data
-        for frame_info in keyframes_data:
-            image_path = os.path.join(output_folder, frame_info["file_name"])
-            try:
-                result = self.ocr.ocr(image_path)
-                texts = []
-                serializable_result = []
-                for item in result:
-                    if isinstance(item, dict) and 'position' in item and 'text' in item:
-                        position_list = item['position'].tolist() if hasattr(item['position'], 'tolist') else item['position']
-                        serializable_item = {
-                            'position': position_list,
-                            'score': float(item.get('score', 0.0)),
-                            'text': item['text']
-                        }
-                        serializable_result.append(serializable_item)
-                        texts.append(item['text'])
-                frame_info["ocr_result"] = texts
-                frame_info["ocr_result_raw"] = serializable_result
-            except Exception as e:
-                current_app.logger.error(f"OCR处理图片出错: {str(e)}")
+        image_paths = [os.path.join(output_folder, frame_info["file_name"]) for frame_info in keyframes_data]
+        if self.workers > 1 and len(keyframes_data) > 1:
+            results = self._run_parallel(image_paths, stop_flag)
+            if results is None:
+                current_app.logger.info("收到停止请求，OCR已中断")
+                return keyframes_data
+        elif self.incremental:
+            entry = self._model_entry
+            results = incremental_ocr(entry.model, image_paths, _serialize_cnocr_result,
+                                      rec_batch_size=self.rec_batch_size, lock=entry.lock, stop_flag=stop_flag)
+        else:
+            entry = self._model_entry
+            results = []
+            for image_path in image_paths:
+                if stop_flag is not None and stop_flag.is_set():
+                    break
+                try:
+                    with entry.lock:
+                        result = entry.model.ocr(image_path, rec_batch_size=self.rec_batch_size)
+                    texts, serializable_result = _serialize_cnocr_result(result)
+                    results.append((texts, serializable_result, None))
+                except Exception as e:
+                    results.append(([], [], str(e)))
+
+        for frame_info, result in zip(keyframes_data, results):
+            texts, serializable_result, error = result[:3]
+            if error:
+                current_app.logger.error(f"OCR处理图片出错: {error}")
                 frame_info["ocr_result"] = []
+                continue
+            frame_info["ocr_result"] = texts
+            frame_info["ocr_result_raw"] = serializable_result
+
+        if self.incremental and results:
+            modes = [result[3] for result in results if len(result) > 3]
+            current_app.logger.info(
+                f"增量OCR: 整帧识别 {modes.count('full')} 帧, 区域识别 {modes.count('incremental')} 帧, "
+                f"沿用上一帧 {modes.count('carried')} 帧"
+            )
         return keyframes_data
 
+    def _run_parallel(self, image_paths, stop_flag=None):
+        """
+        使用进程池并行识别关键帧
+
+        进程池登记在模型注册表中，在多个视频任务间常驻共享，每个子进程只加载一次模型；
+        图片按关键帧顺序分发，结果按原顺序返回。增量模式下按连续区间分块，每块在一个子进程内顺序做区域差分。
+        收到停止请求时取消尚未开始的任务并返回None。
+        """
+        workers = self.workers
+        try:
+            entry = model_registry.get(self._pool_name, lambda: _create_cnocr_pool(workers))
+            if not self.incremental:
+                return map_until_stopped(entry.model, _cnocr_worker, image_paths,
+                                         [self.rec_batch_size] * len(image_paths), stop_flag=stop_flag)
+
+            chunk_size = -(-len(image_paths) // workers)
+            chunks = [image_paths[i:i + chunk_size] for i in range(0, len(image_paths), chunk_size)]
+            chunk_results = map_until_stopped(entry.model, _cnocr_incremental_worker, chunks,
+                                              [self.rec_batch_size] * len(chunks), stop_flag=stop_flag)
+            if chunk_results is None:
+                return None
+            results = []
+            for chunk in chunk_results:
+                results.extend(chunk)
+            return results
+        except (OSError, BrokenProcessPool) as e:
+            current_app.logger.error(f"OCR进程池执行失败: {str(e)}")
+            # 进程池损坏后移除，下次使用时重建
+            model_registry.evict(self._pool_name)
+            return [([], [], str(e))] * len(image_paths)
+
+# 腾讯云限流及临时性错误的错误码前缀，遇到时退避重试
+TENCENT_THROTTLE_CODES = (
+    "RequestLimitExceeded", "LimitExceeded", "ClientNetworkError", "ServerNetworkError", "InternalError"
+)
+
 class TencentOCR(OCREngine):
-    def __init__(self):
+    def __init__(self, concurrency=None, qps=None, max_retries=None):
+        """
+        参数:
+            concurrency: 并发请求数，为None时使用配置 TENCENT_OCR_CONCURRENCY
+            qps: 每秒请求数上限（进程内所有实例共享的令牌桶限流），为None时使用配置 TENCENT_OCR_QPS
+            max_retries: 限流或网络错误时的最大重试次数，为None时使用配置 TENCENT_OCR_MAX_RETRIES
+        """
         self.secret_id = current_app.config.get("TENCENT_OCR_SECRET_ID")
         self.secret_key = current_app.config.get("TENCENT_OCR_SECRET_KEY")
         self.region = current_app.config.get("TENCENT_OCR_REGION", "")
+        # 可指向本地模拟服务（如 127.0.0.1:8765 + http）进行离线压测
+        self.endpoint = current_app.config.get("TENCENT_OCR_ENDPOINT", "ocr.tencentcloudapi.com")
+        self.scheme = current_app.config.get("TENCENT_OCR_SCHEME", "https")
+        self.concurrency = concurrency if concurrency is not None else current_app.config.get("TENCENT_OCR_CONCURRENCY", 4)
+        self.max_retries = max_retries if max_retries is not None else current_app.config.get("TENCENT_OCR_MAX_RETRIES", 3)
+        # 每个处理任务都会创建引擎实例，令牌桶在进程内共享，保证所有任务合计不超过QPS上限
+        self.rate_limiter = get_shared_bucket(
+            "tencent-ocr", qps if qps is not None else current_app.config.get("TENCENT_OCR_QPS", 10)
+        )
         self.client = None
         
         if not TENCENT_AVAILABLE:
@@ -77,9 +236,11 @@ class TencentOCR(OCREngine):
             # 实例化认证对象
             cred = credential.Credential(self.secret_id, self.secret_key)
             
-            # 实例化http选项
+            # 实例化http选项，保持长连接，所有请求复用同一客户端的连接池
             httpProfile = HttpProfile()
-            httpProfile.endpoint = "ocr.tencentcloudapi.com"
+            httpProfile.endpoint = self.endpoint
+            httpProfile.scheme = self.scheme
+            httpProfile.keepAlive = True
             
             # 实例化client选项
             clientProfile = ClientProfile()
@@ -92,71 +253,87 @@ class TencentOCR(OCREngine):
             current_app.logger.error(f"腾讯OCR客户端初始化失败: {str(e)}")
             self.client = None
 
-    def _image_to_base64(self, image_path):
+    @staticmethod
+    def _image_to_base64(image_path):
         """将图片转换为base64编码"""
-        try:
-            with open(image_path, 'rb') as f:
-                image_data = f.read()
-                return base64.b64encode(image_data).decode('utf-8')
-        except Exception as e:
-            current_app.logger.error(f"图片转换base64失败: {str(e)}")
-            return None
+        with open(image_path, 'rb') as f:
+            return base64.b64encode(f.read()).decode('utf-8')
 
-    def perform_ocr(self, keyframes_data, output_folder):
-        if not self.client:
-            return keyframes_data
-            
-        for frame_info in keyframes_data:
-            image_path = os.path.join(output_folder, frame_info["file_name"])
-            try:
-                # 转换图片为base64
-                image_base64 = self._image_to_base64(image_path)
-                if not image_base64:
-                    frame_info["ocr_result"] = []
-                    frame_info["ocr_result_raw"] = []
-                    continue
+    @staticmethod
+    def _parse_response(response_data):
+        """将 GeneralFastOCR 响应转换为 (文本列表, 与CnOCR兼容的原始结果)"""
+        texts = []
+        serializable_result = []
+        
+        if "Response" in response_data and "TextDetections" in response_data["Response"]:
+            for detection in response_data["Response"]["TextDetections"]:
+                text = detection.get("DetectedText", "")
+                texts.append(text)
                 
-                # 实例化请求对象
-                req = models.GeneralFastOCRRequest()
-                params = {
-                    "ImageBase64": image_base64
-                }
-                req.from_json_string(json.dumps(params))
+                # 构建与CnOCR兼容的格式
+                polygon = detection.get("Polygon", [])
+                position = [[point["X"], point["Y"]] for point in polygon] if polygon else []
                 
-                # 调用OCR接口
+                serializable_item = {
+                    'position': position,
+                    'score': detection.get("Confidence", 0) / 100.0,  # 转换为0-1范围
+                    'text': text
+                }
+                serializable_result.append(serializable_item)
+        return texts, serializable_result
+
+    def _recognize(self, image_path):
+        """
+        识别单张图片（在线程池中执行，不访问应用上下文）
+
+        返回:
+            (texts, serializable_result, error)
+        """
+        try:
+            image_base64 = self._image_to_base64(image_path)
+        except OSError as e:
+            return [], [], f"图片转换base64失败: {str(e)}"
+        
+        req = models.GeneralFastOCRRequest()
+        req.from_json_string(json.dumps({"ImageBase64": image_base64}))
+        
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
                 resp = self.client.GeneralFastOCR(req)
-                response_data = json.loads(resp.to_json_string())
-                
-                # 处理响应结果
-                texts = []
-                serializable_result = []
-                
-                if "Response" in response_data and "TextDetections" in response_data["Response"]:
-                    for detection in response_data["Response"]["TextDetections"]:
-                        text = detection.get("DetectedText", "")
-                        texts.append(text)
-                        
-                        # 构建与CnOCR兼容的格式
-                        polygon = detection.get("Polygon", [])
-                        position = [[point["X"], point["Y"]] for point in polygon] if polygon else []
-                        
-                        serializable_item = {
-                            'position': position,
-                            'score': detection.get("Confidence", 0) / 100.0,  # 转换为0-1范围
-                            'text': text
-                        }
-                        serializable_result.append(serializable_item)
-                
-                frame_info["ocr_result"] = texts
-                frame_info["ocr_result_raw"] = serializable_result
-                
+                texts, serializable_result = self._parse_response(json.loads(resp.to_json_string()))
+                return texts, serializable_result, None
             except TencentCloudSDKException as e:
-                current_app.logger.error(f"腾讯OCR API调用失败: {str(e)}")
-                frame_info["ocr_result"] = []
-                frame_info["ocr_result_raw"] = []
+                code = e.get_code() or ""
+                if not code.startswith(TENCENT_THROTTLE_CODES) or attempt >= self.max_retries:
+                    return [], [], f"腾讯OCR API调用失败: {str(e)}"
+                # 指数退避并加入随机抖动，避免并发请求同时重试
+                time.sleep(min(8.0, 0.5 * (2 ** attempt)) * (0.5 + random.random()))
             except Exception as e:
-                current_app.logger.error(f"OCR处理图片出错: {str(e)}")
-                frame_info["ocr_result"] = []
-                frame_info["ocr_result_raw"] = []
+                return [], [], f"OCR处理图片出错: {str(e)}"
+
+    def perform_ocr(self, keyframes_data, output_folder, stop_flag=None):
+        if not self.client:
+            return keyframes_data
+        
+        def recognize(image_path):
+            # 收到停止请求后不再发送剩余的请求
+            if stop_flag is not None and stop_flag.is_set():
+                return [], [], None
+            return self._recognize(image_path)
+        
+        image_paths = [os.path.join(output_folder, frame_info["file_name"]) for frame_info in keyframes_data]
+        # 线程池并发发送请求，executor.map 保证结果与关键帧顺序一致
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as executor:
+            results = list(executor.map(recognize, image_paths))
+        if stop_flag is not None and stop_flag.is_set():
+            current_app.logger.info("收到停止请求，OCR已中断")
+            return keyframes_data
+        
+        for frame_info, (texts, serializable_result, error) in zip(keyframes_data, results):
+            if error:
+                current_app.logger.error(error)
+            frame_info["ocr_result"] = texts
+            frame_info["ocr_result_raw"] = serializable_result
                 
-        return keyframes_data
\ No newline at end of file
+        return keyframes_data
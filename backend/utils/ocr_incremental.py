@@ -0,0 +1,215 @@
+"""
+区域差分增量OCR
+
+讲课视频中相邻关键帧往往只有局部变化（新增一条要点、动画的一步）。
+增量模式下将当前关键帧与上一关键帧做像素差分，只对变化区域裁剪后做检测与识别，
+未变化区域的文本框直接沿用上一关键帧的 ocr_result_raw，最后按阅读顺序合并。
+"""
+
+from contextlib import nullcontext
+
+import cv2
+import numpy as np
+
+# 灰度差分阈值，低于该值的像素变化视为压缩噪声
+DIFF_THRESHOLD = 30
+# 变化区域的最小面积（像素），过滤零散噪点
+MIN_REGION_AREA = 64
+# 变化区域向外扩展的像素数，保证裁剪后的文字完整
+REGION_PADDING = 12
+# 变化区域面积占比超过该值时直接整帧识别
+MAX_CHANGE_RATIO = 0.5
+# 裁剪区域的最小边长，过小的图片检测模型无法处理
+MIN_CROP_SIZE = 32
+
+
+def item_bbox(item):
+    """返回OCR结果项文本框的外接矩形 (x0, y0, x1, y1)"""
+    points = np.asarray(item['position'], dtype=np.float64).reshape(-1, 2)
+    x0, y0 = points.min(axis=0)
+    x1, y1 = points.max(axis=0)
+    return int(np.floor(x0)), int(np.floor(y0)), int(np.ceil(x1)), int(np.ceil(y1))
+
+
+def _intersects(box1, box2):
+    return box1[0] < box2[2] and box2[0] < box1[2] and box1[1] < box2[3] and box2[1] < box1[3]
+
+
+def _union(box1, box2):
+    return min(box1[0], box2[0]), min(box1[1], box2[1]), max(box1[2], box2[2]), max(box1[3], box2[3])
+
+
+def merge_boxes(boxes):
+    """反复合并相交的矩形，直到两两不相交"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for box in boxes:
+            for i, other in enumerate(result):
+                if _intersects(box, other):
+                    result[i] = _union(box, other)
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+    return boxes
+
+
+def find_changed_regions(prev_gray, cur_gray):
+    """
+    计算两帧灰度图的变化区域
+
+    返回:
+        (regions, change_ratio)，regions 为 [(x0, y0, x1, y1), ...]，change_ratio 为变化区域面积占比
+    """
+    height, width = cur_gray.shape
+    diff = cv2.absdiff(cv2.GaussianBlur(prev_gray, (5, 5), 0), cv2.GaussianBlur(cur_gray, (5, 5), 0))
+    _, mask = cv2.threshold(diff, DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)
+    # 膨胀使同一行文字的笔画连成一片
+    mask = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 7)))
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    regions = []
+    for label in range(1, count):
+        x, y, w, h, area = stats[label]
+        if area < MIN_REGION_AREA:
+            continue
+        regions.append((
+            max(0, x - REGION_PADDING),
+            max(0, y - REGION_PADDING),
+            min(width, x + w + REGION_PADDING),
+            min(height, y + h + REGION_PADDING)
+        ))
+    regions = merge_boxes(regions)
+
+    changed_area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+    return regions, changed_area / float(width * height)
+
+
+def expand_regions(regions, items, width, height):
+    """
+    将变化区域扩展到覆盖与之相交的旧文本框，避免一行文字被裁成两半
+
+    返回:
+        (regions, carried_items)，carried_items 为不受变化影响、可直接沿用的旧文本框
+    """
+    item_boxes = [item_bbox(item) for item in items]
+    changed = True
+    while changed:
+        changed = False
+        for box in item_boxes:
+            for i, region in enumerate(regions):
+                if _intersects(box, region):
+                    union = _union(box, region)
+                    if union != region:
+                        regions[i] = union
+                        changed = True
+        if changed:
+            regions = merge_boxes(regions)
+
+    regions = [(max(0, x0), max(0, y0), min(width, x1), min(height, y1)) for x0, y0, x1, y1 in regions]
+    carried_items = [
+        item for item, box in zip(items, item_boxes)
+        if not any(_intersects(box, region) for region in regions)
+    ]
+    return regions, carried_items
+
+
+def _pad_crop(x0, y0, x1, y1, width, height):
+    """保证裁剪区域不小于 MIN_CROP_SIZE"""
+    if x1 - x0 < MIN_CROP_SIZE:
+        center = (x0 + x1) // 2
+        x0 = max(0, center - MIN_CROP_SIZE // 2)
+        x1 = min(width, x0 + MIN_CROP_SIZE)
+    if y1 - y0 < MIN_CROP_SIZE:
+        center = (y0 + y1) // 2
+        y0 = max(0, center - MIN_CROP_SIZE // 2)
+        y1 = min(height, y0 + MIN_CROP_SIZE)
+    return x0, y0, x1, y1
+
+
+def _offset_items(items, dx, dy):
+    """将裁剪区域内的识别结果坐标换算回整帧坐标"""
+    for item in items:
+        item['position'] = [[point[0] + dx, point[1] + dy] for point in item['position']]
+    return items
+
+
+def _reading_order(item):
+    x0, y0, _, _ = item_bbox(item)
+    return y0, x0
+
+
+def incremental_ocr(ocr, image_paths, serialize, rec_batch_size=1, lock=None, max_change_ratio=MAX_CHANGE_RATIO,
+                    stop_flag=None):
+    """
+    按顺序对一组关键帧做增量OCR
+
+    参数:
+        ocr: CnOcr 实例
+        image_paths: 按时间顺序排列的关键帧图片路径
+        serialize: 将 CnOcr 结果转换为 (文本列表, 原始结果) 的函数
+        rec_batch_size: 文本行识别批大小
+        lock: 推理锁，多个线程共享模型实例时使用
+        max_change_ratio: 变化区域面积占比超过该值时整帧识别
+        stop_flag: 停止标志(threading.Event)，置位后不再识别剩余的关键帧
+
+    返回:
+        [(texts, raw_result, error, mode), ...]，与 image_paths 一一对应（中途停止时只包含已识别的关键帧），
+        mode 为 "full"（整帧识别）、"incremental"（只识别变化区域）或 "carried"（无变化，沿用上一帧）
+    """
+    lock = lock or nullcontext()
+    results = []
+    prev_gray = None
+    prev_raw = None
+
+    def run_ocr(image):
+        with lock:
+            return serialize(ocr.ocr(image, rec_batch_size=rec_batch_size))
+
+    for image_path in image_paths:
+        if stop_flag is not None and stop_flag.is_set():
+            break
+        image = cv2.imread(image_path)
+        if image is None:
+            results.append(([], [], f"无法读取图片: {image_path}", "full"))
+            prev_gray, prev_raw = None, None
+            continue
+
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape
+
+        try:
+            if prev_gray is None or prev_raw is None or prev_gray.shape != gray.shape:
+                _, raw = run_ocr(rgb)
+                mode = "full"
+            else:
+                regions, change_ratio = find_changed_regions(prev_gray, gray)
+                if not regions:
+                    raw = [dict(item) for item in prev_raw]
+                    mode = "carried"
+                elif change_ratio > max_change_ratio:
+                    _, raw = run_ocr(rgb)
+                    mode = "full"
+                else:
+                    regions, raw = expand_regions(regions, prev_raw, width, height)
+                    raw = [dict(item) for item in raw]
+                    for region in regions:
+                        x0, y0, x1, y1 = _pad_crop(*region, width, height)
+                        _, region_raw = run_ocr(np.ascontiguousarray(rgb[y0:y1, x0:x1]))
+                        raw.extend(_offset_items(region_raw, x0, y0))
+                    raw.sort(key=_reading_order)
+                    mode = "incremental"
+        except Exception as e:
+            results.append(([], [], str(e), "full"))
+            prev_gray, prev_raw = None, None
+            continue
+
+        results.append(([item['text'] for item in raw], raw, None, mode))
+        prev_gray, prev_raw = gray, raw
+
+    return results
@@ -0,0 +1,152 @@
+"""
+批量感知哈希工具
+
+对一组缩小后的灰度帧一次性计算 DCT 感知哈希（pHash），哈希以 uint64 打包，
+汉明距离通过按位异或后的 popcount 计算，避免逐帧调用 imagehash。
+算法与 imagehash.phash 一致：32x32 灰度图 -> 二维 DCT -> 取左上 8x8 低频系数 -> 与中位数比较。
+"""
+
+import numpy as np
+import cv2
+
+HASH_SIZE = 8
+HIGHFREQ_FACTOR = 4
+IMAGE_SIZE = HASH_SIZE * HIGHFREQ_FACTOR
+# 去重时每次向量化比较的初始窗口大小
+DEDUP_WINDOW = 64
+
+
+def _dct_matrix(n=IMAGE_SIZE, k=HASH_SIZE):
+    """DCT-II 变换矩阵的前 k 行（只需要低频系数）"""
+    rows = np.arange(k).reshape(-1, 1)
+    cols = np.arange(n).reshape(1, -1)
+    return np.cos(np.pi * rows * (2 * cols + 1) / (2 * n))
+
+
+_DCT_LOW = _dct_matrix()
+
+
+def downscale_frame(frame):
+    """
+    将单帧转换为 pHash 所需的 32x32 灰度图
+
+    参数:
+        frame: BGR 彩色帧或灰度帧（numpy.ndarray）
+    """
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if frame.shape != (IMAGE_SIZE, IMAGE_SIZE):
+        frame = cv2.resize(frame, (IMAGE_SIZE, IMAGE_SIZE), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def batch_phash(small_frames):
+    """
+    批量计算感知哈希
+
+    参数:
+        small_frames: 形状为 (N, 32, 32) 的灰度帧数组，或由 32x32 灰度帧组成的列表
+
+    返回:
+        numpy.ndarray: 形状为 (N,) 的 uint64 哈希数组
+    """
+    stack = np.asarray(small_frames, dtype=np.float64)
+    if stack.ndim == 2:
+        stack = stack[np.newaxis]
+    if stack.shape[0] == 0:
+        return np.empty(0, dtype=np.uint64)
+
+    # 低频 DCT 系数: D @ X @ D^T，结果形状 (N, 8, 8)
+    low = np.matmul(np.matmul(_DCT_LOW, stack), _DCT_LOW.T)
+    flat = low.reshape(low.shape[0], -1)
+    median = np.median(flat, axis=1, keepdims=True)
+    bits = flat > median
+
+    # 按行优先顺序打包为大端 uint64，与 imagehash 的十六进制表示一致
+    packed = np.packbits(bits, axis=1)
+    return packed.view('>u8').reshape(-1).astype(np.uint64)
+
+
+def popcount(values):
+    """uint64 数组的逐元素 popcount"""
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+
+    # SWAR popcount（兼容 numpy<2）
+    x = values - ((values >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    with np.errstate(over='ignore'):
+        x = x * np.uint64(0x0101010101010101)
+    return (x >> np.uint64(56)).astype(np.int64)
+
+
+def hamming_distance(hashes, reference):
+    """
+    计算一组哈希与参考哈希之间的汉明距离
+
+    参数:
+        hashes: uint64 哈希数组
+        reference: 单个 uint64 哈希或与 hashes 形状相同的数组
+
+    返回:
+        numpy.ndarray: int64 距离数组
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    reference = np.asarray(reference, dtype=np.uint64)
+    return popcount(np.bitwise_xor(hashes, reference))
+
+
+def dedup_hashes(hashes, threshold, previous_hash=None):
+    """
+    批量去重：与上一个保留帧的哈希差异大于阈值的帧才保留
+
+    与逐帧比较的结果完全一致。每个保留帧之后按窗口向量化比较，窗口从 DEDUP_WINDOW 开始、
+    没有找到变化时加倍，因此总比较次数约为 2 * N + 保留帧数 * DEDUP_WINDOW，
+    而不是每保留一帧都重新比较剩余的整段哈希。
+
+    参数:
+        hashes: 本批次的 uint64 哈希数组（按时间顺序）
+        threshold: 汉明距离阈值
+        previous_hash: 上一批次最后保留的哈希，None 表示没有
+
+    返回:
+        (kept_indices, last_kept_hash)
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    kept_indices = []
+    reference = previous_hash
+    start = 0
+
+    if reference is None and len(hashes) > 0:
+        kept_indices.append(0)
+        reference = hashes[0]
+        start = 1
+
+    window = DEDUP_WINDOW
+    while start < len(hashes):
+        distances = hamming_distance(hashes[start:start + window], reference)
+        changed = np.flatnonzero(distances > threshold)
+        if changed.size == 0:
+            # 窗口内没有变化，继续向后比较更大的窗口
+            start += window
+            window *= 2
+            continue
+        index = start + int(changed[0])
+        kept_indices.append(index)
+        reference = hashes[index]
+        start = index + 1
+        window = DEDUP_WINDOW
+
+    return kept_indices, reference
+
+
+def hash_to_hex(value):
+    """将 uint64 哈希转换为16位十六进制字符串"""
+    return f"{int(value):016x}"
+
+
+def hex_to_hash(text):
+    """将16位十六进制字符串转换为整数哈希"""
+    return int(text, 16)
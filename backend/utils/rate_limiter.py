@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+# 令牌桶限流器，用于控制对外部API的请求速率
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒生成的令牌数（即QPS上限），小于等于0表示不限流
+            capacity: 桶容量（允许的突发请求数），默认等于 rate
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self, tokens=1):
+        """
+        获取令牌，令牌不足时阻塞等待
+
+        Args:
+            tokens: 需要的令牌数
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+# 进程内共享的令牌桶，同一外部API的所有调用方共用一个QPS配额
+_shared_buckets = {}
+_shared_buckets_lock = threading.Lock()
+
+
+def get_shared_bucket(name, rate, capacity=None):
+    """
+    获取进程内共享的令牌桶，首次调用时创建
+
+    各处理任务分别创建API客户端时应使用共享的令牌桶，否则并发任务数越多，实际QPS越高。
+
+    Args:
+        name: 限流对象名称，如 "tencent-ocr"
+        rate: 每秒生成的令牌数，与名称一起作为键，配置不同的QPS各自独立限流
+        capacity: 桶容量，默认等于 rate
+
+    Returns:
+        TokenBucket 实例
+    """
+    key = (name, float(rate), capacity)
+    with _shared_buckets_lock:
+        bucket = _shared_buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, capacity)
+            _shared_buckets[key] = bucket
+        return bucket
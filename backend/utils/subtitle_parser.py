@@ -0,0 +1,181 @@
+"""
+字幕解析工具
+
+逐行流式解析 SRT、WebVTT、ASS/SSA 字幕，生成与 ASR 结果一致的片段
+{'id', 'start', 'end', 'text'}，并可转换为 JsonASREngine 读取的 JSON 字幕格式
+（body 中每项包含 from、to、sid、content），上传时写入视频同名 .json 文件，
+后续处理直接读取，不再重新解析字幕。
+"""
+
+import io
+import re
+import json
+import codecs
+
+SUBTITLE_FORMATS = {'srt', 'vtt', 'ass', 'ssa', 'json'}
+
+# SRT/VTT 时间轴，如 "00:00:01,000 --> 00:00:04,000" 或 "01:02.500 --> 01:04.000 align:start"
+CUE_TIMING_PATTERN = re.compile(
+    r'^\s*((?:\d+:)?\d{1,2}:\d{2}(?:[,.]\d{1,3})?)\s*-->\s*((?:\d+:)?\d{1,2}:\d{2}(?:[,.]\d{1,3})?)'
+)
+# SRT/VTT 中的 HTML 样式标签与 VTT 的说话人、时间戳标签
+MARKUP_TAG_PATTERN = re.compile(r'<[^>]*>')
+# ASS 的样式覆盖代码，如 {\an8}{\b1}
+ASS_OVERRIDE_PATTERN = re.compile(r'\{[^}]*\}')
+
+
+def parse_timestamp(text):
+    """将 "hh:mm:ss,mmm"、"mm:ss.mmm"、"h:mm:ss.cc" 等格式的时间转换为秒"""
+    text = text.strip().replace(',', '.')
+    seconds = 0.0
+    for part in text.split(':'):
+        seconds = seconds * 60 + float(part)
+    return round(seconds, 3)
+
+
+def _clean_cue_text(lines):
+    text = ' '.join(line.strip() for line in lines if line.strip())
+    return MARKUP_TAG_PATTERN.sub('', text).replace('&nbsp;', ' ').replace('&amp;', '&') \
+        .replace('&lt;', '<').replace('&gt;', '>').strip()
+
+
+def _clean_ass_text(text):
+    text = ASS_OVERRIDE_PATTERN.sub('', text)
+    return text.replace('\\N', ' ').replace('\\n', ' ').replace('\\h', ' ').strip()
+
+
+def iter_cue_segments(lines):
+    """
+    流式解析 SRT / WebVTT 字幕
+
+    两种格式都由空行分隔的字幕块组成，每块包含可选的序号/标识行、时间轴行和若干文本行；
+    WebVTT 的文件头以及 NOTE、STYLE、REGION 块不含时间轴，会被自然跳过。
+    """
+    timing = None
+    text_lines = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            if timing and text_lines:
+                yield timing[0], timing[1], _clean_cue_text(text_lines)
+            timing = None
+            text_lines = []
+            continue
+
+        match = CUE_TIMING_PATTERN.match(line)
+        if match:
+            # 缺少空行分隔时，遇到新的时间轴即结束上一块；紧挨时间轴的纯数字行是新块的 SRT 序号
+            if text_lines and text_lines[-1].strip().isdigit():
+                text_lines.pop()
+            if timing and text_lines:
+                yield timing[0], timing[1], _clean_cue_text(text_lines)
+            timing = (parse_timestamp(match.group(1)), parse_timestamp(match.group(2)))
+            text_lines = []
+        elif timing:
+            text_lines.append(line)
+
+    if timing and text_lines:
+        yield timing[0], timing[1], _clean_cue_text(text_lines)
+
+
+def iter_ass_segments(lines):
+    """流式解析 ASS/SSA 字幕的 [Events] 段"""
+    in_events = False
+    fields = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['):
+            in_events = line.lower() == '[events]'
+            continue
+        if not in_events or ':' not in line:
+            continue
+
+        key, value = line.split(':', 1)
+        key = key.strip().lower()
+        if key == 'format':
+            fields = [field.strip().lower() for field in value.split(',')]
+        elif key == 'dialogue' and fields:
+            # Text 字段可能包含逗号，只按字段数切分
+            values = [v.strip() for v in value.split(',', len(fields) - 1)]
+            if len(values) < len(fields):
+                continue
+            entry = dict(zip(fields, values))
+            text = _clean_ass_text(entry.get('text', ''))
+            if text:
+                yield parse_timestamp(entry['start']), parse_timestamp(entry['end']), text
+
+
+def iter_json_segments(stream):
+    """读取 JSON 字幕（body 中每项包含 from、to、content）"""
+    data = json.load(stream)
+    for item in data.get('body', []):
+        yield item.get('from', 0), item.get('to', 0), item.get('content', '')
+
+
+def open_text_stream(binary_stream, sample_size=4096):
+    """
+    将二进制流包装为文本流
+
+    读取开头一段字节判断编码：能按 UTF-8 解码则使用 UTF-8（去除 BOM），否则按 GB18030 解码，
+    兼容国内常见的 GBK 编码字幕。要求流可以回退（seek）。
+    """
+    sample = binary_stream.read(sample_size)
+    binary_stream.seek(0)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        encoding = 'gb18030'
+    return io.TextIOWrapper(binary_stream, encoding=encoding, errors='replace', newline=None)
+
+
+def iter_subtitle_segments(text_stream, subtitle_format):
+    """
+    按格式逐条解析字幕
+
+    参数:
+        text_stream: 文本流（可迭代的行）
+        subtitle_format: 字幕格式，srt、vtt、ass、ssa 或 json
+
+    返回:
+        生成器，逐条产出 {'id', 'start', 'end', 'text'}，时间单位为秒
+    """
+    subtitle_format = subtitle_format.lower()
+    if subtitle_format in ('srt', 'vtt'):
+        entries = iter_cue_segments(text_stream)
+    elif subtitle_format in ('ass', 'ssa'):
+        entries = iter_ass_segments(text_stream)
+    elif subtitle_format == 'json':
+        entries = iter_json_segments(text_stream)
+    else:
+        raise ValueError(f"不支持的字幕格式: {subtitle_format}")
+
+    for index, (start, end, text) in enumerate(entries):
+        yield {'id': index, 'start': start, 'end': end, 'text': text}
+
+
+def convert_subtitle_to_json(binary_stream, subtitle_format, json_path):
+    """
+    将上传的字幕转换为 JsonASREngine 读取的 JSON 字幕文件
+
+    参数:
+        binary_stream: 字幕文件的二进制流
+        subtitle_format: 字幕格式（文件扩展名）
+        json_path: 输出的 JSON 文件路径
+
+    返回:
+        int: 写入的字幕条数
+    """
+    text_stream = open_text_stream(binary_stream)
+    body = [
+        {'from': segment['start'], 'to': segment['end'], 'content': segment['text']}
+        for segment in iter_subtitle_segments(text_stream, subtitle_format)
+    ]
+    # 字幕时间轴可能乱序（如 ASS 按图层排列），按开始时间排序后再写入
+    body.sort(key=lambda item: (item['from'], item['to']))
+    for index, item in enumerate(body):
+        item['sid'] = index + 1
+
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'body': body}, f, ensure_ascii=False)
+    return len(body)
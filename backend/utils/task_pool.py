@@ -0,0 +1,421 @@
+import importlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from flask import current_app
+
+from utils.durable_queue import (
+    DurableQueue, STATUS_PENDING, STATUS_LEASED, STATUS_CANCELLED, PRIORITY_NORMAL, PRIORITY_EXPRESS, PRIORITY_CLASSES
+)
+
+# 清理已结束任务记录的间隔（秒）
+PURGE_INTERVAL = 3600
+
+
+def callable_path(func):
+    """返回函数的导入路径，如 tasks.video_processor.main_processor:process_video_task"""
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def resolve_callable(path):
+    """按导入路径加载函数"""
+    module_name, _, qualname = path.partition(':')
+    target = importlib.import_module(module_name)
+    for attr in qualname.split('.'):
+        target = getattr(target, attr)
+    return target
+
+
+# 从持久化队列消费任务的线程池基类
+class DurableTaskPool:
+    # 队列名称，不同的线程池共用一个队列数据库文件
+    queue_name = None
+    # 任务ID前缀
+    task_prefix = 'task'
+    # 覆盖工作线程数的配置项名称
+    max_workers_config = None
+    # 快速通道工作线程数的配置项名称，快速通道只执行 PRIORITY_EXPRESS 任务，不会被长任务占满
+    express_workers_config = None
+
+    def __init__(self, max_workers=2):
+        """
+        初始化线程池，工作线程在 init_app 绑定应用和队列后启动
+
+        Args:
+            max_workers: 最大工作线程数，默认为2
+        """
+        self.max_workers = max_workers
+        self.express_workers = 0
+        self.app = None
+        self.queue = None
+        # 是否在本进程中执行任务，为False时只负责入队，由独立的 worker 进程执行
+        self.consuming = False
+        self.current_tasks = {}
+        # 已提交但尚未开始执行的任务的停止标志
+        self.stop_flags = {}
+        self.running = True
+        self.stopped = threading.Event()
+        self.init_lock = threading.Lock()
+        self.owner_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        # 线程池创建（进程启动）的时间，启动时只把此前创建的进行中任务记录视为上次运行遗留
+        self.started_at = datetime.now()
+        self.worker_threads = []
+        self.heartbeat_thread = None
+
+    def init_app(self, app, consume=None, max_workers=None):
+        """
+        绑定应用并打开持久化队列
+
+        启动时回收租约已过期的任务（上次运行中断的任务会重新执行），并修正数据库中停留在进行中的任务记录。
+        队列文件由配置 TASK_QUEUE_PATH 指定（默认 task_queue.db），
+        租约有效期由 TASK_QUEUE_VISIBILITY_TIMEOUT 指定（默认300秒），
+        已结束的任务记录保留 TASK_QUEUE_RETENTION_DAYS 天（默认7天），启动时与之后每小时清理一次。
+
+        Args:
+            app: Flask应用实例
+            consume: 是否启动工作线程执行任务，默认读取配置 TASK_WORKERS_EMBEDDED（默认True）；
+                     设为False时API进程只入队，任务由 python -m tasks.worker 启动的进程执行
+            max_workers: 工作线程数，默认读取 max_workers_config 指定的配置项，未配置时使用构造时的值
+        """
+        with self.init_lock:
+            if self.queue is not None:
+                return
+            self.app = app
+            self.consuming = app.config.get('TASK_WORKERS_EMBEDDED', True) if consume is None else consume
+            if max_workers:
+                self.max_workers = max_workers
+            elif self.max_workers_config:
+                self.max_workers = app.config.get(self.max_workers_config, self.max_workers)
+            if self.express_workers_config:
+                self.express_workers = app.config.get(self.express_workers_config, 1)
+            self.queue = DurableQueue(
+                app.config.get('TASK_QUEUE_PATH', 'task_queue.db'),
+                visibility_timeout=app.config.get('TASK_QUEUE_VISIBILITY_TIMEOUT', 300),
+                max_attempts=app.config.get('TASK_QUEUE_MAX_ATTEMPTS', 3)
+            )
+
+        requeued, failed = self.queue.requeue_expired(self.queue_name)
+        with app.app_context():
+            if requeued:
+                current_app.logger.info(f"[{self.queue_name}] 重新入队 {len(requeued)} 个中断的任务: {requeued}")
+            try:
+                self._on_recovered(requeued, failed, startup=True)
+            except Exception as e:
+                current_app.logger.error(f"[{self.queue_name}] 修正中断任务的状态失败: {str(e)}")
+            self._purge()
+
+        self.heartbeat_thread = threading.Thread(target=self._heartbeat_thread, daemon=True)
+        self.heartbeat_thread.start()
+
+        # 启动工作线程
+        if self.consuming:
+            for i in range(self.max_workers):
+                thread = threading.Thread(target=self._worker_thread, daemon=True)
+                thread.start()
+                self.worker_threads.append(thread)
+            for i in range(self.express_workers):
+                thread = threading.Thread(target=self._worker_thread, args=(PRIORITY_EXPRESS,), daemon=True)
+                thread.start()
+                self.worker_threads.append(thread)
+
+    def _worker_thread(self, min_priority=None):
+        """
+        工作线程函数，不断从队列中租用任务并执行
+
+        Args:
+            min_priority: 只执行不低于该优先级的任务，用于快速通道
+        """
+        owner = f"{self.owner_prefix}-{threading.get_ident()}"
+        while self.running:
+            try:
+                job = self.queue.lease(self.queue_name, owner, timeout=1, min_priority=min_priority)
+            except sqlite3.Error as e:
+                with self.app.app_context():
+                    current_app.logger.error(f"[{self.queue_name}] 租用任务失败: {str(e)}")
+                time.sleep(1)
+                continue
+
+            if job is None:
+                continue
+            if not self.running:
+                self.queue.release(job.id, owner)
+                break
+            self._run_job(job, owner)
+
+    def _run_job(self, job, owner):
+        app = self.app
+        stop_flag = self.stop_flags.pop(job.task_id, None) or threading.Event()
+
+        # 添加到当前任务列表
+        task_info = self._task_info(job)
+        self.current_tasks[job.task_id] = dict(
+            task_info,
+            start_time=datetime.now(),
+            stop_flag=stop_flag,
+            job_id=job.id,
+            owner=owner,
+            priority=job.priority
+        )
+
+        error = None
+        try:
+            with app.app_context():
+                # 在全局字典中添加线程信息
+                if hasattr(app, 'PROCESSING_THREADS'):
+                    app.PROCESSING_THREADS[job.task_id] = dict(
+                        task_info,
+                        thread_id=threading.get_ident(),
+                        stop_flag=stop_flag
+                    )
+                self._execute(app, job, stop_flag)
+        except Exception as e:
+            traceback.print_exc()
+            error = str(e)
+            with app.app_context():
+                current_app.logger.error(f"[{self.queue_name}] 处理任务 {job.task_id} 失败: {error}")
+        finally:
+            # 从当前任务列表移除
+            self.current_tasks.pop(job.task_id, None)
+
+            # 从全局线程列表移除
+            if hasattr(app, 'PROCESSING_THREADS'):
+                app.PROCESSING_THREADS.pop(job.task_id, None)
+
+            try:
+                if not self.running and stop_flag.is_set():
+                    # 服务关闭导致任务中断，放回队列，重启后继续执行
+                    self.queue.release(job.id, owner)
+                    with app.app_context():
+                        self._on_recovered([job.task_id], [])
+                elif error is not None:
+                    self.queue.fail(job.id, owner, error)
+                else:
+                    self.queue.complete(job.id, owner)
+            except Exception as e:
+                with app.app_context():
+                    current_app.logger.error(f"[{self.queue_name}] 更新任务 {job.task_id} 的队列状态失败: {str(e)}")
+
+    def _heartbeat_thread(self):
+        """
+        定期为执行中的任务续租，并回收其他执行者遗留的过期租约
+
+        任务可能在API进程中被取消，每隔 TASK_CANCEL_POLL_INTERVAL 秒（默认2秒）检查一次执行中任务的状态。
+        """
+        interval = max(1.0, self.queue.visibility_timeout / 3)
+        poll_interval = min(interval, self.app.config.get('TASK_CANCEL_POLL_INTERVAL', 2))
+        last_heartbeat = last_purge = time.monotonic()
+        while not self.stopped.wait(poll_interval):
+            if time.monotonic() - last_purge >= PURGE_INTERVAL:
+                last_purge = time.monotonic()
+                with self.app.app_context():
+                    self._purge()
+
+            try:
+                for task_id, task_info in list(self.current_tasks.items()):
+                    if self.queue.get_status(task_id) == STATUS_CANCELLED:
+                        task_info['stop_flag'].set()
+
+                if time.monotonic() - last_heartbeat < interval:
+                    continue
+                last_heartbeat = time.monotonic()
+
+                for task_id, task_info in list(self.current_tasks.items()):
+                    if not self.queue.heartbeat(task_info['job_id'], task_info['owner']):
+                        # 租约已失效：任务已被取消，或因长时间无心跳被回收
+                        task_info['stop_flag'].set()
+
+                requeued, failed = self.queue.requeue_expired(self.queue_name)
+                if requeued or failed:
+                    with self.app.app_context():
+                        current_app.logger.warning(f"[{self.queue_name}] 回收过期租约: 重新入队 {requeued}, 失败 {failed}")
+                        self._on_recovered(requeued, failed)
+            except Exception as e:
+                with self.app.app_context():
+                    current_app.logger.error(f"[{self.queue_name}] 续租失败: {str(e)}")
+
+    def _purge(self):
+        """删除超过保留期的已结束任务记录，在应用上下文中调用"""
+        retention_days = current_app.config.get('TASK_QUEUE_RETENTION_DAYS', 7)
+        try:
+            purged = self.queue.purge(retention_days * 24 * 3600, self.queue_name)
+        except sqlite3.Error as e:
+            current_app.logger.error(f"[{self.queue_name}] 清理已结束的任务记录失败: {str(e)}")
+            return
+        if purged:
+            current_app.logger.info(f"[{self.queue_name}] 清理 {purged} 条已结束的任务记录")
+
+    def new_task_id(self):
+        """生成任务ID，调用方可以先用它创建任务记录，再以同一ID提交任务"""
+        return f"{self.task_prefix}-{uuid.uuid4().hex[:8]}"
+
+    def _submit(self, app, payload, priority=PRIORITY_NORMAL, fair_key=None, task_id=None):
+        """
+        将任务写入持久化队列
+
+        Args:
+            app: Flask应用实例
+            payload: 任务参数
+            priority: 优先级，可以是数值或 PRIORITY_CLASSES 中的类别名称
+            fair_key: 公平分组，同一优先级内各分组轮流执行
+            task_id: 任务ID，为None时生成新的ID
+        """
+        if self.queue is None:
+            self.init_app(app)
+
+        task_id = task_id or self.new_task_id()
+
+        # 创建停止标志，任务在其他进程中执行时通过队列取消
+        stop_flag = threading.Event()
+        if self.consuming:
+            self.stop_flags[task_id] = stop_flag
+
+        priority = PRIORITY_CLASSES.get(priority, PRIORITY_NORMAL) if isinstance(priority, str) else priority
+        self.queue.put(self.queue_name, task_id, payload, priority, fair_key)
+        return task_id, stop_flag
+
+    def _task_info(self, job):
+        """返回记录在 current_tasks 中的任务信息"""
+        return {}
+
+    def _execute(self, app, job, stop_flag):
+        """执行任务，在应用上下文中调用"""
+        raise NotImplementedError
+
+    def _on_recovered(self, requeued, failed, startup=False):
+        """
+        任务被重新入队或因租约多次过期而失败后，同步数据库中的任务记录，在应用上下文中调用
+
+        Args:
+            requeued: 重新入队的任务ID列表
+            failed: 标记为失败的任务ID列表
+            startup: 是否为服务启动时的回收；此时还应把 started_at 之前创建、但不在队列中的进行中记录标记为失败，
+                     之后创建的记录可能正在提交（已写入数据库、尚未入队），不能处理
+        """
+        pass
+
+    def get_pending_tasks_count(self):
+        """获取等待中的任务数量"""
+        return self.queue.count(self.queue_name, STATUS_PENDING) if self.queue else 0
+
+    def get_active_tasks_count(self):
+        """获取正在执行的任务数量，只入队的进程统计所有 worker 进程中执行的任务"""
+        if self.consuming or self.queue is None:
+            return len(self.current_tasks)
+        return self.queue.count(self.queue_name, STATUS_LEASED)
+
+    def get_active_tasks(self):
+        """
+        获取正在执行的任务信息
+
+        Returns:
+            dict: 任务ID -> 任务信息（包含 start_time、priority 与 _task_info 返回的字段）
+        """
+        if self.consuming or self.queue is None:
+            return dict(self.current_tasks)
+        active_tasks = {}
+        for job in self.queue.list_jobs(self.queue_name, STATUS_LEASED, limit=self.max_workers * 100):
+            active_tasks[job.task_id] = dict(
+                self._task_info(job),
+                start_time=datetime.fromtimestamp(job.leased_at or job.created_at),
+                owner=job.lease_owner,
+                priority=job.priority
+            )
+        return active_tasks
+
+    def get_queue_positions(self, limit=50):
+        """
+        获取等待中任务的排队位置与预计开始时间
+
+        按执行顺序模拟各工作线程的空闲时间：普通工作线程按顺序执行所有任务，快速通道工作线程只执行
+        PRIORITY_EXPRESS 任务，每个任务分配给它可用的线程中最早空闲的一个。
+        执行中的快速通道任务优先计入快速通道线程，时长按最近完成任务的平均时长（按优先级区分）估算，
+        没有历史记录时 eta_seconds 为None。
+
+        Returns:
+            list: 按预计执行顺序排列的任务信息，position 为整体排队位置，class_position 为同一优先级内的位置，均从1开始
+        """
+        if self.queue is None:
+            return []
+        jobs = self.queue.ordered_pending(self.queue_name, limit)
+        average, by_priority = self.queue.average_durations(self.queue_name)
+
+        # 各线程预计空闲的时间（距现在的秒数），执行中的任务按剩余时长占用线程
+        normal_slots = [0.0] * max(self.max_workers, 1)
+        express_slots = [0.0] * self.express_workers
+        if average is not None:
+            now = datetime.now()
+            active = sorted(self.get_active_tasks().values(),
+                            key=lambda task_info: task_info.get('priority', PRIORITY_NORMAL) < PRIORITY_EXPRESS)
+            express_used = normal_used = 0
+            for task_info in active:
+                priority = task_info.get('priority', PRIORITY_NORMAL)
+                remaining = max(by_priority.get(priority, average) - (now - task_info['start_time']).total_seconds(), 0)
+                if priority >= PRIORITY_EXPRESS and express_used < len(express_slots):
+                    express_slots[express_used] = remaining
+                    express_used += 1
+                elif normal_used < len(normal_slots):
+                    normal_slots[normal_used] = remaining
+                    normal_used += 1
+
+        positions = []
+        class_positions = {}
+        for position, job in enumerate(jobs, start=1):
+            priority_class = next((name for name, value in PRIORITY_CLASSES.items() if value == job.priority), None)
+            class_positions[job.priority] = class_positions.get(job.priority, 0) + 1
+
+            eta = None
+            if average is not None:
+                slots = normal_slots + express_slots if job.priority >= PRIORITY_EXPRESS else normal_slots
+                index = min(range(len(slots)), key=slots.__getitem__)
+                eta = slots[index]
+                finish = eta + by_priority.get(job.priority, average)
+                if index < len(normal_slots):
+                    normal_slots[index] = finish
+                else:
+                    express_slots[index - len(normal_slots)] = finish
+
+            positions.append(dict(
+                self._task_info(job),
+                task_id=job.task_id,
+                position=position,
+                class_position=class_positions[job.priority],
+                priority=job.priority,
+                priority_class=priority_class,
+                fair_key=job.fair_key,
+                enqueue_time=datetime.fromtimestamp(job.created_at).isoformat(),
+                eta_seconds=round(eta, 1) if eta is not None else None
+            ))
+        return positions
+
+    def stop_task(self, task_id):
+        """停止指定任务，等待中的任务直接从队列中取消"""
+        if task_id in self.current_tasks:
+            self.current_tasks[task_id]['stop_flag'].set()
+            return True
+        if self.queue is None:
+            return False
+
+        status = self.queue.cancel(task_id)
+        if status == STATUS_PENDING:
+            self.stop_flags.pop(task_id, None)
+        # 在其他进程中执行的任务，由该进程检查任务状态时发现已取消并设置停止标志
+        return status in (STATUS_PENDING, STATUS_LEASED)
+
+    def shutdown(self, wait=True):
+        """关闭线程池，未执行的任务保留在队列中，执行中的任务被中断后放回队列"""
+        self.running = False
+        self.stopped.set()
+
+        # 停止所有当前任务
+        for task_info in list(self.current_tasks.values()):
+            task_info['stop_flag'].set()
+
+        # 等待所有线程结束
+        if wait:
+            for thread in self.worker_threads:
+                thread.join()
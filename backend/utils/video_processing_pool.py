@@ -1,197 +1,134 @@
 import threading
-import queue
-from flask import current_app
-from datetime import datetime
 import uuid
+from datetime import datetime
+from flask import current_app
 
-# 创建一个线程池来管理视频处理任务
-class VideoProcessingPool:
-    def __init__(self, max_workers=2):
-        """
-        初始化视频处理线程池
-        
-        Args:
-            max_workers: 最大工作线程数，默认为2
-        """
-        self.max_workers = max_workers
-        self.semaphore = threading.Semaphore(max_workers)
-        self.task_queue = queue.Queue()
-        self.current_tasks = {}
-        self.running = True
-        self.worker_threads = []
-        
-        # 启动工作线程
-        for i in range(max_workers):
-            thread = threading.Thread(target=self._worker_thread, daemon=True)
-            thread.start()
-            self.worker_threads.append(thread)
-    def _worker_thread(self):
-        """工作线程函数，不断从队列中获取任务并执行"""
-        while self.running:
-            try:
-                # 尝试从队列获取任务，超时1秒
-                task = self.task_queue.get(timeout=1)
-                if task is None:  # 收到停止信号
-                    break
-                
-                # 解析任务参数，支持新旧两种格式
-                if len(task) == 5:
-                    # 旧格式：兼容现有代码
-                    app, video_id, task_id, stop_flag, process_func = task
-                    processing_steps = None
-                    preview_mode = False
-                elif len(task) == 7:
-                    # 新格式：支持新参数
-                    app, video_id, task_id, stop_flag, process_func, processing_steps, preview_mode = task
-                else:
-                    current_app.logger.error(f"无效的任务参数格式: {task}")
-                    continue
-                
-                # 添加到当前任务列表
-                self.current_tasks[task_id] = {
-                    'video_id': video_id,
-                    'start_time': datetime.now(),
-                    'stop_flag': stop_flag
-                }
-                
-                try:
-                    with app.app_context():
-                        # 记录线程ID
-                        thread_id = threading.get_ident()
-                        
-                        # 添加任务日志
-                        from models.models import db, TaskLog
-                        log = TaskLog(
-                            task_id=task_id,
-                            video_id=video_id,
-                            log_level="info",
-                            message=f"开始处理视频，线程ID: {thread_id}"
-                        )
-                        db.session.add(log)
-                        db.session.commit()
-                        
-                        # 在全局字典中添加线程信息
-                        if hasattr(app, 'PROCESSING_THREADS'):
-                            app.PROCESSING_THREADS[task_id] = {
-                                'thread_id': thread_id,
-                                'video_id': video_id,
-                                'stop_flag': stop_flag
-                            }
-                        
-                        # 执行处理函数，传递新参数
-                        process_func(video_id, stop_flag, processing_steps, preview_mode)
-                except Exception as e:
-                    import traceback
-                    traceback.print_exc()
-                    with app.app_context():
-                        current_app.logger.error(f"处理视频任务失败: {str(e)}")
-                finally:
-                    # 从当前任务列表移除
-                    if task_id in self.current_tasks:
-                        del self.current_tasks[task_id]
-                    
-                    # 从全局线程列表移除
-                    if hasattr(app, 'PROCESSING_THREADS') and task_id in app.PROCESSING_THREADS:
-                        del app.PROCESSING_THREADS[task_id]
-                    
-                    # 通知队列任务完成
-                    self.task_queue.task_done()
-                    
-            except queue.Empty:
-                # 队列为空，继续下一次循环
-                continue
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                with app.app_context():
-
-                    current_app.logger.error(f"工作线程发生错误: {str(e)}")
-                continue
-    
-    def submit_task(self, app, video_id, process_func):
+from utils.task_pool import DurableTaskPool, callable_path, resolve_callable
+from utils.durable_queue import PRIORITY_EXPRESS, PRIORITY_NORMAL
+
+
+def is_express_task(processing_steps=None, preview_mode=False):
+    """预览任务与只重新执行单个步骤的任务耗时短，进入快速通道"""
+    return bool(preview_mode or (processing_steps and len(processing_steps) == 1))
+
+# 创建一个线程池来管理视频处理任务，任务保存在持久化队列中，服务重启后继续执行
+# 工作线程数是同时进行的任务数，实际的CPU与网络并发由步骤调度的资源通道（PIPELINE_LANES）限制
+class VideoProcessingPool(DurableTaskPool):
+    queue_name = 'video'
+    task_prefix = 'task'
+    max_workers_config = 'VIDEO_PROCESSING_MAX_TASKS'
+    express_workers_config = 'VIDEO_PROCESSING_EXPRESS_WORKERS'
+
+    def submit_task(self, app, video_id, process_func, task_id=None):
         """
         提交视频处理任务
-        
+
         Args:
             app: Flask应用实例
             video_id: 视频ID
             process_func: 处理函数
-            
+            task_id: 任务ID，为None时生成新的ID
+
         Returns:
             task_id: 任务ID
         """
-        # 生成任务ID
-        task_id = f"task-{uuid.uuid4().hex[:8]}"
-        
-        # 创建停止标志
-        stop_flag = threading.Event()
-        
-        # 添加到队列
-        self.task_queue.put((app, video_id, task_id, stop_flag, process_func))
-        
-        return task_id, stop_flag
-    
-    def submit_task_with_params(self, app, video_id, process_func, processing_steps=None, preview_mode=False):
+        return self.submit_task_with_params(app, video_id, process_func, task_id=task_id)
+
+    def submit_task_with_params(self, app, video_id, process_func, processing_steps=None, preview_mode=False, task_options=None,
+                                priority=None, task_id=None):
         """
         提交视频处理任务（支持参数）
-        
+
         Args:
             app: Flask应用实例
             video_id: 视频ID
-            process_func: 处理函数
+            process_func: 处理函数（需为模块级函数，按导入路径保存在队列中）
             processing_steps: 要执行的步骤列表
             preview_mode: 预览模式
-            
+            task_options: 传递给处理函数的额外关键字参数，如 {'keyframe_engine': 'adaptive-ssim'}
+            priority: 优先级（数值或 express/high/normal/low），为None时预览与单步骤任务为 express，其余为 normal
+            task_id: 任务ID（由 new_task_id 生成，与已创建的任务记录一致），为None时生成新的ID
+
         Returns:
             task_id: 任务ID
             stop_flag: 停止标志
         """
-        # 生成任务ID
-        task_id = f"task-{uuid.uuid4().hex[:8]}"
-        
-        # 创建停止标志
-        stop_flag = threading.Event()
-        
-        # 添加到队列，包含额外参数
-        self.task_queue.put((app, video_id, task_id, stop_flag, process_func, processing_steps, preview_mode))
-        
-        return task_id, stop_flag
-
-    def get_pending_tasks_count(self):
-        """获取等待中的任务数量"""
-        return self.task_queue.qsize()
-    
-    def get_active_tasks_count(self):
-        """获取正在执行的任务数量"""
-        return len(self.current_tasks)
-    
-    def stop_task(self, task_id):
-        """停止指定任务"""
-        if task_id in self.current_tasks:
-            self.current_tasks[task_id]['stop_flag'].set()
-            return True
-        return False
-    
-    def shutdown(self, wait=True):
-        """关闭线程池"""
-        self.running = False
-        
-        # 清空队列并添加停止信号
-        with self.task_queue.mutex:
-            self.task_queue.queue.clear()
-        
-        # 对每个工作线程添加终止信号
-        for _ in range(len(self.worker_threads)):
-            self.task_queue.put(None)
-        
-        # 停止所有当前任务
-        for task_id in list(self.current_tasks.keys()):
-            self.stop_task(task_id)
-        
-        # 等待所有线程结束
-        if wait:
-            for thread in self.worker_threads:
-                thread.join()
+        payload = {
+            'func': callable_path(process_func),
+            'video_id': str(video_id),
+            'processing_steps': processing_steps,
+            'preview_mode': preview_mode,
+            'task_options': task_options or {}
+        }
+        if priority is None:
+            priority = PRIORITY_EXPRESS if is_express_task(processing_steps, preview_mode) else PRIORITY_NORMAL
+        return self._submit(app, payload, priority, self._fair_key(app, video_id), task_id)
+
+    @staticmethod
+    def _fair_key(app, video_id):
+        """
+        返回视频所属的公平分组，同一优先级内各分组轮流执行，避免批量上传的课程长时间占满队列
+
+        按配置 TASK_FAIR_SHARE_BY 分组：teacher（默认，按课程的教师）或 course（按课程）
+        """
+        from models.models import Video
+        video = Video.query.get(video_id)
+        if video is None:
+            return None
+        if app.config.get('TASK_FAIR_SHARE_BY', 'teacher') == 'teacher' and video.course and video.course.teacher_id:
+            return f"teacher:{video.course.teacher_id}"
+        return f"course:{video.course_id}"
+
+    def _task_info(self, job):
+        return {'video_id': uuid.UUID(job.payload['video_id'])}
+
+    def _execute(self, app, job, stop_flag):
+        payload = job.payload
+        video_id = uuid.UUID(payload['video_id'])
+        process_func = resolve_callable(payload['func'])
+
+        # 添加任务日志
+        from models.models import db, TaskLog
+        log = TaskLog(
+            task_id=job.task_id,
+            video_id=video_id,
+            log_level="info",
+            message=f"开始处理视频，线程ID: {threading.get_ident()}" + (f"（第{job.attempts}次执行）" if job.attempts > 1 else "")
+        )
+        db.session.add(log)
+        db.session.commit()
+
+        # 执行处理函数，传递新参数
+        process_func(video_id, stop_flag, payload['processing_steps'], payload['preview_mode'], **payload['task_options'])
+
+    def _on_recovered(self, requeued, failed, startup=False):
+        from models.models import db, VideoProcessingTask
+
+        # 重新入队的任务恢复为等待状态，重新执行时由处理函数按 pending 状态找到该任务记录
+        if requeued:
+            VideoProcessingTask.query.filter(
+                VideoProcessingTask.task_id.in_(requeued)
+            ).update({'status': 'pending', 'progress': 0.0}, synchronize_session=False)
+        if failed:
+            VideoProcessingTask.query.filter(
+                VideoProcessingTask.task_id.in_(failed)
+            ).update({'status': 'failed', 'error_message': '任务多次中断，已停止重试', 'end_time': datetime.now()},
+                     synchronize_session=False)
+
+        # 本进程启动前创建、且不在队列中的进行中任务（如队列启用前提交的任务）已无法继续，标记为失败
+        if startup:
+            active_task_ids = self.queue.active_task_ids(self.queue_name)
+            orphaned = VideoProcessingTask.query.filter(
+                VideoProcessingTask.status.in_(['pending', 'processing']),
+                VideoProcessingTask.start_time < self.started_at
+            ).all()
+            for task in orphaned:
+                if task.task_id not in active_task_ids:
+                    task.status = 'failed'
+                    task.error_message = '服务重启，任务已中断'
+                    task.end_time = datetime.now()
+                    current_app.logger.warning(f"视频处理任务 {task.task_id} 已中断")
+        db.session.commit()
 
 # 创建全局处理池实例
-video_processing_pool = VideoProcessingPool(max_workers=2)
+video_processing_pool = VideoProcessingPool(max_workers=4)
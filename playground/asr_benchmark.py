@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import argparse
+import resource
+import multiprocessing as mp
+
+from flask import Flask
+import loguru
+logger = loguru.logger
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+
+def _peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），Linux 下 ru_maxrss 单位为 KB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_engine(engine_name, clip_path, model_name, queue):
+    """在独立进程中加载并运行一个引擎，保证内存统计互不干扰"""
+    from utils.asr_engine import get_asr_engine
+    from utils.audio_util import load_audio, SAMPLE_RATE
+
+    app = Flask(__name__)
+    app.config.update(ASR_MODEL=model_name, ASR_WORKERS=1)
+    with app.app_context():
+        audio_seconds = len(load_audio(clip_path)) / SAMPLE_RATE
+        baseline_mb = _peak_rss_mb()
+
+        start_time = time.time()
+        engine = get_asr_engine(engine_name)
+        load_seconds = time.time() - start_time
+
+        start_time = time.time()
+        segments = engine.perform_asr(clip_path) or []
+        transcribe_seconds = time.time() - start_time
+
+        queue.put({
+            "engine": engine_name,
+            "audio_seconds": audio_seconds,
+            "load_seconds": load_seconds,
+            "transcribe_seconds": transcribe_seconds,
+            "rtf": transcribe_seconds / audio_seconds if audio_seconds else 0.0,
+            "peak_rss_mb": _peak_rss_mb(),
+            "engine_rss_mb": _peak_rss_mb() - baseline_mb,
+            "segments": len(segments),
+            "preview": " ".join(segment["text"].strip() for segment in segments[:3])
+        })
+
+
+def benchmark_engines(clip_path, engines, model_name, repeat=1):
+    """
+    对比各ASR引擎的实时率（RTF = 识别耗时 / 音频时长）与内存占用
+
+    参数:
+        clip_path: 测试音视频文件路径
+        engines: 引擎名称列表，如 ["whisper", "faster-whisper"]
+        model_name: 模型名称
+        repeat: 重复测试次数
+    """
+    ctx = mp.get_context("spawn")
+    results = []
+    for engine_name in engines:
+        for i in range(repeat):
+            queue = ctx.Queue()
+            process = ctx.Process(target=_run_engine, args=(engine_name, clip_path, model_name, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            results.append(result)
+            logger.info(
+                f"{engine_name} - 运行 {i + 1}: 音频 {result['audio_seconds']:.1f} 秒, 加载 {result['load_seconds']:.2f} 秒, "
+                f"识别 {result['transcribe_seconds']:.2f} 秒, RTF {result['rtf']:.3f}, "
+                f"峰值内存 {result['peak_rss_mb']:.0f} MB (加载与识别增加 {result['engine_rss_mb']:.0f} MB), "
+                f"{result['segments']} 个片段"
+            )
+            logger.info(f"{engine_name} 识别示例: {result['preview']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR引擎实时率与内存基准测试")
+    parser.add_argument("clip_path", help="测试音视频文件路径（建议使用1-5分钟的讲课片段）")
+    parser.add_argument("-e", "--engines", nargs="+", default=["whisper", "faster-whisper"], help="参与对比的引擎")
+    parser.add_argument("-m", "--model", default="base", help="模型名称")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="测试重复次数")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.clip_path):
+        logger.error(f"测试文件不存在: {args.clip_path}")
+        return 1
+
+    benchmark_engines(args.clip_path, args.engines, args.model, args.repeat)
+    return 0
+
+if __name__ == "__main__":
+    main()
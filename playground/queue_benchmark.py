@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import queue
+import argparse
+import tempfile
+import threading
+
+import loguru
+logger = loguru.logger
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from utils.durable_queue import DurableQueue
+
+
+def _run(producer, consumer, jobs, producers, consumers):
+    """启动生产者与消费者线程，返回全部任务处理完成的耗时"""
+    per_producer = jobs // producers
+    total = per_producer * producers
+    done = [0]
+    lock = threading.Lock()
+
+    def produce(index):
+        for i in range(per_producer):
+            producer(f"bench-{index}-{i}", {"index": i})
+
+    def consume(index):
+        while True:
+            with lock:
+                if done[0] >= total:
+                    return
+            if consumer(f"consumer-{index}"):
+                with lock:
+                    done[0] += 1
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+    threads += [threading.Thread(target=consume, args=(i,)) for i in range(consumers)]
+    start_time = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return total, time.time() - start_time
+
+
+def benchmark_memory_queue(jobs, producers, consumers):
+    """内存队列 queue.Queue 的入队/出队吞吐"""
+    task_queue = queue.Queue()
+
+    def consumer(owner):
+        try:
+            task_queue.get(timeout=0.1)
+        except queue.Empty:
+            return False
+        task_queue.task_done()
+        return True
+
+    return _run(lambda task_id, payload: task_queue.put((task_id, payload)), consumer, jobs, producers, consumers)
+
+
+def benchmark_durable_queue(path, jobs, producers, consumers):
+    """持久化队列的 入队 → 租用 → 完成 吞吐"""
+    durable_queue = DurableQueue(path)
+
+    def consumer(owner):
+        job = durable_queue.lease("bench", owner, timeout=0.1)
+        if job is None:
+            return False
+        durable_queue.complete(job.id, owner)
+        return True
+
+    return _run(lambda task_id, payload: durable_queue.put("bench", task_id, payload), consumer, jobs, producers, consumers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务队列吞吐基准测试：内存队列与SQLite持久化队列对比")
+    parser.add_argument("-n", "--jobs", type=int, default=5000, help="任务数量")
+    parser.add_argument("-p", "--producers", type=int, default=2, help="生产者线程数")
+    parser.add_argument("-c", "--consumers", type=int, default=4, help="消费者线程数")
+    parser.add_argument("-d", "--db", default=None, help="持久化队列数据库文件路径，默认使用临时目录")
+
+    args = parser.parse_args()
+
+    total, seconds = benchmark_memory_queue(args.jobs, args.producers, args.consumers)
+    logger.info(f"queue.Queue: {total} 个任务, 耗时 {seconds:.3f} 秒, {total / seconds:.0f} 个/秒")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.db or os.path.join(tmp_dir, "queue_benchmark.db")
+        total, seconds = benchmark_durable_queue(path, args.jobs, args.producers, args.consumers)
+        logger.info(
+            f"DurableQueue: {total} 个任务, 耗时 {seconds:.3f} 秒, {total / seconds:.0f} 个/秒, "
+            f"平均每个任务 {seconds / total * 1000:.2f} 毫秒"
+        )
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+from flask import Flask
+import loguru
+logger = loguru.logger
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from utils.ocr_engine import TencentOCR
+
+
+class StubOCRServer:
+    """
+    模拟腾讯云 GeneralFastOCR 接口的本地HTTP服务
+
+    按固定延迟返回与真实接口一致的响应结构；超过服务端QPS上限时返回 RequestLimitExceeded 错误。
+    """
+
+    def __init__(self, latency=0.2, qps_limit=10, port=0):
+        self.latency = latency
+        self.qps_limit = qps_limit
+        self.request_times = deque()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "connections": set()}
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(length)
+                self.send_json(stub.handle(self.client_address))
+
+            def send_json(self, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self):
+        return f"127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def handle(self, client_address):
+        request_id = str(uuid.uuid4())
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["connections"].add(client_address)
+            now = time.monotonic()
+            while self.request_times and now - self.request_times[0] > 1.0:
+                self.request_times.popleft()
+            throttled = self.qps_limit > 0 and len(self.request_times) >= self.qps_limit
+            if throttled:
+                self.stats["throttled"] += 1
+            else:
+                self.request_times.append(now)
+
+        if throttled:
+            return {"Response": {
+                "Error": {"Code": "RequestLimitExceeded", "Message": "请求频率超过限制"},
+                "RequestId": request_id
+            }}
+
+        time.sleep(self.latency)
+        return {"Response": {
+            "TextDetections": [{
+                "DetectedText": "示例文本",
+                "Confidence": 99,
+                "Polygon": [{"X": 10, "Y": 10}, {"X": 200, "Y": 10}, {"X": 200, "Y": 40}, {"X": 10, "Y": 40}],
+                "AdvancedInfo": "{}"
+            }],
+            "Language": "zh",
+            "RequestId": request_id
+        }}
+
+
+def create_test_images(output_folder, count):
+    """生成测试用关键帧图片"""
+    keyframes_data = []
+    for i in range(count):
+        image = np.full((720, 1280, 3), 255, dtype=np.uint8)
+        cv2.putText(image, f"slide {i}", (100, 360), cv2.FONT_HERSHEY_SIMPLEX, 3, (0, 0, 0), 5)
+        file_name = f"keyframe_{i + 1:04d}.jpg"
+        cv2.imwrite(os.path.join(output_folder, file_name), image)
+        keyframes_data.append({"id": i + 1, "file_name": file_name})
+    return keyframes_data
+
+
+def run_benchmark(image_count, concurrency_levels, qps, server_qps, latency):
+    stub = StubOCRServer(latency=latency, qps_limit=server_qps).start()
+    app = Flask(__name__)
+    app.config.update(
+        TENCENT_OCR_SECRET_ID="stub-id",
+        TENCENT_OCR_SECRET_KEY="stub-key",
+        TENCENT_OCR_REGION="ap-guangzhou",
+        TENCENT_OCR_ENDPOINT=stub.endpoint,
+        TENCENT_OCR_SCHEME="http",
+        TENCENT_OCR_QPS=qps
+    )
+
+    results = {}
+    with tempfile.TemporaryDirectory() as output_folder, app.app_context():
+        create_test_images(output_folder, image_count)
+        for concurrency in concurrency_levels:
+            stub.stats.update({"requests": 0, "throttled": 0, "connections": set()})
+            engine = TencentOCR(concurrency=concurrency)
+            keyframes_data = [{"id": i + 1, "file_name": f"keyframe_{i + 1:04d}.jpg"} for i in range(image_count)]
+
+            start_time = time.time()
+            engine.perform_ocr(keyframes_data, output_folder)
+            elapsed = time.time() - start_time
+
+            ok = sum(1 for frame in keyframes_data if frame["ocr_result"])
+            results[concurrency] = elapsed
+            logger.info(
+                f"并发 {concurrency}: {elapsed:.2f} 秒, {image_count / elapsed:.1f} 张/秒, 成功 {ok}/{image_count}, "
+                f"请求 {stub.stats['requests']} 次, 被限流 {stub.stats['throttled']} 次, "
+                f"TCP连接 {len(stub.stats['connections'])} 个"
+            )
+
+    stub.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="腾讯OCR并发客户端离线压测（本地模拟服务）")
+    parser.add_argument("-n", "--images", type=int, default=50, help="测试图片数量")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 4, 8], help="并发数列表")
+    parser.add_argument("--qps", type=float, default=10, help="客户端令牌桶QPS上限")
+    parser.add_argument("--server-qps", type=int, default=10, help="模拟服务端的QPS上限")
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟服务端单次请求延迟（秒）")
+
+    args = parser.parse_args()
+    run_benchmark(args.images, args.concurrency, args.qps, args.server_qps, args.latency)
+    return 0
+
+if __name__ == "__main__":
+    main()